@@ -1,25 +1,303 @@
-from interpreter.lexer import Lexer
-from interpreter.parser import Parser
-from interpreter.interpreter import Interpreter
+import functools
+import sys
 
+from interpreter.batch import ResultWriter, run, error_message, ALL, QUIET, LAST_ONLY
+from interpreter.cache import ExpressionCache, parse
+from interpreter.engines import ENGINE_CLASSES, DEFAULT_ENGINE, Evaluator
 
-def main():
+# Everything else (the server, worker processes, metrics, snapshots, the
+# optimizer) is imported by the options that use it: rafmath is often
+# started for one expression, and then startup is most of the run time.
+
+EXPORTS = {
+    'prometheus': lambda registry: registry.to_prometheus(),
+    'json': lambda registry: registry.to_json() + '\n',
+}
+
+
+def stats(argument):
+    """The :stats REPL command, optionally followed by an export format."""
+    from interpreter import metrics
+    if not metrics.enabled():
+        print('error: Metrics are disabled, start with --metrics')
+    elif not argument:
+        print(metrics.registry.summary())
+    elif argument in EXPORTS:
+        print(EXPORTS[argument](metrics.registry), end='')
+    elif argument == 'reset':
+        metrics.registry.reset()
+    else:
+        print('error: Unknown stats format {}'.format(argument))
+
+
+def save(evaluator, path):
+    """The :save REPL command."""
+    from interpreter import snapshot
+    saved = snapshot.save(path, evaluator)
+    print('saved {} variables, {} formulas to {}'.format(len(saved.variables), len(saved.formulas), path))
+
+
+def restore(evaluator, path):
+    """The :load REPL command."""
+    from interpreter import snapshot
+    loaded = snapshot.restore(path, evaluator)
+    print('loaded {} variables, {} formulas from {}'.format(len(loaded.variables), len(loaded.formulas), path))
+
+
+SNAPSHOT_COMMANDS = {':save': save, ':load': restore}
+
+
+def tiers(evaluator, argument):
+    """The :tiers REPL command."""
+    manager = getattr(evaluator.interpreter, 'manager', None)
+    if argument:
+        print('error: Usage: :tiers')
+    elif manager is None:
+        print('error: Tiering is disabled, start with --engine tiered')
+    else:
+        print('{} of {} compiled forms cached; {}'.format(len(manager), manager.maxsize, manager.stats))
+
+
+def repl(evaluator):
     while True:
         try:
             text = input('rafmath: ')
         except (EOFError, KeyboardInterrupt):
             break
-        if text == 'exit':
+        words = text.split()
+        if not words:
+            continue
+        # commands are matched by their first word, the rest is their argument
+        command = words[0]
+        argument = text.strip()[len(command):].strip()
+        if command == 'exit' and not argument:
             exit('Goodbye')
-        if not text:
+        if command == ':stats':
+            stats(argument)
+            continue
+        if command == ':tiers':
+            tiers(evaluator, argument)
+            continue
+        if command in SNAPSHOT_COMMANDS:
+            try:
+                if not argument:
+                    raise Exception('Usage: {} PATH'.format(command))
+                SNAPSHOT_COMMANDS[command](evaluator, argument)
+            except (Exception, OSError) as error:
+                print('error: {}'.format(error_message(error)))
             continue
-        text += ' '
-        lexer = Lexer(text)
-        parser = Parser(lexer)
-        interpreter = Interpreter(parser)
-        result = interpreter.interpret()
-        print(result)
+        try:
+            result = evaluator.evaluate(text)
+        except Exception as error:
+            print('error: {}'.format(error_message(error)))
+        else:
+            print(result)
+
+
+def export(path, export_format):
+    from interpreter import metrics
+    text = EXPORTS[export_format](metrics.registry)
+    if path == '-':
+        sys.stderr.write(text)
+    else:
+        with open(path, 'w') as output:
+            output.write(text)
+
+
+def one_shot(text):
+    """`rafmath -c EXPR` without other options: what main() would do, without
+    loading the option parser."""
+    writer = ResultWriter(sys.stdout, sys.stderr, ALL)
+    errors = run(Evaluator(cache=ExpressionCache()), text.splitlines(), writer)
+    sys.exit(1 if errors else 0)
+
+
+def pipeline(options, loader, variables):
+    """--csv: filter and compute over the rows of a CSV file, return the
+    number of rows that failed."""
+    import csv
+    from interpreter.pipeline import Pipeline
+    keep = options.keep if options.keep in (None, '*') else [name.strip() for name in options.keep.split(',')]
+    columns = Pipeline(options.select or (), options.where, keep, options.chunk_size, options.engine,
+                       variables=variables, loader=loader)
+    source = sys.stdin if options.csv == '-' else open(options.csv, newline='')
+    with source:
+        return columns.run(csv.reader(source, delimiter=options.delimiter),
+                           csv.writer(sys.stdout, delimiter=options.delimiter, lineterminator='\n'), sys.stderr)
+
+
+def main():
+    import argparse
+    arguments = argparse.ArgumentParser(
+        prog='rafmath',
+        description='Evaluate rafmath expressions interactively, from a script file or from stdin.')
+    arguments.add_argument('script', nargs='?',
+                           help="file with one expression per line, '-' for stdin")
+    arguments.add_argument('-c', dest='command', metavar='EXPR',
+                           help='evaluate EXPR (one expression per line) and exit')
+    output = arguments.add_mutually_exclusive_group()
+    output.add_argument('--quiet', dest='mode', action='store_const', const=QUIET, default=ALL,
+                        help='only report errors')
+    output.add_argument('--last-only', dest='mode', action='store_const', const=LAST_ONLY,
+                        help='only print the result of the last expression')
+    arguments.add_argument('--engine', choices=sorted(ENGINE_CLASSES), default=DEFAULT_ENGINE,
+                           help='evaluation engine (default: %(default)s)')
+    arguments.add_argument('-O', '--optimize', action='store_true',
+                           help='fold constants and remove identities before evaluating')
+    arguments.add_argument('--share', action='store_true',
+                           help='evaluate repeated subexpressions once per expression')
+    arguments.add_argument('--reactive', action='store_true',
+                           help='remember assignments and recompute dependent variables on changes')
+    arguments.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                           help='evaluate scripts in N worker processes (0: one per CPU)')
+    arguments.add_argument('--chunk-size', type=int, default=2000, metavar='LINES',
+                           help='lines per worker task with --jobs, rows per chunk with --csv (default: %(default)s)')
+    arguments.add_argument('--serve', metavar='[HOST:]PORT',
+                           help='serve a line protocol over TCP, one session per connection')
+    arguments.add_argument('--unix', metavar='PATH',
+                           help='serve the line protocol over a Unix socket')
+    arguments.add_argument('--timeout', type=float, metavar='SECONDS',
+                           help='per-request time limit when serving')
+    arguments.add_argument('--metrics', action='store_true',
+                           help='collect timings and counters, shown by :stats in the REPL')
+    arguments.add_argument('--metrics-file', metavar='FILE',
+                           help="write the metrics to FILE ('-' for stderr) on exit, implies --metrics")
+    arguments.add_argument('--metrics-format', choices=sorted(EXPORTS), default='prometheus',
+                           help='format of --metrics-file (default: %(default)s)')
+    arguments.add_argument('--tier-threshold', type=int, metavar='N',
+                           help='with --engine tiered, compile an expression on its Nth evaluation (default: 50)')
+    arguments.add_argument('--tier-size', type=int, metavar='N',
+                           help='with --engine tiered, compiled expressions kept (default: 256)')
+    arguments.add_argument('--tier-compiler', choices=('bytecode', 'closure', 'python'),
+                           help='with --engine tiered, what hot expressions are compiled to (default: python)')
+    arguments.add_argument('--compile', action='store_true',
+                           help='parse the script once into __rafcache__/ for later runs and exit')
+    arguments.add_argument('--csv', metavar='FILE',
+                           help="stream the rows of a CSV file ('-' for stdin) through --where and --select")
+    arguments.add_argument('--select', action='append', metavar='EXPR',
+                           help='with --csv, add a column computed from the columns of each row, may be repeated')
+    arguments.add_argument('--where', metavar='EXPR',
+                           help='with --csv, only keep the rows for which every comparison of EXPR holds')
+    arguments.add_argument('--keep', metavar='COLUMNS',
+                           help="with --csv, comma separated input columns to write ('*' for all; "
+                                "default: all without --select, none with it)")
+    arguments.add_argument('--delimiter', default=',', help='with --csv, the column delimiter (default: %(default)s)')
+    arguments.add_argument('--load', metavar='SNAPSHOT',
+                           help='start with the variables (and formulas) of a snapshot saved by :save or --save')
+    arguments.add_argument('--save', metavar='SNAPSHOT',
+                           help='save the variables (and formulas) to SNAPSHOT after running a script')
+    options = arguments.parse_args()
+    if options.reactive and options.jobs != 1:
+        arguments.error('--reactive evaluates in order and cannot be combined with --jobs')
+    if (options.metrics or options.metrics_file) and options.jobs != 1:
+        arguments.error('--metrics is not collected in worker processes and cannot be combined with --jobs')
+    if options.save and options.jobs != 1:
+        arguments.error('--save cannot be combined with --jobs')
+    if (options.select or options.where or options.keep) and options.csv is None:
+        arguments.error('--select, --where and --keep need --csv')
+    if options.csv is not None and (options.script is not None or options.command is not None
+                                    or options.jobs != 1 or options.reactive):
+        arguments.error('--csv cannot be combined with a script, -c, --jobs or --reactive')
+    tier_options = {name: value for name, value in (('threshold', options.tier_threshold),
+                                                    ('maxsize', options.tier_size),
+                                                    ('compiler', options.tier_compiler)) if value is not None}
+    if tier_options and options.engine != 'tiered':
+        arguments.error('--tier-threshold, --tier-size and --tier-compiler need --engine tiered')
+    if tier_options:
+        from interpreter import tiering
+        try:
+            tiering.default_manager = tiering.TieringManager(**tier_options)
+        except Exception as error:
+            arguments.error(error_message(error))
+    loaded = None
+    if options.load:
+        from interpreter import snapshot
+        try:
+            loaded = snapshot.read(options.load)
+        except (Exception, OSError) as error:
+            arguments.error('cannot load {}: {}'.format(options.load, error_message(error)))
+    if options.metrics or options.metrics_file:
+        from interpreter import metrics
+        metrics.enable()
+        if options.metrics_file:
+            import atexit
+            atexit.register(export, options.metrics_file, options.metrics_format)
+    loader = parse
+    if options.optimize or options.share:
+        from interpreter.loader import load
+        loader = functools.partial(load, optimize_tree=options.optimize, share_tree=options.share)
+    if options.compile:
+        from interpreter import precompiled
+        if options.script is None or options.script == '-':
+            arguments.error('--compile needs a script file')
+        script = precompiled.compile_file(options.script, options.optimize, options.share)
+        print('compiled {} expressions to {}'.format(
+            len(script), precompiled.cache_path(options.script, options.optimize, options.share)))
+        return
+    if options.csv is not None:
+        try:
+            errors = pipeline(options, loader, loaded.variables if loaded else None)
+        except (Exception, OSError) as error:
+            sys.exit('error: {}'.format(error_message(error)))
+        sys.exit(1 if errors else 0)
+    sequential = Evaluator
+    if options.reactive:
+        from interpreter.reactive import ReactiveEvaluator
+        sequential = ReactiveEvaluator
+
+    if options.serve is not None or options.unix is not None:
+        host, port = None, None
+        if options.serve is not None:
+            host, _, port = options.serve.rpartition(':')
+            host, port = host or None, int(port)
+        from interpreter import server, metrics
+        server.serve(host, port, options.unix, options.engine, options.timeout,
+                     ExpressionCache(1024, loader), metrics.registry if metrics.enabled() else None,
+                     loaded.variables if loaded else None)
+        return
+
+    # the REPL evaluates one line at a time, also with --jobs
+    interactive = options.command is None and options.script is None and sys.stdin.isatty()
+    if options.jobs == 1 or interactive:
+        evaluator = sequential(engine=options.engine, cache=ExpressionCache(loader=loader))
+        evaluate = run
+        if loaded:
+            snapshot.install(loaded, evaluator)
+    else:
+        from interpreter import parallel
+        from interpreter.session import Session
+        evaluator = parallel.ParallelEvaluator(options.jobs or None, options.chunk_size, options.engine,
+                                               Session(loaded.variables) if loaded else None, loader=loader)
+        evaluate = parallel.run
+
+    writer = ResultWriter(sys.stdout, sys.stderr, options.mode)
+    if options.command is not None:
+        errors = evaluate(evaluator, options.command.splitlines(), writer)
+    elif options.script is not None and options.script != '-':
+        compiled = None
+        if options.jobs == 1:
+            # worker processes parse their own chunks
+            from interpreter import precompiled
+            compiled = precompiled.cached(options.script, options.optimize, options.share)
+        if compiled is not None:
+            compiled.fallback = loader
+            evaluator.cache.loader = compiled
+            errors = evaluate(evaluator, compiled.lines(), writer)
+        else:
+            with open(options.script) as script:
+                errors = evaluate(evaluator, script, writer)
+    elif not interactive:
+        errors = evaluate(evaluator, sys.stdin, writer)
+    else:
+        repl(evaluator)
+        return
+    if options.save:
+        from interpreter import snapshot
+        snapshot.save(options.save, evaluator)
+    sys.exit(1 if errors else 0)
 
 
 if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == '-c' and not sys.argv[2].startswith('-'):
+        one_shot(sys.argv[2])
     main()
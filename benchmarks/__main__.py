@@ -0,0 +1,79 @@
+"""Benchmark suite command line.
+
+Run from the repository root:
+
+    python -m benchmarks run -o results.json
+    python -m benchmarks run --baseline baseline.json --threshold 15
+    python -m benchmarks compare baseline.json results.json
+
+`compare`, and `run` with a baseline, exit with status 1 if any metric
+regressed by more than the threshold (in percent).
+"""
+import argparse
+import sys
+
+from interpreter.engines import ENGINES, DEFAULT_ENGINE
+from benchmarks.corpora import CORPORA
+from benchmarks import suite
+
+
+def progress(key, result):
+    print('{:<24} {:>12,.0f} ops/s {:>9.1f} {:>9.1f} {:>9.1f} us {:>10,} B'.format(
+        key, result['ops_per_sec'], result['p50_us'], result['p90_us'], result['p99_us'],
+        result['peak_memory']))
+
+
+def report(rows, threshold):
+    """Print a comparison, return the number of regressions."""
+    regressions = 0
+    for key, metric, before, after, change, regressed in rows:
+        regressions += regressed
+        print('{:<24} {:<12} {:>14,.1f} {:>14,.1f} {:>+8.1f}%{}'.format(
+            key, metric, before, after, change, '  REGRESSION' if regressed else ''))
+    print('{} regressions beyond {}%'.format(regressions, threshold))
+    return regressions
+
+
+def main():
+    arguments = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.splitlines()[0])
+    commands = arguments.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='measure and optionally save or compare the results')
+    run.add_argument('-o', '--output', metavar='FILE', help='write the results as JSON')
+    run.add_argument('--corpus', action='append', choices=sorted(CORPORA),
+                     help='corpus to run, may be repeated (default: all)')
+    run.add_argument('--stage', action='append', choices=suite.STAGES,
+                     help='stage to run, may be repeated (default: all)')
+    run.add_argument('--size', type=int, default=500, help='expressions per corpus (default: %(default)s)')
+    run.add_argument('--repeat', type=int, default=3, help='timed passes per stage (default: %(default)s)')
+    run.add_argument('--engine', choices=sorted(ENGINES), default=DEFAULT_ENGINE,
+                     help='engine of the interpret stage (default: %(default)s)')
+    run.add_argument('--baseline', metavar='FILE', help='compare the results with a saved run')
+    run.add_argument('--threshold', type=float, default=10.0, metavar='PERCENT',
+                     help='allowed regression (default: %(default)s)')
+
+    compare = commands.add_parser('compare', help='compare two saved runs')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=10.0, metavar='PERCENT',
+                         help='allowed regression (default: %(default)s)')
+
+    options = arguments.parse_args()
+    if options.command == 'compare':
+        rows = suite.compare(suite.load(options.baseline), suite.load(options.current), options.threshold)
+        sys.exit(1 if report(rows, options.threshold) else 0)
+
+    # read the baseline first, so a bad file fails before the long run
+    baseline = suite.load(options.baseline) if options.baseline else None
+    print('{:<24} {:>18} {:>9} {:>9} {:>12} {:>12}'.format('benchmark', '', 'p50', 'p90', 'p99', 'peak memory'))
+    document = suite.run(options.corpus, options.stage or suite.STAGES, options.size, options.repeat,
+                         options.engine, progress=progress)
+    if options.output:
+        suite.save(document, options.output)
+    if baseline is not None:
+        print()
+        sys.exit(1 if report(suite.compare(baseline, document, options.threshold), options.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
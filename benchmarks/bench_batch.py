@@ -0,0 +1,66 @@
+"""Lines per second of script evaluation.
+
+Compares building a new Lexer, Parser and Interpreter and printing every
+line (what the REPL loop does) with streaming the lines through one
+Evaluator and a buffered ResultWriter.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_batch
+"""
+import os
+import random
+import tempfile
+import time
+
+from interpreter.lexer import Lexer
+from interpreter.parser import Parser
+from interpreter.interpreter import Interpreter
+from interpreter.session import Session
+from interpreter.batch import ResultWriter, run
+from interpreter.cache import ExpressionCache
+from interpreter.engines import Evaluator
+
+
+def script(lines, seed=0):
+    generator = random.Random(seed)
+    text = ['a = 1', 'b = 2.5']
+    while len(text) < lines:
+        kind = generator.random()
+        if kind < 0.1:
+            text.append('a += {}'.format(generator.randint(1, 9)))
+        elif kind < 0.5:
+            text.append('a * {} + b / {}'.format(generator.randint(1, 99), generator.randint(1, 9)))
+        elif kind < 0.8:
+            text.append('SQRT(a ) + LOG({})'.format(generator.randint(1, 1000)))
+        else:
+            text.append('{} < a  <= {}'.format(generator.randint(0, 50), generator.randint(50, 99)))
+    return text
+
+
+def per_line(lines, out):
+    session = Session()
+    for text in lines:
+        result = Interpreter(Parser(Lexer(text)), session).interpret()
+        print(result, file=out, flush=True)
+
+
+def batch(lines, out):
+    evaluator = Evaluator(cache=ExpressionCache())
+    run(evaluator, lines, ResultWriter(out, out))
+
+
+def main():
+    lines = script(200000)
+    for name, function in (('per line', per_line), ('batch', batch)):
+        with tempfile.TemporaryFile('w') as out:
+            start = time.perf_counter()
+            function(lines, out)
+            out.flush()
+            os.fsync(out.fileno())
+            seconds = time.perf_counter() - start
+        print('{:<10} {:>12,.0f} lines/sec'.format(name, len(lines) / seconds))
+
+
+if __name__ == '__main__':
+    main()
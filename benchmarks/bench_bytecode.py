@@ -0,0 +1,80 @@
+"""Memory and per-evaluation time of compiled bytecode against the parsed
+tree evaluated by the tree walking Interpreter.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_bytecode
+"""
+import sys
+import timeit
+import types
+
+from interpreter.cache import parse
+from interpreter.interpreter import Interpreter
+from interpreter.bytecode import BytecodeCompiler
+from interpreter.session import Session
+from benchmarks.bench_engines import balanced, chain
+
+VARIABLES = {'x': 1.5, 'n': 7}
+
+FORMULAS = (
+    'SQRT(POW(x ) + POW(n )) * 2 - n / 3 < 100',
+    '(x + 1) * (x - 1) * SIN(RAD(x * 30.0)) + n % 4 + LOG(n * 10)',
+)
+
+
+def deep_size(root):
+    """Bytes used by an object and everything reachable from it."""
+    seen = set()
+    stack = [root]
+    size = 0
+    while stack:
+        value = stack.pop()
+        # functions and classes are shared with everything else
+        if id(value) in seen or isinstance(value, (type, types.FunctionType, types.BuiltinFunctionType)):
+            continue
+        seen.add(id(value))
+        size += sys.getsizeof(value)
+        if hasattr(value, '__dict__'):
+            stack.append(value.__dict__)
+        for cls in type(value).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name != '__weakref__' and hasattr(value, name):
+                    stack.append(getattr(value, name))
+        if isinstance(value, dict):
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple, set)):
+            stack.extend(value)
+    return size
+
+
+def measure(name, text, number):
+    tree = parse(text)
+    program = BytecodeCompiler().compile(tree)
+    interpreter = Interpreter(None, Session(dict(VARIABLES)))
+    session = Session(dict(VARIABLES))
+    assert interpreter.evaluate(tree) == program.evaluate(session)
+
+    tree_time = min(timeit.repeat(lambda: interpreter.evaluate(tree), number=number, repeat=5)) / number
+    vm_time = min(timeit.repeat(lambda: program.evaluate(session), number=number, repeat=5)) / number
+    tree_size = deep_size(tree)
+    program_size = deep_size(program)
+    print('{:<12} {:>9} B {:>9} B {:>6.1f}x {:>10.1f} us {:>10.1f} us {:>6.2f}x'.format(
+        name, tree_size, program_size, tree_size / program_size,
+        tree_time * 1e6, vm_time * 1e6, tree_time / vm_time))
+
+
+def main():
+    print('{:<12} {:>11} {:>11} {:>7} {:>13} {:>13} {:>7}'.format(
+        'expression', 'tree', 'bytecode', 'memory', 'tree', 'bytecode', 'speed'))
+    for number, text in enumerate(FORMULAS):
+        measure('formula {}'.format(number + 1), text, 20000)
+    for depth in (6, 10):
+        measure('balanced {}'.format(depth), balanced(depth), max(10, 20000 >> depth))
+    for depth in (50, 200):
+        measure('chain {}'.format(depth), chain(depth), 2000)
+
+
+if __name__ == '__main__':
+    main()
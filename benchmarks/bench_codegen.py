@@ -0,0 +1,59 @@
+"""Evaluation time of the generated Python code backend against the other
+engines.
+
+The differential test of tests/test_differential.py runs first for the
+generated code, and nothing is timed if it finds a mismatch (the exit
+status is then 1).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_codegen [expressions]
+"""
+import sys
+import timeit
+
+from interpreter.cache import parse
+from interpreter.session import Session
+from interpreter.engines import ENGINES
+from tests.test_differential import differential, report
+
+FORMULAS = (
+    'price * qty - fee / 4 + price * qty * rate',
+    'SQRT(POW(x ) + POW(y )) * 2 - n / 3 < 100',
+    '(x + 1) * (x - 1) * SIN(RAD(x * 30.0)) + n % 4 + LOG(n * 10)',
+)
+
+TIMING_VARIABLES = {'price': 12.5, 'qty': 40, 'fee': 3, 'rate': 0.05, 'x': 1.5, 'y': 2.0, 'n': 7}
+
+
+def evaluator(interpreter, tree):
+    """Callable evaluating the tree, compiled first if the engine compiles."""
+    if hasattr(interpreter, 'compile'):
+        compiled = interpreter.compile(tree)
+        return lambda: compiled.evaluate(interpreter.session)
+    return lambda: interpreter.evaluate(tree)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    mismatches = differential(count)
+    if mismatches:
+        print(report(mismatches))
+    print('{} random expressions compared, {} mismatches'.format(count, len(mismatches)))
+    if mismatches:
+        sys.exit(1)
+
+    number = 20000
+    names = sorted(ENGINES)
+    print('{:<60} '.format('formula') + ' '.join('{:>10}'.format(name) for name in names))
+    for text in FORMULAS:
+        tree = parse(text)
+        times = []
+        for name in names:
+            evaluate = evaluator(ENGINES[name](None, Session(dict(TIMING_VARIABLES))), tree)
+            times.append(min(timeit.repeat(evaluate, number=number, repeat=5)) / number)
+        print('{:<60} '.format(text) + ' '.join('{:>7.2f} us'.format(time * 1e6) for time in times))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Rows per second of the CSV pipeline against the old way: one assignment
+line per column of each row, then the expression, evaluated as a script.
+
+NumPy is optional; without it the vectorized mode is skipped. Run from the
+repository root:
+
+    python -m benchmarks.bench_csv
+"""
+import csv
+import io
+import random
+import time
+
+from interpreter.batch import ResultWriter, run, QUIET
+from interpreter.cache import ExpressionCache
+from interpreter.engines import Evaluator
+from interpreter.pipeline import Pipeline, vectorized
+
+ROWS = 20000
+WHERE = 'qty > 10'
+SELECT = 'price * qty - fee'
+
+
+def table(rows, seed=0):
+    generator = random.Random(seed)
+    text = io.StringIO()
+    text.write('price,qty,fee\n')
+    for _ in range(rows):
+        text.write('{},{},{}\n'.format(round(generator.uniform(1, 100), 2), generator.randint(1, 50),
+                                       round(generator.uniform(0, 3), 1)))
+    return text.getvalue()
+
+
+def replay(data):
+    """The assignment lines a script would need, evaluated one at a time."""
+    rows = csv.reader(io.StringIO(data))
+    header = next(rows)
+    lines = []
+    for row in rows:
+        lines.extend('{} = {}'.format(name, value) for name, value in zip(header, row))
+        lines.append(SELECT)
+    run(Evaluator(cache=ExpressionCache()), lines, ResultWriter(io.StringIO(), io.StringIO(), QUIET))
+
+
+def pipeline(data, vectorize):
+    columns = Pipeline([SELECT], WHERE, vectorize=vectorize)
+    columns.run(csv.reader(io.StringIO(data)), csv.writer(io.StringIO()))
+    return columns
+
+
+def rows_per_second(function, *arguments):
+    start = time.perf_counter()
+    function(*arguments)
+    return ROWS / (time.perf_counter() - start)
+
+
+def main():
+    data = table(ROWS)
+    print('{:<28} {:>14}'.format('mode', 'rows/s'))
+    print('{:<28} {:>14,.0f}'.format('assignment script', rows_per_second(replay, data)))
+    print('{:<28} {:>14,.0f}'.format('pipeline, row by row', rows_per_second(pipeline, data, False)))
+    if vectorized is None:
+        print('{:<28} {:>14}'.format('pipeline, NumPy', 'no NumPy'))
+        return
+    assert pipeline(data, True).chunks_vectorized
+    print('{:<28} {:>14,.0f}'.format('pipeline, NumPy', rows_per_second(pipeline, data, True)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Evaluation time of formulas with repeated subexpressions, as trees and
+as shared DAGs.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_dag
+"""
+import timeit
+
+from interpreter.cache import parse
+from interpreter.dag import HashConser
+from interpreter.session import Session
+from interpreter.engines import ENGINES
+from benchmarks.bench_optimizer import evaluator
+
+# the kind of formulas generated or written by copying a term around
+FORMULAS = (
+    'SIN(a )*SIN(a ) + COS(a )*COS(a ) + SIN(a )',
+    'SQRT(POW(x - y ) + POW(x - y )) / SQRT(POW(x - y ) + POW(x - y )) + x - y',
+    '(LOG(a * b ) + LOG(a * b )) * (LOG(a * b ) - 1) < (LOG(a * b ) + LOG(a * b )) * 2',
+    '(SIN(RAD(a * 3.0)) + COS(RAD(a * 3.0))) * (SIN(RAD(a * 3.0)) - COS(RAD(a * 3.0))) + SIN(RAD(a * 3.0))',
+)
+
+VARIABLES = {'a': 1.25, 'b': 3, 'x': 10.5, 'y': 2}
+
+
+def main():
+    number = 20000
+    print('{:<8} {:>10} {:>10} {:>8}  {}'.format('engine', 'tree', 'dag', 'speedup', 'formula'))
+    for text in FORMULAS:
+        tree = parse(text)
+        conser = HashConser()
+        dag = conser.share(tree)
+        for name in sorted(ENGINES):
+            interpreter = ENGINES[name](None, Session(dict(VARIABLES)))
+            plain = evaluator(interpreter, tree)
+            shared = evaluator(interpreter, dag)
+            assert plain() == shared()
+            before = min(timeit.repeat(plain, number=number, repeat=5)) / number
+            after = min(timeit.repeat(shared, number=number, repeat=5)) / number
+            print('{:<8} {:>7.2f} us {:>7.2f} us {:>7.2f}x  {}'.format(
+                name, before * 1e6, after * 1e6, before / after, text))
+        print('{:<8} {}'.format('', conser.stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Per-evaluation cost of the tree-walking and closure engines.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_engines
+"""
+import timeit
+
+from interpreter.lexer import Lexer
+from interpreter.parser import Parser
+from interpreter.interpreter import Interpreter
+from interpreter.compiler import Compiler
+
+OPERATORS = ('+', '*', '-')
+
+
+def balanced(depth, counter=None):
+    """Full binary expression tree with 2 ** depth number leaves."""
+    if counter is None:
+        counter = [0]
+    if depth == 0:
+        counter[0] += 1
+        return str(counter[0] % 7 + 1)
+    operator = OPERATORS[depth % len(OPERATORS)]
+    return '(' + balanced(depth - 1, counter) + ' ' + operator + ' ' + balanced(depth - 1, counter) + ')'
+
+
+def chain(depth):
+    """Right-nested parenthesized chain, e.g. (1 + (2 * (3 - ...)))."""
+    text = '1'
+    for i in range(depth):
+        text = '({} {} {})'.format(i % 7 + 1, OPERATORS[i % len(OPERATORS)], text)
+    return text
+
+
+def parse(text):
+    return Parser(Lexer(text)).parse()
+
+
+def measure(name, text, number):
+    tree = parse(text)
+    interpreter = Interpreter(None)
+    compiled = Compiler().compile(tree)
+    assert interpreter.evaluate(tree) == compiled.evaluate()
+
+    tree_time = min(timeit.repeat(lambda: interpreter.evaluate(tree), number=number, repeat=5)) / number
+    closure_time = min(timeit.repeat(compiled.evaluate, number=number, repeat=5)) / number
+    print('{:<14} {:>10.1f} us {:>10.1f} us {:>8.2f}x'.format(
+        name, tree_time * 1e6, closure_time * 1e6, tree_time / closure_time))
+
+
+def main():
+    print('{:<14} {:>13} {:>13} {:>9}'.format('expression', 'tree', 'closure', 'speedup'))
+    for depth in (4, 6, 8, 10):
+        measure('balanced {}'.format(depth), balanced(depth), max(10, 20000 >> depth))
+    for depth in (25, 50, 100):
+        measure('chain {}'.format(depth), chain(depth), 2000)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Calls of a function registered at runtime, with and without its LRU
+result cache, on formulas that call it with few distinct arguments.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_functions
+"""
+import math
+import timeit
+
+from interpreter import functions
+from interpreter.cache import parse
+from interpreter.engines import ENGINES
+from interpreter.session import Session
+from benchmarks.bench_optimizer import evaluator
+
+
+def series(value, terms=2000):
+    """A deliberately expensive function: partial sum of a series."""
+    return sum(math.sin(value * k) / k for k in range(1, terms))
+
+
+FORMULAS = (
+    'SERIES(x ) + SERIES(x + 1) * 2',
+    'SERIES(n % 4) + SERIES(n % 3) + SERIES(n % 2)',
+)
+
+
+def main():
+    number = 200
+    functions.register('SERIES', series)
+    print('{:<10} {:>12} {:>12} {:>9}  {}'.format('engine', 'uncached', 'cached', 'speedup', 'formula'))
+    for text in FORMULAS:
+        tree = parse(text)
+        for name in sorted(ENGINES):
+            session = Session({'x': 1.5, 'n': 7})
+            functions.unregister('SERIES')
+            functions.register('SERIES', series)
+            uncached = evaluator(ENGINES[name](None, session), tree)
+            before = min(timeit.repeat(uncached, number=number, repeat=3)) / number
+            functions.unregister('SERIES')
+            cached_function = functions.register('SERIES', series, cache_size=128)
+            cached = evaluator(ENGINES[name](None, session), tree)
+            assert uncached() == cached()
+            after = min(timeit.repeat(cached, number=number, repeat=3)) / number
+            print('{:<10} {:>9.1f} us {:>9.1f} us {:>8.1f}x  {}'.format(
+                name, before * 1e6, after * 1e6, before / after, text))
+        print('{:<10} {}'.format('', cached_function.cache))
+    functions.unregister('SERIES')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Lexer throughput in tokens per second on large inputs.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_lexer
+"""
+import random
+import time
+
+from interpreter.lexer import Lexer, EOF
+
+FUNCTIONS = ('SQRT', 'SIN', 'COS', 'TG', 'CTG', 'LOG', 'POW', 'DEG', 'RAD')
+OPERATORS = ('+', '-', '*', '/', '%', '<<', '>>', '<', '<=', '>', '>=', '==')
+
+
+def corpus(size, seed=0):
+    """Deterministic text of roughly `size` characters covering every token kind."""
+    generator = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        kind = generator.random()
+        if kind < 0.35:
+            part = str(generator.randint(0, 100000))
+        elif kind < 0.45:
+            part = '{}.{}'.format(generator.randint(0, 999), generator.randint(0, 999))
+        elif kind < 0.6:
+            part = generator.choice('abcxyz') + str(generator.randint(0, 99)) + ' '
+        elif kind < 0.7:
+            part = generator.choice(FUNCTIONS) + '('
+        elif kind < 0.75:
+            part = generator.choice(('PI', 'E')) + ' '
+        elif kind < 0.8:
+            part = generator.choice('()')
+        else:
+            part = generator.choice(OPERATORS)
+        parts.append(part)
+        parts.append(' ')
+        length += len(part) + 1
+    return ''.join(parts)
+
+
+def throughput(text, repeat=3):
+    best = None
+    tokens = 0
+    for _ in range(repeat):
+        lexer = Lexer(text)
+        tokens = 0
+        start = time.perf_counter()
+        while lexer.get_next_token().type != EOF:
+            tokens += 1
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return tokens, best
+
+
+def main():
+    print('{:>12} {:>10} {:>10} {:>14}'.format('characters', 'tokens', 'seconds', 'tokens/sec'))
+    for size in (10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7):
+        text = corpus(size)
+        tokens, seconds = throughput(text)
+        print('{:>12} {:>10} {:>10.3f} {:>14,.0f}'.format(len(text), tokens, seconds, tokens / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Bytes per node of parsed expressions kept in memory: the node layout
+before __slots__ (rebuilt here for comparison), the slotted nodes and the
+flat struct-of-arrays tree, plus the evaluation time of the last two.
+
+Memory is what tracemalloc sees retained after building every expression
+of a corpus from its text, numbers and names included.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_memory
+"""
+import timeit
+import tracemalloc
+
+from interpreter.lexer import NUMBER, VARIABLE
+from interpreter.parser import AST, UnOp, BinOp, Bool, Num, Boolean, Variable, Variable_Set, Func, Constants
+from interpreter.cache import parse
+from interpreter.optimizer import count_nodes
+from interpreter.interpreter import Interpreter
+from interpreter.flat import flatten, FlatInterpreter
+from interpreter.session import Session
+from benchmarks.corpora import CORPORA, VARIABLES, corpus
+
+# attributes of every node class before __slots__, which stored the token
+# of operator nodes twice, as `token` and `op`
+LEGACY_ATTRIBUTES = {
+    UnOp: ('token', 'op', 'value'),
+    BinOp: ('left', 'token', 'op', 'right'),
+    Bool: ('token', 'value'),
+    Num: ('token', 'value'),
+    Boolean: ('token', 'op', 'left', 'right', 'valueNumber'),
+    Variable: ('token', 'op', 'name'),
+    Variable_Set: ('token', 'op', 'name', 'value', 'assign'),
+    Func: ('token', 'op', 'value'),
+    Constants: ('token', 'op'),
+}
+
+
+class LegacyToken(object):
+    def __init__(self, type, value):
+        self.type = type
+        self.value = value
+
+
+class LegacyNode(object):
+    pass
+
+
+def legacy(node):
+    """Copy of a tree with a __dict__ per node and per number or variable
+    token, the operator tokens stay shared."""
+    copy = LegacyNode()
+    token = node.token
+    if token.type in (NUMBER, VARIABLE):
+        token = LegacyToken(token.type, token.value)
+    for name in LEGACY_ATTRIBUTES[type(node)]:
+        if name in ('token', 'op'):
+            value = token
+        elif name == 'valueNumber':
+            value = copy.left
+        else:
+            value = getattr(node, name)
+            if isinstance(value, AST):
+                value = legacy(value)
+        setattr(copy, name, value)
+    return copy
+
+
+def retained(build, lines):
+    """Bytes still allocated after building one object per line."""
+    tracemalloc.start()
+    objects = [build(text) for text in lines]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def main():
+    print('{:<12} {:>8} {:>10} {:>10} {:>10} {:>12} {:>12}'.format(
+        'corpus', 'nodes', 'dict', 'slots', 'flat', 'tree eval', 'flat eval'))
+    for name in sorted(CORPORA):
+        lines = corpus(name, 1000)
+        trees = [parse(text) for text in lines]
+        nodes = sum(count_nodes(tree) for tree in trees)
+        sizes = [retained(build, lines) / nodes for build in (
+            lambda text: legacy(parse(text)), parse, lambda text: flatten(parse(text)))]
+
+        tree_engine = Interpreter(None, Session(dict(VARIABLES)))
+        flat_engine = FlatInterpreter(None, Session(dict(VARIABLES)))
+        for tree in trees:
+            assert tree_engine.evaluate(tree) == flat_engine.evaluate(tree)
+        tree_time = min(timeit.repeat(lambda: [tree_engine.evaluate(tree) for tree in trees],
+                                      number=1, repeat=3)) / len(trees)
+        flat_time = min(timeit.repeat(lambda: [flat_engine.evaluate(tree) for tree in trees],
+                                      number=1, repeat=3)) / len(trees)
+        print('{:<12} {:>8} {:>8.1f} B {:>8.1f} B {:>8.1f} B {:>9.1f} us {:>9.1f} us'.format(
+            name, nodes, sizes[0], sizes[1], sizes[2], tree_time * 1e6, flat_time * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Cost of the metrics instrumentation: end to end evaluation time before
+metrics are enabled, while they are collected and after they are disabled
+again, which should match the first.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_metrics
+"""
+import timeit
+
+from interpreter import metrics
+from interpreter.lexer import Lexer
+from interpreter.parser import Parser
+from interpreter.interpreter import Interpreter
+from interpreter.session import Session
+from benchmarks.corpora import VARIABLES, corpus
+
+
+def main():
+    lines = corpus('variables', 200) + corpus('functions', 200)
+    session = Session(dict(VARIABLES))
+
+    def run():
+        for text in lines:
+            Interpreter(Parser(Lexer(text)), session).interpret()
+
+    def timed():
+        return min(timeit.repeat(run, number=1, repeat=7)) / len(lines)
+
+    before = timed()
+    metrics.enable()
+    enabled = timed()
+    metrics.disable()
+    after = timed()
+    print('{:<10} {:>8.2f} us'.format('disabled', before * 1e6))
+    print('{:<10} {:>8.2f} us {:>+7.1f}%'.format('enabled', enabled * 1e6, (enabled - before) * 100 / before))
+    print('{:<10} {:>8.2f} us {:>+7.1f}%'.format('restored', after * 1e6, (after - before) * 100 / before))
+    print()
+    print(metrics.registry.summary())
+
+
+if __name__ == '__main__':
+    main()
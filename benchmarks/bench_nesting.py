@@ -0,0 +1,77 @@
+"""Evaluation cost as a function of nesting depth.
+
+Every subtree is evaluated exactly once, so doubling the nesting depth of
+SQRT(SQRT(...)) or of chained divisions must roughly double the time. The
+benchmark fails (exit status 1) when the cost grows faster than linearly.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_nesting
+"""
+import sys
+import timeit
+
+from interpreter.lexer import Lexer
+from interpreter.parser import Parser
+from interpreter.engines import ENGINES
+
+DEPTHS = (10, 20, 40, 80)
+
+# Time per level at the deepest nesting may be at most this many times the
+# time per level at the shallowest one.
+MAX_GROWTH = 2.5
+
+
+def nested_functions(depth):
+    return 'SQRT(' * depth + '65536.0' + ')' * depth
+
+
+def nested_integer_functions(depth):
+    return 'POW(' * depth + '1' + ')' * depth
+
+
+def chained_divisions(depth):
+    return '(' * depth + '1000000000' + ' / 3)' * depth
+
+
+def chained_float_divisions(depth):
+    return '(' * depth + '1000000000.0' + ' / 1.5)' * depth
+
+
+CASES = (
+    ('SQRT nesting', nested_functions),
+    ('POW nesting', nested_integer_functions),
+    ('int division', chained_divisions),
+    ('float division', chained_float_divisions),
+)
+
+
+def per_level(engine, text, depth, number=200):
+    tree = Parser(Lexer(text)).parse()
+    interpreter = engine(None)
+    if hasattr(interpreter, 'compile'):
+        evaluate = interpreter.compile(tree).evaluate
+    else:
+        evaluate = lambda: interpreter.evaluate(tree)
+    seconds = min(timeit.repeat(evaluate, number=number, repeat=5))
+    return seconds / number / depth
+
+
+def main():
+    failed = False
+    for engine_name in sorted(ENGINES):
+        engine = ENGINES[engine_name]
+        for name, build in CASES:
+            times = [per_level(engine, build(depth), depth) for depth in DEPTHS]
+            growth = times[-1] / times[0]
+            verdict = 'ok' if growth <= MAX_GROWTH else 'SUPERLINEAR'
+            failed = failed or growth > MAX_GROWTH
+            print('{:<8} {:<15} {}  growth {:.2f} {}'.format(
+                engine_name, name,
+                ' '.join('{:>3}: {:6.3f} us/level'.format(depth, t * 1e6) for depth, t in zip(DEPTHS, times)),
+                growth, verdict))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""Evaluation time of stored formulas with and without the optimizer.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_optimizer
+"""
+import timeit
+
+from interpreter.cache import parse
+from interpreter.optimizer import Optimizer
+from interpreter.session import Session
+from interpreter.engines import ENGINES
+
+# formulas with the kind of constant parts stored formulas tend to have
+FORMULAS = (
+    'price * (1 + 0.2) - fee * (100 / 4) / 100',
+    'amount * SIN(RAD(30.0)) + amount * COS(RAD(60.0)) * 1',
+    'SQRT(POW(3.0) + POW(4.0)) * radius * PI / 180',
+    '(qty * 1 + 0) * price - LOG(1000) * E * fee',
+    'total - -(DEG(PI / 4) * rate ) < limit * (2 << 3) * 1',
+)
+
+VARIABLES = {'price': 12.5, 'fee': 3, 'amount': 7.25, 'radius': 2.0,
+             'qty': 40, 'total': 1000, 'rate': 0.05, 'limit': 10}
+
+
+def evaluator(interpreter, tree):
+    """Callable evaluating the tree, compiled first if the engine compiles."""
+    if hasattr(interpreter, 'compile'):
+        compiled = interpreter.compile(tree)
+        return lambda: compiled.evaluate(interpreter.session)
+    return lambda: interpreter.evaluate(tree)
+
+
+def main():
+    number = 20000
+    print('{:<8} {:>10} {:>10} {:>8}  {}'.format('engine', 'plain', 'optimized', 'speedup', 'formula'))
+    for text in FORMULAS:
+        tree = parse(text)
+        optimizer = Optimizer()
+        optimized = optimizer.optimize(tree)
+        for name in sorted(ENGINES):
+            interpreter = ENGINES[name](None, Session(dict(VARIABLES)))
+            plain = evaluator(interpreter, tree)
+            fast = evaluator(interpreter, optimized)
+            assert plain() == fast()
+            before = min(timeit.repeat(plain, number=number, repeat=5)) / number
+            after = min(timeit.repeat(fast, number=number, repeat=5)) / number
+            print('{:<8} {:>7.2f} us {:>7.2f} us {:>7.2f}x  {}'.format(
+                name, before * 1e6, after * 1e6, before / after, text))
+        print('{:<8} {}'.format('', optimizer.stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Lines per second of the process-pool evaluator for different worker counts.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_parallel
+"""
+import io
+import os
+import time
+
+from interpreter.batch import ResultWriter, run
+from interpreter.cache import ExpressionCache
+from interpreter.engines import Evaluator
+from interpreter import parallel
+
+from .bench_batch import script
+
+
+def measure(lines, workers):
+    out = io.StringIO()
+    start = time.perf_counter()
+    if workers == 0:
+        run(Evaluator(cache=ExpressionCache()), lines, ResultWriter(out, out))
+    else:
+        parallel.run(parallel.ParallelEvaluator(workers), lines, ResultWriter(out, out))
+    return time.perf_counter() - start, out.getvalue()
+
+
+def main():
+    lines = script(400000)
+    seconds, expected = measure(lines, 0)
+    print('{:<12} {:>12,.0f} lines/sec'.format('sequential', len(lines) / seconds))
+    for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        seconds, output = measure(lines, workers)
+        assert output == expected
+        print('{:<12} {:>12,.0f} lines/sec'.format('{} workers'.format(workers), len(lines) / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Parse throughput of the precedence climbing Parser against the
+RecursiveDescentParser, and how both scale with nesting depth.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_parser
+"""
+import time
+
+from interpreter.lexer import Lexer
+from interpreter.parser import Parser, RecursiveDescentParser
+from benchmarks.bench_engines import balanced
+
+PARSERS = (('recursive', RecursiveDescentParser), ('climbing', Parser))
+
+
+def flat(operators):
+    """1 + 2 * 3 - 4 ... with the given number of binary operators."""
+    parts = ['1']
+    for i in range(operators):
+        parts.append(('+', '*', '-', '/')[i % 4])
+        parts.append(str(i % 9 + 1))
+    return ' '.join(parts)
+
+
+def parenthesized(depth):
+    return '(' * depth + '1' + ')' * depth
+
+
+def functions(depth):
+    return 'SQRT(' * depth + '1.5' + ')' * depth
+
+
+def comparisons(depth):
+    """Right nested comparisons and shifts: 1 < 2 << 3 < ..."""
+    return ' '.join('{} {}'.format(i % 9 + 1, ('<', '<<', '>=', '>>')[i % 4]) for i in range(depth)) + ' 1'
+
+
+def timed(parser, text, repeat=3):
+    """Best time to parse text, or the name of the error raised."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            parser(Lexer(text)).parse()
+        except RecursionError:
+            return 'RecursionError'
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def report(name, text):
+    cells = []
+    for _, parser in PARSERS:
+        result = timed(parser, text)
+        if isinstance(result, str):
+            cells.append('{:>16}'.format(result))
+        else:
+            cells.append('{:>10.2f} ms   '.format(result * 1e3))
+    print('{:<26} {:>9} '.format(name, len(text)) + ''.join(cells))
+
+
+def main():
+    print('{:<26} {:>9} '.format('expression', 'chars') + ''.join('{:>16}'.format(name) for name, _ in PARSERS))
+    for size in (10 ** 3, 10 ** 4, 10 ** 5):
+        report('flat {}'.format(size), flat(size))
+    for depth in (8, 12, 16):
+        report('balanced {}'.format(depth), balanced(depth))
+    for depth in (100, 10 ** 3, 10 ** 4, 10 ** 5):
+        report('parentheses {}'.format(depth), parenthesized(depth))
+        report('SQRT nesting {}'.format(depth), functions(depth))
+        report('comparisons {}'.format(depth), comparisons(depth))
+
+
+if __name__ == '__main__':
+    main()
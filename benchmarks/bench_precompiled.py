@@ -0,0 +1,44 @@
+"""Startup cost of a formula library: lexing and parsing every line of the
+script against loading its compiled form from __rafcache__/.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_precompiled
+"""
+import os
+import shutil
+import tempfile
+import timeit
+
+from interpreter import precompiled
+from benchmarks.corpora import CORPORA, corpus
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'library.raf')
+    print('{:<15} {:>9} {:>12} {:>12} {:>9} {:>10}'.format(
+        'corpus', 'formulas', 'parse', 'cached', 'speedup', 'size'))
+    try:
+        for name in sorted(CORPORA):
+            for optimize_tree in (False, True):
+                lines = corpus(name, 3000)
+                with open(path, 'w') as script:
+                    script.write('\n'.join(lines) + '\n')
+                precompiled.compile_file(path, optimize_tree)
+                parse_time = min(timeit.repeat(
+                    lambda: precompiled.compile_source(precompiled.read_source(path)[0], optimize_tree),
+                    number=1, repeat=3))
+                cached_time = min(timeit.repeat(
+                    lambda: precompiled.cached(path, optimize_tree), number=1, repeat=3))
+                assert len(precompiled.cached(path, optimize_tree)) == len(set(lines))
+                size = os.path.getsize(precompiled.cache_path(path, optimize_tree))
+                print('{:<15} {:>9} {:>9.1f} ms {:>9.1f} ms {:>8.1f}x {:>7.0f} KB'.format(
+                    name + (' -O' if optimize_tree else ''), len(lines), parse_time * 1e3,
+                    cached_time * 1e3, parse_time / cached_time, size / 1024))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
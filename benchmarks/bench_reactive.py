@@ -0,0 +1,56 @@
+"""Cost of updating one input of a session with many derived variables:
+re-running every assignment versus recomputing only the dependents.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_reactive
+"""
+import timeit
+
+from interpreter.cache import ExpressionCache
+from interpreter.engines import Evaluator
+from interpreter.reactive import ReactiveEvaluator
+
+
+def script(inputs, derived):
+    """`inputs` variables and `derived` variables, each derived one reading
+    one input and the previous derived variable of the same input."""
+    lines = ['in{} = {}'.format(i, i + 1) for i in range(inputs)]
+    for i in range(derived):
+        source = i % inputs
+        previous = 'd{} '.format(i - inputs) if i >= inputs else '1'
+        lines.append('d{} = in{} * 2 + {} % 97'.format(i, source, previous))
+    return lines
+
+
+def main():
+    inputs, derived = 50, 2000
+    lines = script(inputs, derived)
+    number = 20
+    plain = Evaluator(cache=ExpressionCache(4096))
+    reactive = ReactiveEvaluator(cache=ExpressionCache(4096))
+    for text in lines:
+        plain.evaluate(text)
+        reactive.evaluate(text)
+
+    def rerun():
+        plain.evaluate('in0 = 7')
+        for text in lines[inputs:]:
+            plain.evaluate(text)
+
+    def update():
+        reactive.evaluate('in0 = 7')
+
+    update()
+    rerun()
+    assert plain.session.variables == reactive.session.variables
+    before = min(timeit.repeat(rerun, number=number, repeat=5)) / number
+    after = min(timeit.repeat(update, number=number, repeat=5)) / number
+    print('{} inputs, {} derived variables, {} recomputed per update'.format(
+        inputs, derived, len(reactive.recomputed)))
+    print('re-run script  {:>9.1f} us'.format(before * 1e6))
+    print('reactive       {:>9.1f} us   {:.1f}x'.format(after * 1e6, before / after))
+
+
+if __name__ == '__main__':
+    main()
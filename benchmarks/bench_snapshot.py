@@ -0,0 +1,71 @@
+"""Restoring a session by replaying its assignments against loading a
+snapshot of it, for plain sessions of many variables and for reactive
+sessions whose variables are formulas of the others.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_snapshot
+"""
+import os
+import random
+import tempfile
+import time
+
+from interpreter import snapshot
+from interpreter.engines import Evaluator
+from interpreter.reactive import ReactiveEvaluator
+from interpreter.session import Session
+
+
+def assignments(count, formulas, seed=0):
+    """Assignment lines of `count` variables; with formulas, every variable
+    after the first hundred is computed from two earlier ones."""
+    generator = random.Random(seed)
+    lines = []
+    for index in range(count):
+        if formulas and index >= 100:
+            first, second = generator.randrange(index), generator.randrange(index)
+            lines.append('v{} = v{} * 2 + SQRT(v{} ) - {}'.format(index, first, second, index % 7))
+        elif index % 2:
+            lines.append('v{} = {}'.format(index, generator.randrange(10 ** 6)))
+        else:
+            lines.append('v{} = {}'.format(index, round(generator.uniform(1, 1000), 3)))
+    return lines
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def replay(evaluator_class, lines):
+    evaluator = evaluator_class(Session())
+    for text in lines:
+        evaluator.evaluate(text)
+    return evaluator
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), 'session.snap')
+    print('{:<10} {:>9} {:>12} {:>12} {:>12} {:>9} {:>10}'.format(
+        'session', 'variables', 'replay', 'save', 'load', 'speedup', 'size'))
+    # replaying formulas checks each one for cycles against all the others
+    for evaluator_class, formulas, counts in ((Evaluator, False, (1000, 10000, 100000)),
+                                              (ReactiveEvaluator, True, (1000, 10000))):
+        for count in counts:
+            lines = assignments(count, formulas)
+            replay_time, evaluator = timed(lambda: replay(evaluator_class, lines))
+            save_time, _ = timed(lambda: snapshot.save(path, evaluator))
+            restored = evaluator_class(Session())
+            load_time, _ = timed(lambda: snapshot.restore(path, restored))
+            assert restored.session.variables == evaluator.session.variables
+            print('{:<10} {:>9} {:>9.1f} ms {:>9.1f} ms {:>9.1f} ms {:>8.1f}x {:>7.0f} KB'.format(
+                'reactive' if formulas else 'plain', count, replay_time * 1e3, save_time * 1e3,
+                load_time * 1e3, replay_time / load_time, os.path.getsize(path) / 1024))
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+
+
+if __name__ == '__main__':
+    main()
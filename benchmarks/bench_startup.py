@@ -0,0 +1,152 @@
+"""Cold start of the command line: wall time of whole processes running
+one expression, and what their imports cost (`python -X importtime`).
+
+The plain `-c EXPR` runs must not import any of HEAVY; with a baseline
+from an earlier run, a median time that got slower by more than the
+threshold is a regression too. Either makes the exit status 1.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup -o startup.json
+    python -m benchmarks.bench_startup --baseline startup.json --threshold 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# label -> arguments after `python`; SCRIPT is replaced by a script file
+COMMANDS = (
+    ('python', ['-c', 'pass']),
+    ('-c', [ROOT, '-c', '1 + 2 * 3']),
+    ('-c functions', [ROOT, '-c', 'SQRT(16) + SIN(1) * LOG(100)']),
+    ('-c --quiet', [ROOT, '--quiet', '-c', '1 + 2 * 3']),
+    ('-c -O', [ROOT, '-O', '-c', '1 + 2 * 3']),
+    ('-c --engine python', [ROOT, '--engine', 'python', '-c', '1 + 2 * 3']),
+    ('script', [ROOT, 'SCRIPT']),
+)
+
+# modules a plain -c run has no use for
+PLAIN = ('-c', '-c functions')
+HEAVY = (
+    'argparse', 'asyncio', 'multiprocessing', 'concurrent.futures', 'numpy',
+    'interpreter.server', 'interpreter.parallel', 'interpreter.pool', 'interpreter.metrics',
+    'interpreter.reactive', 'interpreter.snapshot', 'interpreter.precompiled', 'interpreter.optimizer',
+    'interpreter.dag', 'interpreter.compiler', 'interpreter.bytecode', 'interpreter.codegen',
+    'interpreter.flat', 'interpreter.inference', 'interpreter.vectorized', 'interpreter.pipeline',
+    'interpreter.tiering',
+)
+
+
+def imports(arguments):
+    """(module, self us, cumulative us) of every import of one run."""
+    process = subprocess.run([sys.executable, '-X', 'importtime'] + arguments,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    modules = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(own), int(cumulative)))
+    return modules
+
+
+def wall_times(arguments, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def measure(runs, script):
+    results = {}
+    for label, arguments in COMMANDS:
+        arguments = [script if argument == 'SCRIPT' else argument for argument in arguments]
+        times = wall_times(arguments, runs)
+        modules = imports(arguments)
+        results[label] = {
+            'median_ms': statistics.median(times) * 1e3,
+            'min_ms': min(times) * 1e3,
+            'modules': len(modules),
+            'import_ms': sum(own for _, own, _ in modules) / 1e3,
+            'rafmath_ms': sum(own for name, own, _ in modules if name.startswith('interpreter')) / 1e3,
+            'imported': sorted(name for name, _, _ in modules),
+            'slowest': sorted(modules, key=lambda module: -module[1])[:10],
+        }
+    return results
+
+
+def heavy_imports(results):
+    """(label, module) of every module of HEAVY imported by a plain run."""
+    found = []
+    for label in PLAIN:
+        for name in results[label]['imported']:
+            if any(name == heavy or name.startswith(heavy + '.') for heavy in HEAVY):
+                found.append((label, name))
+    return found
+
+
+def regressions(baseline, results, threshold):
+    """(label, before, after) of every median that got slower than the
+    threshold allows."""
+    return [(label, baseline[label]['median_ms'], result['median_ms'])
+            for label, result in sorted(results.items())
+            if label in baseline
+            and result['median_ms'] > baseline[label]['median_ms'] * (1 + threshold / 100.0)]
+
+
+def main():
+    arguments = argparse.ArgumentParser(prog='python -m benchmarks.bench_startup')
+    arguments.add_argument('-n', '--runs', type=int, default=20, help='processes per command')
+    arguments.add_argument('-o', '--output', metavar='FILE', help='write the results as JSON')
+    arguments.add_argument('--baseline', metavar='FILE', help='results of an earlier run to compare with')
+    arguments.add_argument('--threshold', type=float, default=20.0,
+                           help='allowed slowdown of the median, in percent (default: %(default)s)')
+    options = arguments.parse_args()
+
+    with tempfile.NamedTemporaryFile('w', suffix='.raf', delete=False) as script:
+        script.write('x = 2\nx * 3 + SQRT(16)\n')
+    try:
+        results = measure(options.runs, script.name)
+    finally:
+        os.remove(script.name)
+
+    print('{:<20} {:>10} {:>10} {:>8} {:>10} {:>10}'.format(
+        'command', 'median', 'min', 'modules', 'imports', 'rafmath'))
+    for label, _ in COMMANDS:
+        result = results[label]
+        print('{:<20} {:>7.1f} ms {:>7.1f} ms {:>8} {:>7.1f} ms {:>7.1f} ms'.format(
+            label, result['median_ms'], result['min_ms'], result['modules'],
+            result['import_ms'], result['rafmath_ms']))
+    print('\nslowest imports of -c (self, cumulative):')
+    for name, own, cumulative in results['-c']['slowest']:
+        print('  {:<32} {:>7.2f} ms {:>7.2f} ms'.format(name, own / 1e3, cumulative / 1e3))
+
+    failed = False
+    for label, name in heavy_imports(results):
+        print('{} imports {}'.format(label, name))
+        failed = True
+    if options.baseline:
+        with open(options.baseline) as source:
+            baseline = json.load(source)
+        for label, before, after in regressions(baseline, results, options.threshold):
+            print('{} regressed: {:.1f} ms -> {:.1f} ms'.format(label, before, after))
+            failed = True
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+            output.write('\n')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Lexing a large expression file through mmap with the StreamingLexer
+against reading it into one string for the Lexer: tokens per second and
+peak memory.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_stream [megabytes]
+"""
+import mmap
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from interpreter.lexer import Lexer, StreamingLexer, EOF
+from benchmarks.bench_lexer import corpus
+
+
+def whole(path):
+    with open(path) as source:
+        return Lexer(source.read())
+
+
+def streaming(path):
+    with open(path, 'rb') as source:
+        # the mapping stays valid after the file is closed
+        mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+    return StreamingLexer(mapped)
+
+
+def count(lexer):
+    tokens = 0
+    while lexer.get_next_token().type != EOF:
+        tokens += 1
+    return tokens
+
+
+def measure(name, open_lexer, path):
+    start = time.perf_counter()
+    tokens = count(open_lexer(path))
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    count(open_lexer(path))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('{:<10} {:>10} {:>8.2f} s {:>12,.0f} {:>10.1f} MB'.format(
+        name, tokens, elapsed, tokens / elapsed, peak / 2 ** 20))
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    piece = corpus(2 ** 20)
+    with tempfile.NamedTemporaryFile('w', suffix='.raf', delete=False) as script:
+        for _ in range(megabytes):
+            script.write(piece)
+        path = script.name
+    try:
+        print('{:<10} {:>10} {:>10} {:>12} {:>13}'.format('lexer', 'tokens', 'time', 'tokens/sec', 'peak memory'))
+        measure('string', whole, path)
+        measure('mmap', streaming, path)
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Skewed traffic, as a server sees it: a few formulas make up most of the
+requests, the others are evaluated once or twice. Compares the tree
+walker, compiling every expression up front, and the tiered engine at a
+few thresholds (compiling only the hot ones).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_tiering
+"""
+import random
+import time
+
+from interpreter.cache import ExpressionCache
+from interpreter.engines import Evaluator
+from interpreter.session import Session
+from interpreter import tiering
+from benchmarks.corpora import VARIABLES, corpus
+
+DISTINCT = 3000
+REQUESTS = 100000
+# share of the requests that go to the HOT most popular formulas
+HOT = 20
+HOT_SHARE = 0.9
+
+
+def requests(seed=0):
+    formulas = corpus('variables', DISTINCT, seed) + corpus('functions', DISTINCT, seed)
+    generator = random.Random(seed)
+    generator.shuffle(formulas)
+    hot, cold = formulas[:HOT], formulas[HOT:]
+    return [generator.choice(hot) if generator.random() < HOT_SHARE else generator.choice(cold)
+            for _ in range(REQUESTS)]
+
+
+def run(engine, texts):
+    evaluator = Evaluator(Session(dict(VARIABLES)), engine, ExpressionCache(len(texts)))
+    start = time.perf_counter()
+    for text in texts:
+        evaluator.evaluate(text)
+    return time.perf_counter() - start
+
+
+def main():
+    texts = requests()
+    print('{} requests, {} distinct formulas, {:.0%} to {} of them'.format(
+        len(texts), len(set(texts)), HOT_SHARE, HOT))
+    print('{:<32} {:>12} {:>12}   {}'.format('engine', 'seconds', 'requests/s', 'tiering'))
+    for engine in ('tree', 'closure', 'python'):
+        seconds = run(engine, texts)
+        print('{:<32} {:>12.3f} {:>12,.0f}'.format(engine, seconds, len(texts) / seconds))
+    # the last one keeps fewer compiled forms than there are hot formulas
+    for threshold, maxsize, compiler in ((10, 256, 'closure'), (10, 256, 'python'), (50, 256, 'closure'),
+                                         (50, 256, 'python'), (200, 256, 'python'), (50, HOT // 2, 'python')):
+        tiering.default_manager = manager = tiering.TieringManager(threshold, maxsize, compiler)
+        seconds = run('tiered', texts)
+        manager.wait()
+        print('{:<32} {:>12.3f} {:>12,.0f}   {}'.format(
+            'tiered {} at {}, {} kept'.format(compiler, threshold, maxsize), seconds, len(texts) / seconds,
+            manager.stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Rows per second of per-row interpretation versus NumPy batch evaluation.
+
+Requires NumPy. Run from the repository root:
+
+    python -m benchmarks.bench_vectorized
+"""
+import time
+
+import numpy
+
+from interpreter.lexer import Lexer
+from interpreter.parser import Parser, variables
+from interpreter.interpreter import Interpreter
+from interpreter.vectorized import evaluate
+
+FORMULA = 'SQRT(price * qty + fee ) - LOG(qty + 1) * 2.5 / (fee + 1)'
+
+
+def columns(rows, seed=0):
+    generator = numpy.random.RandomState(seed)
+    return {
+        'price': generator.uniform(1, 100, rows),
+        'qty': generator.randint(1, 1000, rows),
+        'fee': generator.uniform(0, 5, rows),
+    }
+
+
+def per_row(tree, data):
+    interpreter = Interpreter(None)
+    results = []
+    for row in range(len(data['qty'])):
+        for name in data:
+            variables[name] = data[name][row].item()
+        results.append(interpreter.evaluate(tree))
+    return results
+
+
+def main():
+    tree = Parser(Lexer(FORMULA)).parse()
+    small = columns(10 ** 4)
+    start = time.perf_counter()
+    expected = per_row(tree, small)
+    row_seconds = time.perf_counter() - start
+
+    assert numpy.allclose(evaluate(tree, small), expected, atol=1e-3)
+
+    large = columns(10 ** 6)
+    start = time.perf_counter()
+    evaluate(tree, large)
+    batch_seconds = time.perf_counter() - start
+
+    row_rate = len(small['qty']) / row_seconds
+    batch_rate = len(large['qty']) / batch_seconds
+    print('formula: {}'.format(FORMULA))
+    print('per row    {:>14,.0f} rows/sec'.format(row_rate))
+    print('vectorized {:>14,.0f} rows/sec ({:.0f}x)'.format(batch_rate, batch_rate / row_rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Deterministic expression corpora for the benchmark suite.
+
+Every corpus is a list of expression lines; the variables they read are
+in VARIABLES. The same name, size and seed always give the same corpus,
+so results of different runs can be compared.
+"""
+import random
+
+# functions of positive arguments with positive results, and the
+# functions applied to those
+INNER_FUNCTIONS = ('SQRT', 'LOG', 'POW', 'DEG', 'RAD')
+OUTER_FUNCTIONS = ('SIN', 'COS', 'TG', 'SQRT', 'POW')
+COMPARISONS = ('<', '<=', '>', '>=', '==')
+
+VARIABLES = {'v{}'.format(i): (i % 13 + 1) * (1.5 if i % 2 else 1) for i in range(50)}
+
+
+def number(generator):
+    if generator.random() < 0.3:
+        return '{}.{}'.format(generator.randint(1, 99), generator.randint(0, 9))
+    return str(generator.randint(1, 99))
+
+
+def flat(generator):
+    """Arithmetic on numbers, 20 to 40 operators."""
+    parts = [number(generator)]
+    for _ in range(generator.randint(20, 40)):
+        parts.append(generator.choice('+-*'))
+        parts.append(number(generator))
+    return ' '.join(parts)
+
+
+def nested(generator):
+    """Right-nested parentheses, 30 to 60 levels deep."""
+    text = number(generator)
+    for _ in range(generator.randint(30, 60)):
+        text = '({} {} {})'.format(number(generator), generator.choice('+-*'), text)
+    return text
+
+
+def functions(generator):
+    """Sums of function calls, some of them nested."""
+    parts = []
+    for _ in range(generator.randint(5, 10)):
+        call = '{}({}.{})'.format(generator.choice(INNER_FUNCTIONS), generator.randint(10, 99),
+                                  generator.randint(0, 9))
+        if generator.random() < 0.5:
+            call = '{}({})'.format(generator.choice(OUTER_FUNCTIONS), call)
+        parts.append(call)
+    return ' + '.join(parts)
+
+
+def variables(generator):
+    """Arithmetic mostly on variables."""
+    parts = [generator.choice(sorted(VARIABLES)) + ' ']
+    for _ in range(generator.randint(15, 30)):
+        parts.append(generator.choice('+-*'))
+        if generator.random() < 0.8:
+            parts.append(generator.choice(sorted(VARIABLES)) + ' ')
+        else:
+            parts.append(number(generator))
+    return ' '.join(parts)
+
+
+def comparisons(generator):
+    """Chains of 5 to 10 comparisons between small sums."""
+    parts = []
+    for _ in range(generator.randint(6, 11)):
+        parts.append('{} + {}'.format(number(generator), generator.choice(sorted(VARIABLES)) + ' '))
+    return ' {} '.format(generator.choice(COMPARISONS)).join(parts)
+
+
+CORPORA = {
+    'flat': flat,
+    'nested': nested,
+    'functions': functions,
+    'variables': variables,
+    'comparisons': comparisons,
+}
+
+
+def corpus(name, size=500, seed=0):
+    """`size` expression lines of the named corpus."""
+    generator = random.Random('{}:{}'.format(name, seed))
+    return [CORPORA[name](generator) for _ in range(size)]
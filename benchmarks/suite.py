@@ -0,0 +1,199 @@
+"""Benchmark suite: times the Lexer, the Parser and an evaluation engine
+separately and end to end on the generated corpora, and compares results
+against a stored baseline.
+
+Every measurement records operations (expressions, or rows for the csv
+stage) per second, latency percentiles of single operations (of chunks of
+CSV_CHUNK rows for the csv stage) and the peak memory allocated during one
+pass over the corpus (tracemalloc, measured in a separate pass so tracing
+doesn't slow down the timed ones).
+
+See benchmarks/__main__.py for the command line.
+"""
+import csv
+import datetime
+import itertools
+import json
+import platform
+import random
+import time
+import tracemalloc
+
+from interpreter.lexer import Lexer, EOF, EOF_TOKEN
+from interpreter.parser import Parser
+from interpreter.interpreter import Interpreter
+from interpreter.session import Session
+from interpreter.engines import get_engine, DEFAULT_ENGINE
+from interpreter.pipeline import Pipeline, has_comparison
+from benchmarks.corpora import CORPORA, VARIABLES, corpus
+
+# csv: rows/s of the column pipeline, with the first expression of the
+# corpus as filter (if it compares) or projection over a table of VARIABLES
+STAGES = ('lex', 'parse', 'interpret', 'end_to_end', 'csv')
+
+# rows per operation of the csv stage
+CSV_CHUNK = 100
+
+# version of the results file format
+FORMAT = 1
+
+# metric -> True if higher values are better
+METRICS = {
+    'ops_per_sec': True,
+    'p50_us': False,
+    'peak_memory': False,
+}
+
+
+class TokenReplay(object):
+    """Lexer stand-in returning already lexed tokens, to time the parser alone."""
+
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+
+    def get_next_token(self):
+        return next(self.tokens, EOF_TOKEN)
+
+
+def tokens(text):
+    lexer = Lexer(text)
+    result = []
+    token = lexer.get_next_token()
+    while token.type != EOF:
+        result.append(token)
+        token = lexer.get_next_token()
+    return result
+
+
+class Discard(object):
+    """Output stream that drops what is written."""
+
+    def write(self, text):
+        return len(text)
+
+
+def table(size):
+    """CSV header line and `size` lines of rows of the columns in VARIABLES."""
+    generator = random.Random(0)
+    names = sorted(VARIABLES)
+    rows = [','.join(str(VARIABLES[name] * generator.randint(1, 9)) for name in names) for _ in range(size)]
+    return ','.join(names), rows
+
+
+def stage(name, lines, engine):
+    """Inputs and the operation timed for one stage."""
+    if name == 'lex':
+        return lines, tokens
+    elif name == 'parse':
+        return [tokens(text) for text in lines], lambda items: Parser(TokenReplay(items)).parse()
+    elif name == 'interpret':
+        interpreter = get_engine(engine)(None, Session(dict(VARIABLES)))
+        trees = [Parser(Lexer(text)).parse() for text in lines]
+        if hasattr(interpreter, 'compile'):
+            # compiled once, like a cached formula
+            compiled = [interpreter.compile(tree) for tree in trees]
+            return compiled, lambda expression: expression.evaluate(interpreter.session)
+        return trees, interpreter.evaluate
+    elif name == 'end_to_end':
+        session = Session(dict(VARIABLES))
+        return lines, lambda text: Interpreter(Parser(Lexer(text)), session).interpret()
+    elif name == 'csv':
+        header, rows = table(len(lines))
+        pipeline = Pipeline([lines[0]], chunk_size=CSV_CHUNK, engine=engine)
+        if has_comparison(pipeline.projections[0][1]):
+            pipeline = Pipeline(where=lines[0], chunk_size=CSV_CHUNK, engine=engine)
+        writer = csv.writer(Discard())
+        chunks = [rows[start:start + CSV_CHUNK] for start in range(0, len(rows), CSV_CHUNK)]
+        return chunks, lambda chunk: pipeline.run(csv.reader(itertools.chain([header], chunk)), writer)
+    raise Exception('Unknown stage {}'.format(name))
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of sorted samples."""
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(inputs, operation, repeat, weight=1):
+    """Measure `operation` over `inputs`, each of which counts as `weight`
+    operations in ops and ops_per_sec."""
+    samples = []
+    best = None
+    clock = time.perf_counter
+    for _ in range(repeat):
+        start = clock()
+        for item in inputs:
+            begin = clock()
+            operation(item)
+            samples.append(clock() - begin)
+        elapsed = clock() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    for item in inputs:
+        operation(item)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    samples.sort()
+    return {
+        'ops': len(inputs) * weight,
+        'ops_per_sec': len(inputs) * weight / best,
+        'p50_us': percentile(samples, 0.5) * 1e6,
+        'p90_us': percentile(samples, 0.9) * 1e6,
+        'p99_us': percentile(samples, 0.99) * 1e6,
+        'peak_memory': peak,
+    }
+
+
+def run(corpora=None, stages=STAGES, size=500, repeat=3, engine=DEFAULT_ENGINE, seed=0, progress=None):
+    """Measure every stage on every corpus, return the results document."""
+    results = {}
+    for corpus_name in corpora or sorted(CORPORA):
+        lines = corpus(corpus_name, size, seed)
+        for stage_name in stages:
+            inputs, operation = stage(stage_name, lines, engine)
+            key = '{}/{}'.format(corpus_name, stage_name)
+            weight = CSV_CHUNK if stage_name == 'csv' else 1
+            results[key] = measure(inputs, operation, repeat, weight)
+            if progress is not None:
+                progress(key, results[key])
+    return {
+        'format': FORMAT,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'engine': engine,
+        'size': size,
+        'seed': seed,
+        'results': results,
+    }
+
+
+def save(document, path):
+    with open(path, 'w') as output:
+        json.dump(document, output, indent=2, sort_keys=True)
+        output.write('\n')
+
+
+def load(path):
+    with open(path) as source:
+        document = json.load(source)
+    if document.get('format') != FORMAT:
+        raise Exception('Unsupported benchmark results format in {}'.format(path))
+    return document
+
+
+def compare(baseline, current, threshold=10.0):
+    """Compare two results documents.
+
+    Returns (key, metric, baseline value, current value, change in percent,
+    regressed) rows; a metric regressed if it got worse by more than
+    `threshold` percent.
+    """
+    rows = []
+    for key in sorted(set(baseline['results']) & set(current['results'])):
+        for metric, higher_is_better in sorted(METRICS.items()):
+            before = baseline['results'][key][metric]
+            after = current['results'][key][metric]
+            change = (after - before) * 100.0 / before if before else 0.0
+            worse = -change if higher_is_better else change
+            rows.append((key, metric, before, after, change, worse > threshold))
+    return rows
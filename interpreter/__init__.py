@@ -1,3 +1,27 @@
-from . import lexer
-from . import parser
-from . import interpreter
\ No newline at end of file
+import importlib
+
+###############################################################################
+#                                                                             #
+#  PACKAGE                                                                    #
+#                                                                             #
+###############################################################################
+#
+# Submodules are imported when first used, as `interpreter.flat` or with
+# `from interpreter import flat`, so a one-line evaluation only loads the
+# lexer, the parser and the engine it runs on (see benchmarks/bench_startup.py).
+
+SUBMODULES = (
+    'lexer', 'functions', 'parser', 'session', 'interpreter', 'inference', 'compiler', 'bytecode',
+    'codegen', 'flat', 'engines', 'cache', 'optimizer', 'dag', 'loader', 'reactive', 'pool', 'batch',
+    'parallel', 'server', 'metrics', 'snapshot', 'precompiled', 'vectorized', 'pipeline', 'tiering',
+)
+
+
+def __getattr__(name):
+    if name in SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(SUBMODULES))
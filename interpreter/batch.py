@@ -0,0 +1,81 @@
+###############################################################################
+#                                                                             #
+#  BATCH                                                                      #
+#                                                                             #
+###############################################################################
+#
+# Non-interactive evaluation of scripts: every line is one expression, the
+# lines are streamed through one Evaluator and the results are written in
+# blocks instead of one print per line. A failing line is reported with its
+# line number and evaluation goes on with the next line.
+
+ALL = 'all'
+QUIET = 'quiet'
+LAST_ONLY = 'last-only'
+
+
+def error_message(error):
+    return str(error) or type(error).__name__
+
+
+class ResultWriter(object):
+    def __init__(self, out, errors, mode=ALL, buffer_size=1024):
+        self.out = out
+        self.errors = errors
+        self.mode = mode
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.last = None
+        self.has_result = False
+        self.error_count = 0
+
+    def result(self, value):
+        if self.mode == ALL:
+            self.buffer.append(str(value))
+            if len(self.buffer) >= self.buffer_size:
+                self.flush()
+        elif self.mode == LAST_ONLY:
+            self.last = value
+            self.has_result = True
+
+    def error(self, line_number, error):
+        self.error_count += 1
+        # keep results and errors in order when both go to a terminal
+        self.flush()
+        self.errors.write('line {}: {}\n'.format(line_number, error_message(error)))
+
+    def flush(self):
+        if self.buffer:
+            self.buffer.append('')
+            self.out.write('\n'.join(self.buffer))
+            self.buffer = []
+        self.out.flush()
+
+    def close(self):
+        if self.mode == LAST_ONLY and self.has_result:
+            self.buffer.append(str(self.last))
+        self.flush()
+
+
+def numbered_lines(lines):
+    """(line number, text) of the lines worth evaluating; stops at 'exit'."""
+    for number, text in enumerate(lines, 1):
+        text = text.rstrip('\r\n')
+        if not text.strip():
+            continue
+        if text.strip() == 'exit':
+            break
+        yield number, text
+
+
+def run(evaluator, lines, writer):
+    """Evaluate every line with the evaluator, returns the number of errors."""
+    for number, text in numbered_lines(lines):
+        try:
+            result = evaluator.evaluate(text)
+        except Exception as error:
+            writer.error(number, error)
+        else:
+            writer.result(result)
+    writer.close()
+    return writer.error_count
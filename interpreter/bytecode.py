@@ -0,0 +1,387 @@
+from array import array
+import weakref
+
+from .lexer import PLUS, MINUS, MUL, DIV, MOD, LEFT_SHIFT, RIGHT_SHIFT, \
+    TRUE, FALSE, PI, E_C, EQ, PLUS_EQUALS, MINUS_EQUALS, MUL_EQUALS, DIV_EQUALS
+from .interpreter import NodeVisitor, final_result, assign
+from .inference import INT, FLOAT, infer
+from .compiler import COMPARISONS
+from .functions import lookup
+from .session import default_session
+import math
+
+###############################################################################
+#                                                                             #
+#  BYTECODE                                                                   #
+#                                                                             #
+###############################################################################
+#
+# Compiles a parsed expression to a flat instruction stream for a small
+# stack machine. Every instruction is two unsigned integers, the opcode
+# and its argument, stored in one array; constants, variable names,
+# functions and comparisons are referenced by their index in the tables of
+# the Program. The machine is a single loop over the array, without the
+# per-node objects and method calls of the tree walking Interpreter.
+#
+# Expressions have no jumps, so instructions run in the order they were
+# emitted: a shared subexpression (see dag.py) is computed where it first
+# occurs, kept in a local slot and loaded from there afterwards.
+
+# opcodes; the order of the checks in run() follows how often they occur
+LOAD_CONST = 0
+LOAD_NAME = 1
+BINARY_ADD = 2
+BINARY_MUL = 3
+BINARY_SUB = 4
+BINARY_DIV = 5
+BINARY_FLOOR_DIV = 6
+BINARY_TRUE_DIV = 7
+BINARY_MOD = 8
+CALL = 9
+CALL_INT = 10
+CALL_FLOAT = 11
+COMPARE = 12
+NEGATE = 13
+LEFT_SHIFT_OP = 14
+RIGHT_SHIFT_OP = 15
+STORE_NAME = 16
+STORE_ADD = 17
+STORE_SUB = 18
+STORE_MUL = 19
+STORE_DIV = 20
+STORE_LOCAL = 21
+LOAD_LOCAL = 22
+
+OPNAMES = {
+    LOAD_CONST: 'LOAD_CONST',
+    LOAD_NAME: 'LOAD_NAME',
+    BINARY_ADD: 'BINARY_ADD',
+    BINARY_MUL: 'BINARY_MUL',
+    BINARY_SUB: 'BINARY_SUB',
+    BINARY_DIV: 'BINARY_DIV',
+    BINARY_FLOOR_DIV: 'BINARY_FLOOR_DIV',
+    BINARY_TRUE_DIV: 'BINARY_TRUE_DIV',
+    BINARY_MOD: 'BINARY_MOD',
+    CALL: 'CALL',
+    CALL_INT: 'CALL_INT',
+    CALL_FLOAT: 'CALL_FLOAT',
+    COMPARE: 'COMPARE',
+    NEGATE: 'NEGATE',
+    LEFT_SHIFT_OP: 'LEFT_SHIFT',
+    RIGHT_SHIFT_OP: 'RIGHT_SHIFT',
+    STORE_NAME: 'STORE_NAME',
+    STORE_ADD: 'STORE_ADD',
+    STORE_SUB: 'STORE_SUB',
+    STORE_MUL: 'STORE_MUL',
+    STORE_DIV: 'STORE_DIV',
+    STORE_LOCAL: 'STORE_LOCAL',
+    LOAD_LOCAL: 'LOAD_LOCAL',
+}
+
+BINARY = {
+    PLUS: BINARY_ADD,
+    MINUS: BINARY_SUB,
+    MUL: BINARY_MUL,
+    MOD: BINARY_MOD,
+    LEFT_SHIFT: LEFT_SHIFT_OP,
+    RIGHT_SHIFT: RIGHT_SHIFT_OP,
+}
+
+STORES = {
+    EQ: STORE_NAME,
+    PLUS_EQUALS: STORE_ADD,
+    MINUS_EQUALS: STORE_SUB,
+    MUL_EQUALS: STORE_MUL,
+    DIV_EQUALS: STORE_DIV,
+}
+
+# compound store opcode -> assignment token type for interpreter.assign
+COMPOUND = {
+    STORE_ADD: PLUS_EQUALS,
+    STORE_SUB: MINUS_EQUALS,
+    STORE_MUL: MUL_EQUALS,
+    STORE_DIV: DIV_EQUALS,
+}
+
+
+class Program(object):
+    def __init__(self, code, constants, names, functions, comparisons, locals_count):
+        # array of opcode, argument pairs
+        self.code = code
+        self.constants = constants
+        self.names = names
+        # (token type, implementation) pairs, referenced by CALL*
+        self.functions = functions
+        # (token type, implementation) pairs, referenced by COMPARE
+        self.comparisons = comparisons
+        # slots for shared subexpressions
+        self.locals_count = locals_count
+
+    def evaluate(self, session=None):
+        if session is None:
+            session = default_session
+        session.reset()
+        result = run(self, session)
+        return final_result(result, session.check_boolean, session.changed_boolean)
+
+    __call__ = evaluate
+
+    def __len__(self):
+        """Number of instructions."""
+        return len(self.code) // 2
+
+    def disassemble(self):
+        return disassemble(self)
+
+
+class BytecodeCompiler(NodeVisitor):
+    def __init__(self):
+        self.types = {}
+        self.code = []
+        self.constants = []
+        self.names = []
+        self.functions = []
+        self.comparisons = []
+        # (table, key) -> index of the entry in that table
+        self.positions = {}
+        # Shared node -> local slot holding its value
+        self.locals = {}
+
+    def compile(self, tree):
+        self.types = infer(tree)
+        self.code = []
+        self.constants = []
+        self.names = []
+        self.functions = []
+        self.comparisons = []
+        self.positions = {}
+        self.locals = {}
+        self.visit(tree)
+        # two bytes per word unless an argument doesn't fit
+        typecode = 'H' if max(self.code, default=0) < 1 << 16 else 'I'
+        return Program(array(typecode, self.code), tuple(self.constants), tuple(self.names),
+                       tuple(self.functions), tuple(self.comparisons), len(self.locals))
+
+    def emit(self, opcode, argument=0):
+        self.code.append(opcode)
+        self.code.append(argument)
+
+    def index(self, table, value):
+        """Index of value in one of the tables, added if missing."""
+        # 1, 1.0 and True (and 0.0 and -0.0) are equal but not the same
+        # constant
+        if isinstance(value, float):
+            key = id(table), float, repr(value)
+        else:
+            key = id(table), type(value), value
+        if key not in self.positions:
+            self.positions[key] = len(table)
+            table.append(value)
+        return self.positions[key]
+
+    def visit_BinOp(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+        if node.op.type != DIV:
+            self.emit(BINARY[node.op.type])
+            return
+        left_type = self.types[node.left]
+        right_type = self.types[node.right]
+        if left_type is INT and right_type is INT:
+            self.emit(BINARY_FLOOR_DIV)
+        elif left_type is FLOAT or right_type is FLOAT:
+            self.emit(BINARY_TRUE_DIV)
+        else:
+            self.emit(BINARY_DIV)
+
+    def visit_Constants(self, node):
+        if node.op.type == PI:
+            self.emit(LOAD_CONST, self.index(self.constants, math.pi))
+        elif node.op.type == E_C:
+            self.emit(LOAD_CONST, self.index(self.constants, math.e))
+
+    def visit_UnOp(self, node):
+        self.visit(node.value)
+        if node.op.type == MINUS:
+            self.emit(NEGATE)
+
+    def visit_Func(self, node):
+        self.visit(node.value)
+        registered = lookup(node.op.type)
+        function = self.index(self.functions, (node.op.type, registered.call))
+        value_type = self.types[node.value]
+        if value_type is INT and registered.truncate:
+            self.emit(CALL_INT, function)
+        elif value_type is FLOAT or not registered.truncate:
+            self.emit(CALL_FLOAT, function)
+        else:
+            self.emit(CALL, function)
+
+    def visit_Boolean(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+        self.emit(COMPARE, self.index(self.comparisons, (node.op.type, COMPARISONS[node.op.type])))
+
+    def visit_Num(self, node):
+        self.emit(LOAD_CONST, self.index(self.constants, node.value))
+
+    def visit_Variable(self, node):
+        self.emit(LOAD_NAME, self.index(self.names, node.name))
+
+    def visit_Variable_Set(self, node):
+        self.visit(node.value)
+        self.emit(STORES[node.assign.type], self.index(self.names, node.name))
+
+    def visit_Shared(self, node):
+        if node in self.locals:
+            self.emit(LOAD_LOCAL, self.locals[node])
+            return
+        self.visit(node.value)
+        self.locals[node] = len(self.locals)
+        self.emit(STORE_LOCAL, self.locals[node])
+
+    def visit_Bool(self, node):
+        if node.value == TRUE:
+            self.emit(LOAD_CONST, self.index(self.constants, True))
+        elif node.value == FALSE:
+            self.emit(LOAD_CONST, self.index(self.constants, False))
+
+
+def run(program, session):
+    """Execute a Program in a session and return the raw result."""
+    code = program.code
+    constants = program.constants
+    names = program.names
+    functions = program.functions
+    comparisons = program.comparisons
+    variables = session.variables
+    slots = [None] * program.locals_count
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    end = len(code)
+    position = 0
+    while position < end:
+        opcode = code[position]
+        argument = code[position + 1]
+        position += 2
+        if opcode == LOAD_CONST:
+            push(constants[argument])
+        elif opcode == LOAD_NAME:
+            name = names[argument]
+            if name not in variables:
+                raise Exception('Variable not found')
+            push(variables[name])
+        elif opcode == BINARY_ADD:
+            right = pop()
+            stack[-1] = stack[-1] + right
+        elif opcode == BINARY_MUL:
+            right = pop()
+            stack[-1] = stack[-1] * right
+        elif opcode == BINARY_SUB:
+            right = pop()
+            stack[-1] = stack[-1] - right
+        elif opcode == BINARY_FLOOR_DIV:
+            right = pop()
+            stack[-1] = stack[-1] // right
+        elif opcode == BINARY_TRUE_DIV:
+            right = pop()
+            stack[-1] = stack[-1] / right
+        elif opcode == BINARY_DIV:
+            right = pop()
+            left = stack[-1]
+            if isinstance(left, int) and isinstance(right, int):
+                stack[-1] = left // right
+            elif isinstance(left, float) or isinstance(right, float):
+                stack[-1] = left / right
+            else:
+                stack[-1] = None
+        elif opcode == CALL_FLOAT:
+            stack[-1] = functions[argument][1](stack[-1])
+        elif opcode == CALL_INT:
+            stack[-1] = int(functions[argument][1](stack[-1]))
+        elif opcode == CALL:
+            value = stack[-1]
+            result = functions[argument][1](value)
+            stack[-1] = result if isinstance(value, float) else int(result)
+        elif opcode == COMPARE:
+            session.check_boolean = True
+            right = pop()
+            if not comparisons[argument][1](stack[-1], right):
+                session.changed_boolean = False
+        elif opcode == NEGATE:
+            stack[-1] = stack[-1] * (-1)
+        elif opcode == BINARY_MOD:
+            right = pop()
+            stack[-1] = stack[-1] % right
+        elif opcode == LEFT_SHIFT_OP:
+            right = pop()
+            stack[-1] = stack[-1] << right
+        elif opcode == RIGHT_SHIFT_OP:
+            right = pop()
+            stack[-1] = stack[-1] >> right
+        elif opcode == STORE_LOCAL:
+            slots[argument] = stack[-1]
+        elif opcode == LOAD_LOCAL:
+            push(slots[argument])
+        elif opcode == STORE_NAME:
+            variables[names[argument]] = stack[-1]
+        elif opcode in COMPOUND:
+            name = names[argument]
+            if name not in variables:
+                raise Exception('Variable not found')
+            stack[-1] = variables[name] = assign(COMPOUND[opcode], variables[name], stack[-1])
+        else:
+            raise Exception('Unknown opcode {}'.format(opcode))
+    return stack[-1]
+
+
+def describe(program, opcode, argument):
+    """Text shown for the argument of an instruction."""
+    if opcode == LOAD_CONST:
+        return '{} ({!r})'.format(argument, program.constants[argument])
+    elif opcode == LOAD_NAME or opcode == STORE_NAME or opcode in COMPOUND:
+        return '{} ({})'.format(argument, program.names[argument])
+    elif opcode in (CALL, CALL_INT, CALL_FLOAT):
+        return '{} ({})'.format(argument, program.functions[argument][0])
+    elif opcode == COMPARE:
+        return '{} ({})'.format(argument, program.comparisons[argument][0])
+    elif opcode in (STORE_LOCAL, LOAD_LOCAL):
+        return str(argument)
+    return ''
+
+
+def disassemble(program):
+    """Human readable listing of a Program, one instruction per line."""
+    lines = []
+    for position in range(0, len(program.code), 2):
+        opcode = program.code[position]
+        argument = program.code[position + 1]
+        lines.append('{:>5} {:<18} {}'.format(
+            position, OPNAMES.get(opcode, opcode), describe(program, opcode, argument)).rstrip())
+    return '\n'.join(lines)
+
+
+class BytecodeInterpreter(object):
+    """Drop-in replacement for Interpreter that runs compiled bytecode.
+
+    The Program of every tree is kept as long as the tree is.
+    """
+
+    def __init__(self, parser, session=None):
+        self.parser = parser
+        self.session = default_session if session is None else session
+        self.compiler = BytecodeCompiler()
+        self.programs = weakref.WeakKeyDictionary()
+
+    def compile(self, tree):
+        if tree not in self.programs:
+            self.programs[tree] = self.compiler.compile(tree)
+        return self.programs[tree]
+
+    def evaluate(self, tree):
+        return self.compile(tree).evaluate(self.session)
+
+    def interpret(self):
+        tree = self.parser.parse()
+        return self.evaluate(tree)
@@ -0,0 +1,74 @@
+from collections import OrderedDict
+import threading
+
+from .lexer import Lexer
+from .parser import Parser
+
+###############################################################################
+#                                                                             #
+#  EXPRESSION CACHE                                                           #
+#                                                                             #
+###############################################################################
+#
+# Parsed trees don't depend on the values of variables, so a formula that is
+# evaluated again only has to be lexed and parsed once. The cache keeps the
+# most recently used expressions and drops the least recently used one when
+# it is full.
+
+
+def normalize(text):
+    """Cache key of an expression: whitespace runs collapsed to one space.
+
+    Whitespace only separates tokens, so this never changes the meaning.
+    """
+    return ' '.join(text.split())
+
+
+def parse(text):
+    return Parser(Lexer(text)).parse()
+
+
+class ExpressionCache(object):
+    def __init__(self, maxsize=256, loader=parse):
+        # loader turns normalized expression text into the cached form,
+        # e.g. a parsed tree or a compiled expression
+        self.maxsize = maxsize
+        self.loader = loader
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, text):
+        key = normalize(text)
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+        # errors are raised to the caller and nothing is cached
+        value = self.loader(key)
+        with self.lock:
+            self.entries[key] = value
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,285 @@
+import math
+import weakref
+
+from .lexer import PLUS, MINUS, MUL, DIV, MOD, LEFT_SHIFT, RIGHT_SHIFT, \
+    LOWER, HIGHER, HIGHER_EQ, LOWER_EQ, EQ_EQ, TRUE, FALSE, PI, E_C, \
+    EQ, PLUS_EQUALS, MINUS_EQUALS, MUL_EQUALS, DIV_EQUALS
+from .interpreter import NodeVisitor, assign
+from .functions import lookup
+from .inference import INT, FLOAT, infer
+from .session import default_session
+
+###############################################################################
+#                                                                             #
+#  PYTHON CODE GENERATOR                                                      #
+#                                                                             #
+###############################################################################
+#
+# Translates a parsed expression into the source of a Python function and
+# compiles it with the built-in compile(), so CPython's own evaluation loop
+# does the arithmetic. Every operator or function node becomes one
+# assignment to a temporary, emitted in the order the Interpreter visits
+# the nodes, so errors are raised by the same operation. For
+#
+#     y = SQRT(x ) * 2 < 10
+#
+# the generated function is
+#
+#     def expression(session):
+#         variables = session.variables
+#         session.reset()
+#         holds = True
+#         try:
+#             t1 = variables['x']
+#         except KeyError:
+#             raise Exception('Variable not found') from None
+#         t2 = _fn_SQRT(t1) if isinstance(t1, float) else int(_fn_SQRT(t1))
+#         t3 = t2 * 2
+#         if not t3 < 10:
+#             holds = False
+#         variables['y'] = t3
+#         ...
+#
+# Variables are read into a temporary where the Interpreter reads them, so
+# an assignment later in the expression doesn't change the value read. Only
+# the read itself is in a try (free in CPython 3.11 unless it raises), so a
+# KeyError raised by a registered function is not reported as a missing
+# variable.
+#
+# Where type inference knows the operand types, floor or true division and
+# int() truncation are decided when generating the code; otherwise the
+# generated code checks the types like the Interpreter does.
+
+BINARY = {
+    PLUS: '+',
+    MINUS: '-',
+    MUL: '*',
+    MOD: '%',
+    LEFT_SHIFT: '<<',
+    RIGHT_SHIFT: '>>',
+}
+
+COMPARISONS = {
+    HIGHER: '>',
+    LOWER: '<',
+    LOWER_EQ: '<=',
+    HIGHER_EQ: '>=',
+    EQ_EQ: '==',
+}
+
+
+# globals of every generated function
+NAMESPACE = {
+    '_assign': assign,
+    '_DIV_EQUALS': DIV_EQUALS,
+}
+
+
+def literal(value):
+    """Python source for a constant, None if it has no literal form."""
+    if isinstance(value, bool):
+        return repr(value)
+    elif isinstance(value, int) and value.bit_length() < 1000:
+        return repr(value)
+    elif isinstance(value, float) and math.isfinite(value):
+        # repr gives back the same float
+        return repr(value)
+    return None
+
+
+class GeneratedExpression(object):
+    def __init__(self, tree, source, function):
+        self.tree = tree
+        self.source = source
+        self.function = function
+
+    def evaluate(self, session=None):
+        if session is None:
+            session = default_session
+        return self.function(session)
+
+    __call__ = evaluate
+
+
+class CodeGenerator(NodeVisitor):
+    def __init__(self):
+        self.types = {}
+        self.lines = []
+        # constants without a literal form, e.g. inf, passed as globals
+        self.constants = {}
+        # global name -> implementation of a called function
+        self.functions = {}
+        # Shared node -> temporary holding its value
+        self.shared = {}
+        self.temporaries = 0
+        self.comparisons = 0
+
+    def generate(self, tree):
+        """Source of a function `expression(session)` evaluating the tree."""
+        self.types = infer(tree)
+        self.lines = []
+        self.constants = {}
+        self.functions = {}
+        self.shared = {}
+        self.temporaries = 0
+        self.comparisons = 0
+        result = self.visit(tree)
+        body = self.lines
+        if self.comparisons:
+            body.append('session.check_boolean = True')
+            body.append('session.changed_boolean = holds')
+            body.append('return holds')
+        elif self.types[tree] is INT:
+            body.append('return {}'.format(result))
+        elif self.types[tree] is FLOAT:
+            body.append('return round({}, 3)'.format(result))
+        else:
+            body.append('result = {}'.format(result))
+            body.append('return round(result, 3) if isinstance(result, float) else result')
+        source = ['def expression(session):',
+                  '    variables = session.variables',
+                  '    session.reset()']
+        if self.comparisons:
+            source.append('    holds = True')
+        source.extend('    ' + line for line in body)
+        return '\n'.join(source) + '\n'
+
+    def compile(self, tree):
+        source = self.generate(tree)
+        namespace = dict(NAMESPACE)
+        namespace.update(self.constants)
+        namespace.update(self.functions)
+        exec(compile(source, '<rafmath>', 'exec'), namespace)
+        return GeneratedExpression(tree, source, namespace['expression'])
+
+    def temporary(self, expression):
+        """Assign an expression to a new temporary and return its name."""
+        self.temporaries += 1
+        name = 't{}'.format(self.temporaries)
+        self.lines.append('{} = {}'.format(name, expression))
+        return name
+
+    def read(self, name):
+        """Temporary with the value of a variable, read at this point."""
+        self.temporaries += 1
+        temporary = 't{}'.format(self.temporaries)
+        # only the read is in the try, errors of functions stay as they are
+        self.lines.extend(('try:',
+                           '    {} = variables[{!r}]'.format(temporary, name),
+                           'except KeyError:',
+                           "    raise Exception('Variable not found') from None"))
+        return temporary
+
+    def constant(self, value):
+        source = literal(value)
+        if source is None:
+            source = '_c{}'.format(len(self.constants))
+            self.constants[source] = value
+        return source
+
+    def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        if node.op.type != DIV:
+            return self.temporary('{} {} {}'.format(left, BINARY[node.op.type], right))
+        left_type = self.types[node.left]
+        right_type = self.types[node.right]
+        if left_type is INT and right_type is INT:
+            return self.temporary('{} // {}'.format(left, right))
+        elif left_type is FLOAT or right_type is FLOAT:
+            return self.temporary('{} / {}'.format(left, right))
+        # decided at runtime, like Interpreter.visit_BinOp
+        return self.temporary(
+            '{0} // {1} if isinstance({0}, int) and isinstance({1}, int) else '
+            '({0} / {1} if isinstance({0}, float) or isinstance({1}, float) else None)'.format(left, right))
+
+    def visit_Constants(self, node):
+        if node.op.type == PI:
+            return self.constant(math.pi)
+        elif node.op.type == E_C:
+            return self.constant(math.e)
+
+    def visit_UnOp(self, node):
+        value = self.visit(node.value)
+        if node.op.type == PLUS:
+            return value
+        elif node.op.type == MINUS:
+            return self.temporary('{} * (-1)'.format(value))
+
+    def visit_Func(self, node):
+        value = self.visit(node.value)
+        registered = lookup(node.op.type)
+        function = '_fn_' + registered.name
+        self.functions[function] = registered.call
+        value_type = self.types[node.value]
+        if value_type is FLOAT or not registered.truncate:
+            return self.temporary('{}({})'.format(function, value))
+        elif value_type is INT:
+            return self.temporary('int({}({}))'.format(function, value))
+        return self.temporary('{0}({1}) if isinstance({1}, float) else int({0}({1}))'.format(function, value))
+
+    def visit_Boolean(self, node):
+        self.comparisons += 1
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        self.lines.append('if not {} {} {}:'.format(left, COMPARISONS[node.op.type], right))
+        self.lines.append('    holds = False')
+        return left
+
+    def visit_Num(self, node):
+        return self.constant(node.value)
+
+    def visit_Variable(self, node):
+        return self.read(node.name)
+
+    def visit_Variable_Set(self, node):
+        value = self.visit(node.value)
+        if node.assign.type != EQ:
+            current = self.read(node.name)
+            if node.assign.type == PLUS_EQUALS:
+                value = self.temporary('{} + {}'.format(value, current))
+            elif node.assign.type == MINUS_EQUALS:
+                value = self.temporary('{} - {}'.format(current, value))
+            elif node.assign.type == MUL_EQUALS:
+                value = self.temporary('{} * {}'.format(value, current))
+            elif node.assign.type == DIV_EQUALS:
+                value = self.temporary('_assign(_DIV_EQUALS, {}, {})'.format(current, value))
+        self.lines.append('variables[{!r}] = {}'.format(node.name, value))
+        return value
+
+    def visit_Shared(self, node):
+        if node not in self.shared:
+            self.shared[node] = self.visit(node.value)
+        return self.shared[node]
+
+    def visit_Bool(self, node):
+        if node.value == TRUE:
+            return 'True'
+        elif node.value == FALSE:
+            return 'False'
+
+
+class PythonInterpreter(object):
+    """Drop-in replacement for Interpreter that runs generated Python code.
+
+    Generating and compiling the code is much slower than evaluating it
+    once, so the function of every tree is kept as long as the tree is.
+    """
+
+    def __init__(self, parser, session=None):
+        self.parser = parser
+        self.session = default_session if session is None else session
+        self.generator = CodeGenerator()
+        self.compiled = weakref.WeakKeyDictionary()
+
+    def compile(self, tree):
+        if tree not in self.compiled:
+            self.compiled[tree] = self.generator.compile(tree)
+        return self.compiled[tree]
+
+    def evaluate(self, tree):
+        return self.compile(tree).evaluate(self.session)
+
+    def interpret(self):
+        tree = self.parser.parse()
+        return self.evaluate(tree)
@@ -0,0 +1,222 @@
+from .lexer import PLUS, MINUS, MUL, DIV, \
+    LOWER, HIGHER, HIGHER_EQ, LOWER_EQ, EQ_EQ, TRUE, FALSE, MOD, LEFT_SHIFT, \
+    RIGHT_SHIFT, PI, E_C
+from .lexer import EQ
+from .interpreter import NodeVisitor, final_result, assign
+from .functions import lookup
+from .inference import INT, FLOAT, infer
+from .session import default_session
+import math
+import operator
+import weakref
+
+###############################################################################
+#                                                                             #
+#  CLOSURE COMPILER                                                           #
+#                                                                             #
+###############################################################################
+#
+# Instead of walking the tree on every evaluation, the tree is walked once
+# and every node is turned into a Python closure that already knows which
+# operation it performs. Evaluating the expression is then a plain chain of
+# function calls, without the getattr dispatch of NodeVisitor.visit and
+# without the `if node.op.type == ...` chains.
+#
+# Every closure takes the Session it is evaluated in, so one compiled
+# expression can be evaluated in any number of sessions.
+#
+# Where type inference knows the operand types, the int or float path is
+# chosen at compile time and the closure skips the isinstance checks.
+
+COMPARISONS = {
+    HIGHER: operator.gt,
+    LOWER: operator.lt,
+    LOWER_EQ: operator.le,
+    HIGHER_EQ: operator.ge,
+    EQ_EQ: operator.eq,
+}
+
+
+class CompiledExpression(object):
+    def __init__(self, tree, code):
+        self.tree = tree
+        self.code = code
+
+    def evaluate(self, session=None):
+        if session is None:
+            session = default_session
+        session.reset()
+        result = self.code(session)
+        return final_result(result, session.check_boolean, session.changed_boolean)
+
+    __call__ = evaluate
+
+
+class Compiler(NodeVisitor):
+    def __init__(self):
+        self.types = {}
+        # Shared node -> its closure, so a shared subexpression is compiled once
+        self.shared = {}
+
+    def compile(self, tree):
+        self.types = infer(tree)
+        self.shared = {}
+        return CompiledExpression(tree, self.visit(tree))
+
+    def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        if node.op.type == PLUS:
+            return lambda session: left(session) + right(session)
+        elif node.op.type == MINUS:
+            return lambda session: left(session) - right(session)
+        elif node.op.type == MUL:
+            return lambda session: left(session) * right(session)
+        elif node.op.type == DIV:
+            left_type = self.types[node.left]
+            right_type = self.types[node.right]
+            if left_type is INT and right_type is INT:
+                return lambda session: left(session) // right(session)
+            elif left_type is FLOAT or right_type is FLOAT:
+                return lambda session: left(session) / right(session)
+
+            def div(session):
+                a = left(session)
+                b = right(session)
+                if isinstance(a, int) and isinstance(b, int):
+                    return a // b
+                elif isinstance(a, float) or isinstance(b, float):
+                    return a / b
+            return div
+        elif node.op.type == MOD:
+            return lambda session: left(session) % right(session)
+        elif node.op.type == LEFT_SHIFT:
+            return lambda session: left(session) << right(session)
+        elif node.op.type == RIGHT_SHIFT:
+            return lambda session: left(session) >> right(session)
+
+    def visit_Constants(self, node):
+        if node.op.type == PI:
+            return lambda session: math.pi
+        elif node.op.type == E_C:
+            return lambda session: math.e
+
+    def visit_UnOp(self, node):
+        value = self.visit(node.value)
+        if node.op.type == PLUS:
+            return value
+        elif node.op.type == MINUS:
+            return lambda session: value(session) * (-1)
+
+    def visit_Func(self, node):
+        value = self.visit(node.value)
+        registered = lookup(node.op.type)
+        function = registered.call
+        value_type = self.types[node.value]
+        if not registered.truncate:
+            return lambda session: function(value(session))
+        elif value_type is INT:
+            return lambda session: int(function(value(session)))
+        elif value_type is FLOAT:
+            return lambda session: function(value(session))
+
+        def func(session):
+            argument = value(session)
+            if isinstance(argument, float):
+                return function(argument)
+            else:
+                return int(function(argument))
+        return func
+
+    def visit_Boolean(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        compare = COMPARISONS[node.op.type]
+
+        def boolean(session):
+            session.check_boolean = True
+            a = left(session)
+            if not compare(a, right(session)):
+                session.changed_boolean = False
+            return a
+        return boolean
+
+    def visit_Num(self, node):
+        value = node.value
+        return lambda session: value
+
+    def visit_Variable(self, node):
+        name = node.name
+
+        def variable(session):
+            if name in session.variables:
+                return session.variables[name]
+            raise Exception('Variable not found')
+        return variable
+
+    def visit_Variable_Set(self, node):
+        value = self.visit(node.value)
+        name = node.name
+        op_type = node.assign.type
+        if op_type == EQ:
+            def variable_set(session):
+                session.variables[name] = result = value(session)
+                return result
+            return variable_set
+        current = self.visit_Variable(node)
+
+        def compound_set(session):
+            result = value(session)
+            session.variables[name] = result = assign(op_type, current(session), result)
+            return result
+        return compound_set
+
+    def visit_Shared(self, node):
+        if node in self.shared:
+            return self.shared[node]
+        value = self.visit(node.value)
+
+        def shared(session):
+            memo = session.memo
+            if memo is None:
+                memo = session.memo = {}
+            if node in memo:
+                return memo[node]
+            result = memo[node] = value(session)
+            return result
+        self.shared[node] = shared
+        return shared
+
+    def visit_Bool(self, node):
+        if node.value == TRUE:
+            return lambda session: True
+        elif node.value == FALSE:
+            return lambda session: False
+
+
+class ClosureInterpreter(object):
+    """Drop-in replacement for Interpreter that compiles before evaluating.
+
+    The closures of every tree are kept as long as the tree is.
+    """
+
+    def __init__(self, parser, session=None):
+        self.parser = parser
+        self.session = default_session if session is None else session
+        self.compiler = Compiler()
+        # tree -> its root closure; a CompiledExpression would keep the
+        # tree alive and with it the entry
+        self.closures = weakref.WeakKeyDictionary()
+
+    def compile(self, tree):
+        code = self.closures.get(tree)
+        if code is None:
+            code = self.closures[tree] = self.compiler.compile(tree).code
+        return CompiledExpression(tree, code)
+
+    def evaluate(self, tree):
+        return self.compile(tree).evaluate(self.session)
+
+    def interpret(self):
+        tree = self.parser.parse()
+        return self.evaluate(tree)
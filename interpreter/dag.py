@@ -0,0 +1,153 @@
+from .parser import AST, BinOp, UnOp, Func, Boolean, Num, Variable, Variable_Set, Constants, Bool
+
+###############################################################################
+#                                                                             #
+#  HASH-CONSED DAG                                                            #
+#                                                                             #
+###############################################################################
+#
+# Structurally identical subtrees, e.g. the two SIN(x) in SIN(x) * SIN(x),
+# are replaced by one node referenced from every place it occurs, which
+# turns the tree into a DAG. A shared operator or function node is wrapped
+# in a Shared node; engines evaluate a Shared node once per evaluation and
+# reuse its value for the other references. Shared leaves (numbers,
+# variables, constants) are only stored once, they are cheaper to evaluate
+# again than to look up.
+
+
+class Shared(AST):
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+COMPOSITE = (BinOp, UnOp, Func, Boolean)
+
+
+class DagStats(object):
+    def __init__(self):
+        # nodes of the tree, counting every repetition
+        self.nodes = 0
+        # distinct subexpressions
+        self.distinct = 0
+        # composite nodes evaluated once and reused
+        self.shared = 0
+
+    @property
+    def deduplicated(self):
+        return self.nodes - self.distinct
+
+    def __str__(self):
+        return 'nodes {} -> {} distinct, {} deduplicated, {} shared subexpressions'.format(
+            self.nodes, self.distinct, self.deduplicated, self.shared)
+
+
+class HashConser(object):
+    def __init__(self):
+        # structural key -> id of the distinct subexpression
+        self.ids = {}
+        self.stats = DagStats()
+
+    def share(self, tree):
+        self.ids = {}
+        self.stats = DagStats()
+        references = {}
+        ids = self.identify(tree, {}, references)
+        root = self.build(tree, ids, references, {})
+        self.stats.distinct = len(references)
+        return root
+
+    def key(self, node, ids):
+        """Structural key of a node whose children already have ids."""
+        if isinstance(node, Num):
+            # 1 and 1.0 (and 0.0 and -0.0) are equal but not the same value
+            if isinstance(node.value, float):
+                return 'Num', 'float', repr(node.value)
+            return 'Num', type(node.value).__name__, node.value
+        elif isinstance(node, Variable):
+            return 'Variable', node.name
+        elif isinstance(node, (Constants, Bool)):
+            return type(node).__name__, node.token.type
+        elif isinstance(node, (BinOp, Boolean)):
+            return type(node).__name__, node.op.type, ids[node.left], ids[node.right]
+        elif isinstance(node, (UnOp, Func)):
+            return type(node).__name__, node.op.type, ids[node.value]
+        elif isinstance(node, Shared):
+            return ids[node.value]
+        # Variable_Set and anything unknown is never shared
+        return 'node', id(node)
+
+    def children(self, node):
+        if isinstance(node, (BinOp, Boolean)):
+            return node.left, node.right
+        elif isinstance(node, (UnOp, Func, Variable_Set, Shared)):
+            return node.value,
+        return ()
+
+    def identify(self, tree, ids, references):
+        """Give every node the id of its structure, counting the references
+        to every distinct subexpression from the other distinct ones.
+
+        Iterative, so the depth of the tree doesn't matter.
+        """
+        stack = [(tree, False)]
+        while stack:
+            node, ready = stack.pop()
+            if node in ids:
+                continue
+            if not ready:
+                stack.append((node, True))
+                stack.extend((child, False) for child in self.children(node) if child not in ids)
+                continue
+            key = self.key(node, ids)
+            if isinstance(key, int):
+                # already a Shared node, it gets shared again if needed
+                ids[node] = key
+                continue
+            self.stats.nodes += 1
+            if key not in self.ids:
+                self.ids[key] = len(self.ids)
+            node_id = ids[node] = self.ids[key]
+            if node_id not in references:
+                references[node_id] = 0
+                for child in self.children(node):
+                    references[ids[child]] += 1
+        references[ids[tree]] += 1
+        return ids
+
+    def build(self, tree, ids, references, built):
+        stack = [(tree, False)]
+        while stack:
+            node, ready = stack.pop()
+            node_id = ids[node]
+            if node_id in built:
+                continue
+            if not ready:
+                stack.append((node, True))
+                stack.extend((child, False) for child in self.children(node))
+                continue
+            if isinstance(node, (BinOp, Boolean)):
+                left, right = built[ids[node.left]], built[ids[node.right]]
+                if isinstance(node, BinOp):
+                    new = BinOp(left, node.op, right)
+                else:
+                    new = Boolean(node.op, left, right)
+            elif isinstance(node, UnOp):
+                new = UnOp(node.op, built[ids[node.value]])
+            elif isinstance(node, Func):
+                new = Func(node.op, built[ids[node.value]])
+            elif isinstance(node, Variable_Set):
+                new = Variable_Set(node.op, built[ids[node.value]], node.assign)
+            else:
+                new = node
+            if isinstance(new, COMPOSITE) and references[node_id] > 1:
+                new = Shared(new)
+                self.stats.shared += 1
+            built[node_id] = new
+        return built[ids[tree]]
+
+
+def share(tree):
+    """Return the tree as a DAG with identical subexpressions shared."""
+    return HashConser().share(tree)
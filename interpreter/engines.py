@@ -0,0 +1,63 @@
+from importlib import import_module
+
+from .cache import parse
+from .session import Session
+
+# Evaluation engines selectable by name, as (module, class). Every engine is
+# constructed with a parser and a session and evaluates parsed trees with
+# evaluate(). The module of an engine is only imported when the engine is
+# used, so that short runs don't pay for the engines they don't use.
+ENGINE_CLASSES = {
+    'tree': ('.interpreter', 'Interpreter'),
+    'closure': ('.compiler', 'ClosureInterpreter'),
+    'bytecode': ('.bytecode', 'BytecodeInterpreter'),
+    'python': ('.codegen', 'PythonInterpreter'),
+    'flat': ('.flat', 'FlatInterpreter'),
+    # tree, then compiled once an expression gets hot, see tiering.py
+    'tiered': ('.tiering', 'TieredInterpreter'),
+}
+
+DEFAULT_ENGINE = 'tree'
+
+# functions called with every engine class get_engine() returns, e.g. by
+# metrics.enable() to instrument the engines imported after it
+on_load = []
+
+
+def get_engine(name):
+    if name not in ENGINE_CLASSES:
+        raise Exception('Unknown engine {}'.format(name))
+    module, cls = ENGINE_CLASSES[name]
+    engine = getattr(import_module(module, __package__), cls)
+    for hook in on_load:
+        hook(engine)
+    return engine
+
+
+def __getattr__(name):
+    # ENGINES, name -> engine class, imports every engine on first use
+    if name == 'ENGINES':
+        engines = globals()['ENGINES'] = {engine: get_engine(engine) for engine in ENGINE_CLASSES}
+        return engines
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+class Evaluator(object):
+    """Evaluates expression text in one session.
+
+    The engine instance is created once and reused for every expression.
+    Parsed trees come from `cache` (an ExpressionCache) when one is given.
+    """
+
+    def __init__(self, session=None, engine=DEFAULT_ENGINE, cache=None):
+        self.session = Session() if session is None else session
+        self.interpreter = get_engine(engine)(None, self.session)
+        self.cache = cache
+
+    def parse(self, text):
+        if self.cache is not None:
+            return self.cache.get(text)
+        return parse(text)
+
+    def evaluate(self, text):
+        return self.interpreter.evaluate(self.parse(text))
@@ -0,0 +1,294 @@
+from array import array
+import math
+import operator
+import weakref
+
+from .lexer import Token, OPERATORS, FUNCTIONS as FUNCTION_TOKENS, CONSTANTS, \
+    NUMBER, VARIABLE, VARIABLE_SET, PLUS, MINUS, MUL, DIV, MOD, LEFT_SHIFT, RIGHT_SHIFT, \
+    LOWER, HIGHER, HIGHER_EQ, LOWER_EQ, EQ_EQ, \
+    TRUE, FALSE, PI, E_C, EQ, PLUS_EQUALS, MINUS_EQUALS, MUL_EQUALS, DIV_EQUALS
+from .parser import UnOp, BinOp, Bool, Num, Boolean, Variable, Variable_Set, Func, Constants
+from .interpreter import final_result, assign
+from .compiler import COMPARISONS
+from .functions import lookup
+from .dag import Shared, COMPOSITE
+from .session import default_session
+
+###############################################################################
+#                                                                             #
+#  FLAT TREE                                                                  #
+#                                                                             #
+###############################################################################
+#
+# A parsed expression stored as parallel arrays instead of node objects:
+# for node i, kinds[i] is its node type, ops[i] the index of its operator
+# token type in TOKEN_TYPES, left[i] and right[i] the indices of its
+# children (-1 if it has none) and operands[i] the index of its number,
+# variable name or Function (see functions.py) in `constants`. Nodes are
+# stored children first, so the root is the last node and evaluating is one
+# loop over the indices.
+#
+#     x + 2 * 3       kinds     VARIABLE  NUM     NUM     BINARY  BINARY
+#                     ops       VARIABLE  NUMBER  NUMBER  MUL     PLUS
+#                     left      -1        -1      -1      1       0
+#                     right     -1        -1      -1      2       3
+#                     operands  0         1       2       -1      -1
+#
+# A node with several parents (a shared subexpression, see dag.py) is
+# stored once and evaluated once.
+
+# node kinds, one per AST class
+NUM, VARIABLE_NODE, CONSTANT, BOOL, UNARY, BINARY, FUNCTION, COMPARISON, ASSIGNMENT = range(9)
+
+KINDS = {
+    Num: NUM,
+    Variable: VARIABLE_NODE,
+    Constants: CONSTANT,
+    Bool: BOOL,
+    UnOp: UNARY,
+    BinOp: BINARY,
+    Func: FUNCTION,
+    Boolean: COMPARISON,
+    Variable_Set: ASSIGNMENT,
+}
+
+CLASSES = {kind: cls for cls, kind in KINDS.items()}
+
+# token types referenced by the ops array; a function call refers to its
+# Function instead, its op is NUMBER
+TOKEN_TYPES = (
+    NUMBER, VARIABLE, PLUS, MINUS, MUL, DIV, MOD, LEFT_SHIFT, RIGHT_SHIFT,
+    LOWER, HIGHER, HIGHER_EQ, LOWER_EQ, EQ_EQ, TRUE, FALSE, PI, E_C,
+    EQ, PLUS_EQUALS, MINUS_EQUALS, MUL_EQUALS, DIV_EQUALS,
+)
+
+TOKEN_INDEX = {token_type: index for index, token_type in enumerate(TOKEN_TYPES)}
+
+# token type -> the shared Token instance of the lexer
+TOKENS = {token.type: token for tokens in (OPERATORS, CONSTANTS) for token in tokens.values()}
+
+BINARY_OPERATORS = {
+    PLUS: operator.add,
+    MINUS: operator.sub,
+    MUL: operator.mul,
+    MOD: operator.mod,
+    LEFT_SHIFT: operator.lshift,
+    RIGHT_SHIFT: operator.rshift,
+}
+
+
+class FlatTree(object):
+    def __init__(self, kinds, ops, left, right, operands, constants):
+        self.kinds = kinds
+        self.ops = ops
+        self.left = left
+        self.right = right
+        self.operands = operands
+        # numbers, variable names and Functions
+        self.constants = constants
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def evaluate(self, session=None):
+        if session is None:
+            session = default_session
+        session.reset()
+        result = run(self, session)
+        return final_result(result, session.check_boolean, session.changed_boolean)
+
+    __call__ = evaluate
+
+    def to_tree(self):
+        return unflatten(self)
+
+
+def children(node):
+    if isinstance(node, (BinOp, Boolean)):
+        return node.left, node.right
+    elif isinstance(node, (UnOp, Func, Variable_Set, Shared)):
+        return node.value,
+    return ()
+
+
+def flatten(tree):
+    """FlatTree of a parsed tree or DAG."""
+    kinds = array('B')
+    ops = array('B')
+    left = array('i')
+    right = array('i')
+    operands = array('i')
+    constants = []
+    # constant key -> index; 1 and 1.0, 0.0 and -0.0 are kept apart
+    constant_index = {}
+    # id of a visited node -> its index; the tree keeps the nodes alive
+    index = {}
+    stack = [(tree, False)]
+    while stack:
+        node, ready = stack.pop()
+        if id(node) in index:
+            continue
+        if not ready:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children(node)))
+            continue
+        if isinstance(node, Shared):
+            index[id(node)] = index[id(node.value)]
+            continue
+        kind = KINDS.get(type(node))
+        if kind is None:
+            raise Exception('No visit_{} method'.format(type(node).__name__))
+        operand = -1
+        if kind == NUM or kind == VARIABLE_NODE or kind == ASSIGNMENT or kind == FUNCTION:
+            if kind == FUNCTION:
+                value = lookup(node.op.type)
+                key = type(value), value.name
+            else:
+                value = node.value if kind == NUM else node.name
+                key = type(value), repr(value) if isinstance(value, float) else value
+            if key not in constant_index:
+                constant_index[key] = len(constants)
+                constants.append(value)
+            operand = constant_index[key]
+        if kind == NUM or kind == FUNCTION:
+            op = NUMBER
+        elif kind == BOOL:
+            op = node.token.type
+        elif kind == ASSIGNMENT:
+            op = node.assign.type
+        else:
+            op = node.op.type
+        nodes = children(node)
+        kinds.append(kind)
+        ops.append(TOKEN_INDEX[op])
+        left.append(index[id(nodes[0])] if nodes else -1)
+        right.append(index[id(nodes[1])] if len(nodes) > 1 else -1)
+        operands.append(operand)
+        index[id(node)] = len(kinds) - 1
+    return FlatTree(kinds, ops, left, right, operands, constants)
+
+
+def unflatten(flat):
+    """Parsed tree of a FlatTree; nodes with several parents become Shared."""
+    parents = [0] * len(flat)
+    for children_of in (flat.left, flat.right):
+        for child in children_of:
+            if child >= 0:
+                parents[child] += 1
+    constants = flat.constants
+    nodes = []
+    append = nodes.append
+    for kind, op, first, second, operand, count in zip(
+            flat.kinds, flat.ops, flat.left, flat.right, flat.operands, parents):
+        op = TOKEN_TYPES[op]
+        first = nodes[first] if first >= 0 else None
+        if kind == NUM:
+            node = Num(Token(NUMBER, constants[operand]))
+        elif kind == BINARY:
+            node = BinOp(first, TOKENS[op], nodes[second])
+        elif kind == VARIABLE_NODE:
+            node = Variable(Token(VARIABLE, constants[operand]))
+        elif kind == FUNCTION:
+            name = constants[operand].name
+            node = Func(FUNCTION_TOKENS.get(name) or Token(name, name), first)
+        elif kind == ASSIGNMENT:
+            node = Variable_Set(Token(VARIABLE_SET, constants[operand]), first, TOKENS[op])
+        elif kind == BOOL:
+            node = Bool(Token(op, op))
+        elif kind == CONSTANT:
+            node = Constants(TOKENS[op])
+        elif kind == COMPARISON:
+            node = Boolean(TOKENS[op], first, nodes[second])
+        else:
+            node = CLASSES[kind](TOKENS[op], first)
+        if count > 1 and isinstance(node, COMPOSITE):
+            node = Shared(node)
+        append(node)
+    return nodes[-1]
+
+
+def run(flat, session):
+    """Evaluate every node of a FlatTree in order, return the root's value."""
+    kinds = flat.kinds
+    ops = flat.ops
+    left = flat.left
+    right = flat.right
+    operands = flat.operands
+    constants = flat.constants
+    variables = session.variables
+    results = [None] * len(kinds)
+    for index, kind in enumerate(kinds):
+        if kind == NUM:
+            result = constants[operands[index]]
+        elif kind == BINARY:
+            a = results[left[index]]
+            b = results[right[index]]
+            op = TOKEN_TYPES[ops[index]]
+            if op != DIV:
+                result = BINARY_OPERATORS[op](a, b)
+            elif isinstance(a, int) and isinstance(b, int):
+                result = a // b
+            elif isinstance(a, float) or isinstance(b, float):
+                result = a / b
+            else:
+                result = None
+        elif kind == VARIABLE_NODE:
+            name = constants[operands[index]]
+            if name not in variables:
+                raise Exception('Variable not found')
+            result = variables[name]
+        elif kind == FUNCTION:
+            value = results[left[index]]
+            function = constants[operands[index]]
+            result = function.call(value)
+            if function.truncate and not isinstance(value, float):
+                result = int(result)
+        elif kind == COMPARISON:
+            session.check_boolean = True
+            result = results[left[index]]
+            if not COMPARISONS[TOKEN_TYPES[ops[index]]](result, results[right[index]]):
+                session.changed_boolean = False
+        elif kind == UNARY:
+            result = results[left[index]]
+            if TOKEN_TYPES[ops[index]] == MINUS:
+                result = result * (-1)
+        elif kind == ASSIGNMENT:
+            result = results[left[index]]
+            name = constants[operands[index]]
+            op = TOKEN_TYPES[ops[index]]
+            if op != EQ:
+                if name not in variables:
+                    raise Exception('Variable not found')
+                result = assign(op, variables[name], result)
+            variables[name] = result
+        elif kind == CONSTANT:
+            result = math.pi if TOKEN_TYPES[ops[index]] == PI else math.e
+        else:
+            op = TOKEN_TYPES[ops[index]]
+            result = True if op == TRUE else False if op == FALSE else None
+        results[index] = result
+    return results[-1]
+
+
+class FlatInterpreter(object):
+    """Drop-in replacement for Interpreter evaluating flattened trees.
+
+    The FlatTree of every tree is kept as long as the tree is.
+    """
+
+    def __init__(self, parser, session=None):
+        self.parser = parser
+        self.session = default_session if session is None else session
+        self.flattened = weakref.WeakKeyDictionary()
+
+    def compile(self, tree):
+        if tree not in self.flattened:
+            self.flattened[tree] = flatten(tree)
+        return self.flattened[tree]
+
+    def evaluate(self, tree):
+        return self.compile(tree).evaluate(self.session)
+
+    def interpret(self):
+        tree = self.parser.parse()
+        return self.evaluate(tree)
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+import math
+import threading
+
+from . import lexer
+from .lexer import Token, NUMBER, VARIABLE, VARIABLE_SET, PLUS, MINUS, MUL, DIV, EOF, \
+    TRUE, FALSE, PI, E_C, LOG, SIN, COS, TAN, CTG, SQRT, POW, DEG, RAD
+
+###############################################################################
+#                                                                             #
+#  FUNCTIONS                                                                  #
+#                                                                             #
+###############################################################################
+#
+# Every function callable from an expression is a Function in `registry`,
+# keyed by the name it is written with, which is also the type of its
+# token. The lexer recognizes the registered names, the parser builds a
+# Func node for them and every engine looks the implementation up here.
+#
+#     from interpreter import functions
+#     functions.register('CUBE', lambda value: value ** 3)
+#     functions.register('SLOW', slow_function, cache_size=1024)
+#
+# Like the built-in functions, a function's result is truncated with int()
+# unless its argument is a float; register with truncate=False to return
+# results unchanged. Implementations should not have side effects: the
+# optimizer folds calls with constant arguments and results may be cached.
+#
+# Expressions already compiled by an engine keep the Function they were
+# compiled with.
+
+
+class FunctionCache(object):
+    """Bounded LRU cache of the results of one function."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # engines may evaluate in several threads (see server.py)
+        self.lock = threading.Lock()
+
+    def call(self, implementation, value):
+        # 0.0 and -0.0 are equal but may give different results
+        key = value.hex() if type(value) is float else value
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+        result = implementation(value)
+        with self.lock:
+            self.entries[key] = result
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return result
+
+    @property
+    def hit_rate(self):
+        calls = self.hits + self.misses
+        return self.hits / calls if calls else 0.0
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+    def __str__(self):
+        return 'hits {}, misses {}, hit rate {:.1%}, size {}/{}'.format(
+            self.hits, self.misses, self.hit_rate, len(self.entries), self.maxsize)
+
+
+class Function(object):
+    def __init__(self, name, implementation, arity=1, truncate=True, cache_size=0):
+        self.name = name
+        self.implementation = implementation
+        self.arity = arity
+        # int() the result unless the argument is a float
+        self.truncate = truncate
+        self.cache = FunctionCache(cache_size) if cache_size else None
+        # implementation, through the cache if there is one; the engines
+        # call this and apply truncate themselves
+        self.call = implementation if self.cache is None else self.memoized
+
+    def memoized(self, value):
+        return self.cache.call(self.implementation, value)
+
+    def __call__(self, value):
+        result = self.call(value)
+        if self.truncate and not isinstance(value, float):
+            return int(result)
+        return result
+
+    def __repr__(self):
+        return 'Function({}, arity={}, truncate={}, cache={})'.format(
+            self.name, self.arity, self.truncate, self.cache.maxsize if self.cache else 0)
+
+
+# name -> Function
+registry = {}
+
+# token types that can't be function names
+RESERVED = {NUMBER, VARIABLE, VARIABLE_SET, PLUS, MINUS, MUL, DIV, EOF, TRUE, FALSE, PI, E_C}
+
+
+def register(name, implementation, arity=1, truncate=True, cache_size=0):
+    """Make a function callable as NAME(expr), return its Function.
+
+    cache_size > 0 keeps the results of that many distinct arguments.
+    """
+    if not isinstance(name, str) or not name.isidentifier() or name[0] == '_' or name in RESERVED:
+        raise Exception('Invalid function name {!r}'.format(name))
+    if name in registry:
+        raise Exception('Function {} is already registered'.format(name))
+    if arity != 1:
+        # calls have no argument separator, see Parser
+        raise Exception('Only functions of one argument are supported')
+    if cache_size < 0:
+        raise Exception('Invalid cache size {}'.format(cache_size))
+    function = registry[name] = Function(name, implementation, arity, truncate, cache_size)
+    if name not in lexer.FUNCTIONS:
+        lexer.FUNCTIONS[name] = Token(name, name)
+    lexer.TOKEN_PATTERN = lexer.token_pattern(registry)
+    return function
+
+
+def unregister(name):
+    lookup(name)
+    del registry[name]
+    del lexer.FUNCTIONS[name]
+    lexer.TOKEN_PATTERN = lexer.token_pattern(registry)
+
+
+def lookup(name):
+    if name not in registry:
+        raise Exception('Unknown function {}'.format(name))
+    return registry[name]
+
+
+def cache_stats():
+    """Name -> FunctionCache of every memoized function."""
+    return {name: function.cache for name, function in registry.items() if function.cache is not None}
+
+
+BUILTINS = {
+    POW: lambda value: math.pow(value, 2),
+    SQRT: math.sqrt,
+    LOG: math.log10,
+    SIN: math.sin,
+    COS: math.cos,
+    TAN: math.tan,
+    CTG: lambda value: 1/math.tan(value),
+    RAD: math.radians,
+    DEG: math.degrees,
+}
+
+# the lexer already knows the built-in names
+for builtin, implementation in BUILTINS.items():
+    registry[builtin] = Function(builtin, implementation)
@@ -0,0 +1,103 @@
+from .lexer import LEFT_SHIFT, RIGHT_SHIFT, EQ
+from .interpreter import NodeVisitor
+from .functions import registry
+
+###############################################################################
+#                                                                             #
+#  TYPE INFERENCE                                                             #
+#                                                                             #
+###############################################################################
+#
+# The interpreter picks between integer and float behaviour at runtime
+# (floor division for int / int, int() truncation of function results for
+# int arguments). Most of the time the type of a subtree is already known
+# from its literals, so the choice can be made once, ahead of evaluation.
+#
+# Every node is mapped to INT, FLOAT or UNKNOWN. Booleans behave like ints.
+
+INT = int
+FLOAT = float
+UNKNOWN = None
+
+
+def type_of(value):
+    if isinstance(value, float):
+        return FLOAT
+    elif isinstance(value, int):
+        return INT
+    return UNKNOWN
+
+
+def arithmetic(left, right):
+    """Result type of +, -, *, / and % for operands of the given types."""
+    if left is INT and right is INT:
+        return INT
+    elif left is FLOAT or right is FLOAT:
+        return FLOAT
+    return UNKNOWN
+
+
+class TypeInference(NodeVisitor):
+    def __init__(self):
+        self.types = {}
+
+    def infer(self, tree):
+        """Return a dict mapping every node of the tree to its type."""
+        self.types = {}
+        self.visit(tree)
+        return self.types
+
+    def visit(self, node):
+        # nodes already typed (e.g. subtrees kept by the optimizer) are not
+        # visited again
+        if node in self.types:
+            return self.types[node]
+        node_type = NodeVisitor.visit(self, node)
+        self.types[node] = node_type
+        return node_type
+
+    def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        if node.op.type in (LEFT_SHIFT, RIGHT_SHIFT):
+            return INT if left is INT and right is INT else UNKNOWN
+        return arithmetic(left, right)
+
+    def visit_Constants(self, node):
+        return FLOAT
+
+    def visit_UnOp(self, node):
+        return self.visit(node.value)
+
+    def visit_Func(self, node):
+        value = self.visit(node.value)
+        function = registry.get(node.op.type)
+        if function is None or not function.truncate:
+            # whatever the implementation returns
+            return UNKNOWN
+        return value
+
+    def visit_Boolean(self, node):
+        self.visit(node.right)
+        return self.visit(node.left)
+
+    def visit_Num(self, node):
+        return type_of(node.value)
+
+    def visit_Variable(self, node):
+        # read from the variable store when the expression is evaluated
+        return UNKNOWN
+
+    def visit_Variable_Set(self, node):
+        value = self.visit(node.value)
+        return value if node.assign.type == EQ else UNKNOWN
+
+    def visit_Shared(self, node):
+        return self.visit(node.value)
+
+    def visit_Bool(self, node):
+        return INT
+
+
+def infer(tree):
+    return TypeInference().infer(tree)
@@ -1,8 +1,9 @@
 from .lexer import PLUS, MINUS, MUL, DIV, \
-    LOG, SIN, COS, TAN, CTG, SQRT, POW, LOWER, HIGHER, \
-    HIGHER_EQ, LOWER_EQ, EQ_EQ, TRUE, FALSE, MOD, LEFT_SHIFT,\
-    RIGHT_SHIFT, PI, E_C, DEG, RAD
-from interpreter.parser import variables
+    LOWER, HIGHER, HIGHER_EQ, LOWER_EQ, EQ_EQ, TRUE, FALSE, MOD, LEFT_SHIFT,\
+    RIGHT_SHIFT, PI, E_C, EQ, PLUS_EQUALS, MINUS_EQUALS, \
+    MUL_EQUALS, DIV_EQUALS
+from .functions import registry, lookup
+from .session import default_session
 import math
 
 ###############################################################################
@@ -22,27 +23,30 @@ class NodeVisitor(object):
 
 
 class Interpreter(NodeVisitor):
-    def __init__(self, parser):
+    def __init__(self, parser, session=None):
         self.parser = parser
+        self.session = default_session if session is None else session
 
     def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
         if node.op.type == PLUS:
-            return self.visit(node.left) + self.visit(node.right)
+            return left + right
         elif node.op.type == MINUS:
-            return self.visit(node.left) - self.visit(node.right)
+            return left - right
         elif node.op.type == MUL:
-            return self.visit(node.left) * self.visit(node.right)
+            return left * right
         elif node.op.type == DIV:
-            if isinstance(self.visit(node.left), int) and isinstance(self.visit(node.right), int):
-                return self.visit(node.left) // self.visit(node.right)
-            elif isinstance(self.visit(node.left), float) or isinstance(self.visit(node.right), float):
-                return self.visit(node.left) / self.visit(node.right)
+            if isinstance(left, int) and isinstance(right, int):
+                return left // right
+            elif isinstance(left, float) or isinstance(right, float):
+                return left / right
         elif node.op.type == MOD:
-            return self.visit(node.left) % self.visit(node.right)
+            return left % right
         elif node.op.type == LEFT_SHIFT:
-            return self.visit(node.left) << self.visit(node.right)
+            return left << right
         elif node.op.type == RIGHT_SHIFT:
-            return self.visit(node.left) >> self.visit(node.right)
+            return left >> right
 
     def visit_Constants(self, node):
         if node.op.type == PI:
@@ -57,96 +61,57 @@ class Interpreter(NodeVisitor):
             return self.visit(node.value) * (-1)
 
     def visit_Func(self, node):
-        if node.op.type == POW:
-            if isinstance(self.visit(node.value), float):
-                return math.pow(self.visit(node.value), 2)
-            else:
-                return int(math.pow(self.visit(node.value), 2))
-        elif node.op.type == SQRT:
-            if isinstance(self.visit(node.value), float):
-                return math.sqrt(self.visit(node.value))
-            else:
-                return int(math.sqrt(self.visit(node.value)))
-        elif node.op.type == LOG:
-            if isinstance(self.visit(node.value), float):
-                return math.log10(self.visit(node.value))
-            else:
-                return int(math.log10(self.visit(node.value)))
-        elif node.op.type == SIN:
-            if isinstance(self.visit(node.value), float):
-                return math.sin(self.visit(node.value))
-            else:
-                return int(math.sin(self.visit(node.value)))
-        elif node.op.type == COS:
-            if isinstance(self.visit(node.value), float):
-                return math.cos(self.visit(node.value))
-            else:
-                return int(math.cos(self.visit(node.value)))
-        elif node.op.type == TAN:
-            if isinstance(self.visit(node.value), float):
-                return math.tan(self.visit(node.value))
-            else:
-                return int(math.tan(self.visit(node.value)))
-        elif node.op.type == CTG:
-            if isinstance(self.visit(node.value), float):
-                return 1/math.tan(self.visit(node.value))
-            else:
-                return int(1/math.tan(self.visit(node.value)))
-        elif node.op.type == RAD:
-            if isinstance(self.visit(node.value), float):
-                return math.radians(self.visit(node.value))
-            else:
-                return int(math.radians(self.visit(node.value)))
-        elif node.op.type == DEG:
-            if isinstance(self.visit(node.value), float):
-                return math.degrees(self.visit(node.value))
-            else:
-                return int(math.degrees(self.visit(node.value)))
+        value = self.visit(node.value)
+        function = registry.get(node.op.type) or lookup(node.op.type)
+        result = function.call(value)
+        if isinstance(value, float) or not function.truncate:
+            return result
+        else:
+            return int(result)
 
     def visit_Boolean(self, node):
-        global checkBoolean
-        global changedBoolean
-        checkBoolean = True
+        self.session.check_boolean = True
+        left = self.visit(node.left)
+        right = self.visit(node.right)
         if node.op.type == HIGHER:
-            left = self.visit(node.left)
-            right = self.visit(node.right)
             if not left > right:
-                changedBoolean = False
-            return left
+                self.session.changed_boolean = False
         elif node.op.type == LOWER:
-            left = self.visit(node.left)
-            right = self.visit(node.right)
             if not left < right:
-                changedBoolean = False
-            return left
+                self.session.changed_boolean = False
         elif node.op.type == LOWER_EQ:
-            left = self.visit(node.left)
-            right = self.visit(node.right)
             if not left <= right:
-                changedBoolean = False
-            return left
+                self.session.changed_boolean = False
         elif node.op.type == HIGHER_EQ:
-            left = self.visit(node.left)
-            right = self.visit(node.right)
             if not left >= right:
-                changedBoolean = False
-            return left
+                self.session.changed_boolean = False
         elif node.op.type == EQ_EQ:
-            left = self.visit(node.left)
-            right = self.visit(node.right)
             if not left == right:
-                changedBoolean = False
-            return left
+                self.session.changed_boolean = False
+        return left
 
     def visit_Num(self, node):
         return node.value
 
     def visit_Variable(self, node):
-        return node.value
+        return variable_value(self.session.variables, node.name)
 
     def visit_Variable_Set(self, node):
-        variables[node.name] = self.visit(node.value)
-        return variables[node.name]
+        value = self.visit(node.value)
+        variables = self.session.variables
+        if node.assign.type != EQ:
+            value = assign(node.assign.type, variable_value(variables, node.name), value)
+        variables[node.name] = value
+        return value
+
+    def visit_Shared(self, node):
+        memo = self.session.memo
+        if memo is None:
+            memo = self.session.memo = {}
+        if node in memo:
+            return memo[node]
+        value = memo[node] = self.visit(node.value)
+        return value
 
     def visit_Bool(self, node):
         if node.value == TRUE:
@@ -154,18 +119,49 @@ class Interpreter(NodeVisitor):
         elif node.value == FALSE:
             return False
 
+    def evaluate(self, tree):
+        """Evaluate an already parsed tree, so it can be reused."""
+        session = self.session
+        session.reset()
+        result = self.visit(tree)
+        return final_result(result, session.check_boolean, session.changed_boolean)
+
     def interpret(self):
         tree = self.parser.parse()
-        global checkBoolean
-        global changedBoolean
-        checkBoolean = False
-        changedBoolean = True
-        result = self.visit(tree)
+        return self.evaluate(tree)
+
+
+def variable_value(variables, name):
+    if name in variables:
+        return variables[name]
+    raise Exception('Variable not found')
+
+
+def assign(op_type, current, value):
+    """New value of a variable after a compound assignment (+=, -=, *=, /=)."""
+    if op_type == PLUS_EQUALS:
+        return value + current
+    elif op_type == MINUS_EQUALS:
+        return current - value
+    elif op_type == MUL_EQUALS:
+        return value * current
+    elif op_type == DIV_EQUALS:
+        if isinstance(current, int) and isinstance(value, int):
+            return current // value
+        else:
+            return current / value
+
+
+def final_result(result, check_boolean, changed_boolean):
+    """Value reported for a whole expression.
 
-        if checkBoolean:
-            return changedBoolean
+    If any comparison was evaluated the result is whether every comparison
+    held, otherwise floats are rounded to 3 decimals.
+    """
+    if check_boolean:
+        return changed_boolean
+    else:
+        if isinstance(result, float):
+            return round(result, 3)
         else:
-            if isinstance(result, float):
-                return round(result, 3)
-            else:
-                return result
+            return result
@@ -1,3 +1,6 @@
+import codecs
+import re
+
 # Token types
 #
 # EOF (end-of-file) token is used to indicate that
@@ -12,6 +15,8 @@ CTG, SQRT, POW, LOWER, HIGHER, HIGHER_EQ, LOWER_EQ, EQ, EQ_EQ, TRUE, FALSE, PLUS
 
 
 class Token(object):
+    __slots__ = ('type', 'value')
+
     def __init__(self, type, value):
         self.type = type
         self.value = value
@@ -33,303 +38,198 @@ class Token(object):
         return self.__str__()
 
 
+# Operator, function and constant tokens never change, so a single Token
+# instance of each is shared by every occurrence instead of building a new one.
+OPERATORS = {
+    '+': Token(PLUS, '+'),
+    '-': Token(MINUS, '-'),
+    '*': Token(MUL, '*'),
+    '/': Token(DIV, '/'),
+    '(': Token(LPAREN, '('),
+    ')': Token(RPAREN, ')'),
+    MOD: Token(MOD, MOD),
+    EQ: Token(EQ, EQ),
+    EQ_EQ: Token(EQ_EQ, EQ_EQ),
+    LOWER: Token(LOWER, LOWER),
+    LOWER_EQ: Token(LOWER_EQ, LOWER_EQ),
+    LEFT_SHIFT: Token(LEFT_SHIFT, LEFT_SHIFT),
+    HIGHER: Token(HIGHER, HIGHER),
+    HIGHER_EQ: Token(HIGHER_EQ, HIGHER_EQ),
+    RIGHT_SHIFT: Token(RIGHT_SHIFT, RIGHT_SHIFT),
+    PLUS_EQUALS: Token(PLUS_EQUALS, PLUS_EQUALS),
+    MINUS_EQUALS: Token(MINUS_EQUALS, MINUS_EQUALS),
+    MUL_EQUALS: Token(MUL_EQUALS, MUL_EQUALS),
+    DIV_EQUALS: Token(DIV_EQUALS, DIV_EQUALS),
+}
+
+FUNCTIONS = {
+    name: Token(name, name) for name in (SQRT, SIN, TAN, POW, COS, CTG, LOG, DEG, RAD)
+}
+
+CONSTANTS = {
+    PI: Token(PI, PI),
+    E_C: Token(E_C, E_C),
+}
+
+EOF_TOKEN = Token(EOF, None)
+
+
+# One pattern recognizes every token, longest operators first. A function
+# name is only a function when it is directly followed by '('. A variable
+# name runs until whitespace, an operator or '(' and is a VARIABLE_SET when
+# the next thing after it is an assignment (=, +=, -=, *=, /=).
+def token_pattern(functions):
+    """Token pattern recognizing the given function names.
+
+    Rebuilt by functions.register() whenever the functions change.
+    """
+    # (?!) never matches, for when there are no functions
+    names = '|'.join(re.escape(name) for name in sorted(functions, key=len, reverse=True)) or '(?!)'
+    return re.compile(r'''
+    \s*(?:
+        (?P<number>\d[\d.]*)
+      | (?P<operator>\+=|-=|\*=|/=|==|<<|<=|>>|>=|[-+*/()%=<>])
+      | (?P<function>(?:{functions})(?=\())
+      | (?P<name>[^\W\d_][^(+\-*/=<>\s]*)\s*(?P<assign>(?==(?!=)|[-+*/]=))?
+    )'''.format(functions=names), re.VERBOSE)
+
+
+TOKEN_PATTERN = token_pattern(FUNCTIONS)
+
+WHITESPACE = re.compile(r'\s*')
+
+
 class Lexer(object):
     def __init__(self, text):
         # client string input, e.g. "4 + 2 * 3 - 6 / 2"
         self.text = text
         # self.pos is an index into self.text
         self.pos = 0
-        self.current_char = self.text[self.pos]
 
     def error(self):
         raise Exception('Invalid character')
 
-    def advance(self):
-        """Advance the `pos` pointer and set the `current_char` variable."""
-        self.pos += 1
-        if self.pos > len(self.text) - 1:
-            self.current_char = None  # Indicates end of input
-        else:
-            self.current_char = self.text[self.pos]
-
-    def skip_whitespace(self):
-        while self.current_char is not None and self.current_char.isspace():
-            self.advance()
-
-    def number(self):
-        """Return a (multidigit) integer consumed from the input."""
-        result = ''
-        foundDot = False
-        while self.current_char is not None and (self.current_char.isdigit() or self.current_char == '.'):
-            if self.current_char == '.':
-                foundDot = True
-            result += self.current_char
-            self.advance()
-        if foundDot:
-            return float(result)
-        else:
-            return int(result)
-
-    def var(self):
-        charName = ''
-        while self.current_char is not None and self.current_char != '(' and self.current_char != '+' \
-                and self.current_char != '-' and self.current_char != '*' and self.current_char != '/' \
-                and not self.current_char.isspace() and self.current_char != '=' and self.current_char != '>' \
-                and self.current_char != '<':
-            charName += self.current_char
-            self.advance()
-
-        if self.current_char is not None and self.current_char.isspace():
-            self.skip_whitespace()
-
-        return charName
-
     def get_next_token(self):
         """Lexical analyzer (also known as scanner or tokenizer)
 
         This method is responsible for breaking a sentence
         apart into tokens. One token at a time.
         """
-        while self.current_char is not None:
-
-            position = self.pos
-
-            if self.current_char.isspace():
-                self.skip_whitespace()
-                continue
-
-            if self.current_char.isdigit():
-                br = self.number()
-                return Token(NUMBER, br)
-
-            if self.text[self.pos: self.pos + 2] == PLUS_EQUALS:
-                self.advance()
-                self.advance()
-                return Token(PLUS_EQUALS, PLUS_EQUALS)
-
-            if self.current_char == '+':
-                self.advance()
-                return Token(PLUS, '+')
-
-            if self.text[self.pos: self.pos + 2] == MINUS_EQUALS:
-                self.advance()
-                self.advance()
-                return Token(MINUS_EQUALS, MINUS_EQUALS)
-
-            if self.current_char == '-':
-                self.advance()
-                return Token(MINUS, '-')
-
-            if self.text[self.pos: self.pos + 2] == MUL_EQUALS:
-                self.advance()
-                self.advance()
-                return Token(MUL_EQUALS, MUL_EQUALS)
-
-            if self.current_char == '*':
-                self.advance()
-                return Token(MUL, '*')
-
-            if self.text[self.pos: self.pos + 2] == DIV_EQUALS:
-                self.advance()
-                self.advance()
-                return Token(DIV_EQUALS, DIV_EQUALS)
-
-            if self.current_char == '/':
-                self.advance()
-                return Token(DIV, '/')
-
-            if self.current_char == '(':
-                self.advance()
-                return Token(LPAREN, '(')
-
-            if self.current_char == ')':
-                self.advance()
-                return Token(RPAREN, ')')
-
-            if self.current_char == MOD:
-                self.advance()
-                return Token(MOD, MOD)
-
-            if self.text[self.pos: self.pos + 2] == EQ_EQ:
-                self.advance()
-                self.advance()
-                return Token(EQ_EQ, EQ_EQ)
-
-            if self.current_char == EQ:
-                self.advance()
-                return Token(EQ, EQ)
-
-            if self.text[self.pos: self.pos + 2] == LEFT_SHIFT:
-                self.advance()
-                self.advance()
-                return Token(LEFT_SHIFT, LEFT_SHIFT)
-
-            if self.text[self.pos: self.pos + 2] == LOWER_EQ:
-                self.advance()
-                self.advance()
-                return Token(LOWER_EQ, LOWER_EQ)
-
-            if self.current_char == LOWER:
-                self.advance()
-                return Token(LOWER, LOWER)
-
-            if self.text[self.pos: self.pos + 2] == RIGHT_SHIFT:
-                self.advance()
-                self.advance()
-                return Token(RIGHT_SHIFT, RIGHT_SHIFT)
-
-            if self.text[self.pos: self.pos + 2] == HIGHER_EQ:
-                self.advance()
-                self.advance()
-                return Token(HIGHER_EQ, HIGHER_EQ)
-
-            if self.current_char == HIGHER:
-                self.advance()
-                return Token(HIGHER, HIGHER)
-
-            if self.text[self.pos: self.pos + 5] == SQRT + LPAREN:
-                self.advance()
-                self.advance()
-                self.advance()
-                self.advance()
-                return Token(SQRT, SQRT)
-
-            if self.text[self.pos: self.pos + 4] == SIN + LPAREN:
-                self.advance()
-                self.advance()
-                self.advance()
-                return Token(SIN, SIN)
-
-            if self.text[self.pos: self.pos + 3] == TAN + LPAREN:
-                self.advance()
-                self.advance()
-                return Token(TAN, TAN)
-
-            if self.text[self.pos: self.pos + 4] == POW + LPAREN:
-                self.advance()
-                self.advance()
-                self.advance()
-                return Token(POW, POW)
-
-            if self.text[self.pos: self.pos + 4] == COS + LPAREN:
-                self.advance()
-                self.advance()
-                self.advance()
-                return Token(COS, COS)
-
-            if self.text[self.pos: self.pos + 4] == CTG + LPAREN:
-                self.advance()
-                self.advance()
-                self.advance()
-                return Token(CTG, CTG)
-
-            if self.text[self.pos: self.pos + 4] == LOG + LPAREN:
-                self.advance()
-                self.advance()
-                self.advance()
-                return Token(LOG, LOG)
-
-            if self.text[self.pos: self.pos + 4] == DEG + LPAREN:
-                self.advance()
-                self.advance()
-                self.advance()
-                return Token(DEG, DEG)
-
-            if self.text[self.pos: self.pos + 4] == RAD + LPAREN:
-                self.advance()
-                self.advance()
-                self.advance()
-                return Token(RAD, RAD)
-
-            if self.text[self.pos: self.pos + 4] == TRUE:
-                self.advance()
-                self.advance()
-                self.advance()
-                self.advance()
-                if self.current_char.isalpha:
-                    self.pos = self.pos - 4
-                    self.current_char = self.text[self.pos]
-                else:
-                    return Token(TRUE, TRUE)
-
-            if self.text[self.pos: self.pos + 5] == FALSE:
-                self.advance()
-                self.advance()
-                self.advance()
-                self.advance()
-                self.advance()
-                if self.current_char.isalpha:
-                    self.pos = self.pos - 5
-                    self.current_char = self.text[self.pos]
-                else:
-                    return Token(FALSE, FALSE)
-
-            if self.current_char.isalpha():
-                charName = self.var()
-                if charName == PI:
-                    return Token(PI, PI)
-                elif charName == E_C:
-                    return Token(E_C, E_C)
-
-                if self.current_char is None:
-                    retrunToThisPos = self.pos - 1
-                else:
-                        retrunToThisPos = self.pos
-
-                if self.current_char == '=':
-                    self.advance()
-                    if self.current_char == '=':
-                        self.pos = retrunToThisPos
-                        self.current_char = self.text[self.pos]
-                        return Token(VARIABLE, charName)
-                    else:
-                        self.pos = retrunToThisPos
-                        self.current_char = self.text[self.pos]
-                        return Token(VARIABLE_SET, charName)
-                elif self.current_char == '+':
-                    self.advance()
-                    if self.current_char == '=':
-                        self.pos = retrunToThisPos
-                        self.current_char = self.text[self.pos]
-                        return Token(VARIABLE_SET, charName)
-                    else:
-                        self.pos = retrunToThisPos
-                        self.current_char = self.text[self.pos]
-                        return Token(VARIABLE, charName)
-                elif self.current_char == '*':
-                    self.advance()
-                    if self.current_char == '=':
-                        self.pos = retrunToThisPos
-                        self.current_char = self.text[self.pos]
-                        return Token(VARIABLE_SET, charName)
-                    else:
-                        self.pos = retrunToThisPos
-                        self.current_char = self.text[self.pos]
-                        return Token(VARIABLE, charName)
-                elif self.current_char == '/':
-                    self.advance()
-                    if self.current_char == '=':
-                        self.pos = retrunToThisPos
-                        self.current_char = self.text[self.pos]
-                        return Token(VARIABLE_SET, charName)
-                    else:
-                        self.pos = retrunToThisPos
-                        self.current_char = self.text[self.pos]
-                        return Token(VARIABLE, charName)
-                elif self.current_char == '-':
-                    self.advance()
-                    if self.current_char == '=':
-                        self.pos = retrunToThisPos
-                        self.current_char = self.text[self.pos]
-                        return Token(VARIABLE_SET, charName)
-                    else:
-                        self.pos = retrunToThisPos
-                        self.current_char = self.text[self.pos]
-                        return Token(VARIABLE, charName)
-                else:
-                    self.pos = retrunToThisPos
-                    self.current_char = self.text[self.pos]
-                    return Token(VARIABLE, charName)
-            self.error()
-
-        return Token(EOF, None)
+        match = TOKEN_PATTERN.match(self.text, self.pos)
+        if match is None:
+            self.pos = WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                self.error()
+            return EOF_TOKEN
+        self.pos = match.end()
+
+        kind = match.lastgroup
+        if kind == 'operator':
+            return OPERATORS[match.group(kind)]
+        elif kind == 'number':
+            number = match.group(kind)
+            if '.' in number:
+                return Token(NUMBER, float(number))
+            return Token(NUMBER, int(number))
+        elif kind == 'function':
+            return FUNCTIONS[match.group(kind)]
+
+        name = match.group('name')
+        if name in CONSTANTS:
+            return CONSTANTS[name]
+        elif kind == 'assign':
+            return Token(VARIABLE_SET, name)
+        return Token(VARIABLE, name)
+
+
+###############################################################################
+#                                                                             #
+#  STREAMING LEXER                                                            #
+#                                                                             #
+###############################################################################
+#
+# Lexes input that is not available as one string: a file object (text or
+# binary), an mmap, bytes, or any iterable of str or bytes chunks. Only the
+# current chunk and the unfinished token at its end are kept in memory.
+#
+# A token at the end of the buffer may continue in the next chunk (a number
+# or a name), and whether a name is a VARIABLE_SET depends on the text after
+# it. A token is only taken once the buffer holds the first two
+# non-whitespace characters after it, or the input has ended; otherwise
+# the next chunk is read and the token is matched again.
+
+# matches when the text after a token holds the two characters needed to
+# decide it, see TOKEN_PATTERN
+DECIDED = re.compile(r'\s*\S.', re.DOTALL)
+
+
+def chunks(source, chunk_size):
+    """Yield the input in pieces of str or bytes."""
+    if isinstance(source, str):
+        yield source
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield bytes(view[start:start + chunk_size])
+    elif hasattr(source, 'read'):
+        # files and mmap objects
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        for chunk in source:
+            yield chunk
+
+
+class StreamingLexer(Lexer):
+    # Lexer.get_next_token as defined, also while metrics.enable() wraps it:
+    # a token matched again after a fill() is still returned only once,
+    # and is counted by the wrapper of StreamingLexer.get_next_token
+    match = Lexer.get_next_token
+
+    def __init__(self, source, chunk_size=1 << 16, encoding='utf-8'):
+        super(StreamingLexer, self).__init__('')
+        self.chunks = chunks(source, chunk_size)
+        # bytes are decoded incrementally, a character may be split
+        # between two chunks
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.exhausted = False
+
+    def fill(self):
+        """Replace the consumed part of the buffer with the next chunk."""
+        for chunk in self.chunks:
+            if not isinstance(chunk, str):
+                chunk = self.decoder.decode(chunk)
+            if chunk:
+                self.text = self.text[self.pos:] + chunk
+                self.pos = 0
+                return
+        self.text = self.text[self.pos:] + self.decoder.decode(b'', final=True)
+        self.pos = 0
+        self.exhausted = True
+
+    def get_next_token(self):
+        while True:
+            start = self.pos
+            try:
+                token = self.match()
+            except Exception:
+                # e.g. '1.5' followed by '.5' in the next chunk
+                if self.exhausted or DECIDED.match(self.text, self.pos):
+                    raise
+            else:
+                if self.exhausted or DECIDED.match(self.text, self.pos):
+                    return token
+            # the token may continue in the next chunk
+            self.pos = start
+            self.fill()
+
+    def __iter__(self):
+        """Yield the tokens up to, not including, EOF."""
+        while True:
+            token = self.get_next_token()
+            if token.type == EOF:
+                return
+            yield token
@@ -0,0 +1,17 @@
+from .cache import parse
+from .optimizer import optimize
+from .dag import share
+
+
+def load(text, optimize_tree=False, share_tree=False):
+    """Parse expression text and prepare the tree for evaluation.
+
+    Used as ExpressionCache loader, e.g. with functools.partial, so the
+    work is done once per distinct expression.
+    """
+    tree = parse(text)
+    if optimize_tree:
+        tree = optimize(tree)
+    if share_tree:
+        tree = share(tree)
+    return tree
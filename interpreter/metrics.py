@@ -0,0 +1,301 @@
+from bisect import bisect_left
+from importlib.util import resolve_name
+import json
+import sys
+import threading
+import time
+
+from . import engines
+from .lexer import Lexer, StreamingLexer
+from .parser import RecursiveDescentParser
+from .interpreter import Interpreter
+
+###############################################################################
+#                                                                             #
+#  METRICS                                                                    #
+#                                                                             #
+###############################################################################
+#
+# Counters and latency histograms for the phases of an evaluation: lexing,
+# parsing and evaluating, the tokens produced, the nodes visited by the
+# tree walking Interpreter per node type and the errors per phase and kind.
+#
+# Instrumentation is added by enable(), which wraps the get_next_token
+# methods of the lexers, Parser.parse and the evaluate method of every
+# engine, and removed again by disable(). While it is off the original
+# methods are in place, so it costs nothing. Engines are imported when
+# first used (see engines.py); those imported after enable() are wrapped
+# by get_engine() when they are loaded.
+#
+# Tokens are pulled by the parser, so lexing time is measured per token and
+# reported separately from the rest of the parse time.
+
+# upper bounds of the latency histogram buckets, in seconds
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+           1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0)
+
+PHASES = ('lex', 'parse', 'eval')
+
+PREFIX = 'rafmath'
+
+
+def error_kind(error):
+    """Errors raised as plain Exception are told apart by their message."""
+    if type(error) is Exception:
+        return str(error)
+    return type(error).__name__
+
+
+class Histogram(object):
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # observations per bucket, the last one for values above every bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, observations up to it) pairs, ending with +Inf."""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile."""
+        if not self.count:
+            return 0.0
+        for bound, total in self.cumulative():
+            if total >= fraction * self.count:
+                return bound
+        return float('inf')
+
+
+class Metrics(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.tokens = 0
+            self.expressions = 0
+            # node type name -> visits
+            self.nodes = {}
+            # (phase, kind) -> errors
+            self.errors = {}
+            self.histograms = {phase: Histogram() for phase in PHASES}
+
+    def observe(self, phase, seconds):
+        with self.lock:
+            self.histograms[phase].observe(seconds)
+            if phase == 'eval':
+                self.expressions += 1
+
+    def token(self):
+        with self.lock:
+            self.tokens += 1
+
+    def visited(self, node_type):
+        with self.lock:
+            self.nodes[node_type] = self.nodes.get(node_type, 0) + 1
+
+    def error(self, phase, error):
+        key = phase, error_kind(error)
+        with self.lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'tokens': self.tokens,
+                'expressions': self.expressions,
+                'nodes': dict(self.nodes),
+                'errors': [{'phase': phase, 'kind': kind, 'count': count}
+                           for (phase, kind), count in sorted(self.errors.items())],
+                'seconds': {phase: {
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    'buckets': [[bound if bound != float('inf') else '+Inf', total]
+                                for bound, total in histogram.cumulative()],
+                } for phase, histogram in self.histograms.items()},
+            }
+
+    def to_json(self, indent=None):
+        return json.dumps(self.as_dict(), indent=indent, sort_keys=True)
+
+    def to_prometheus(self):
+        """Metrics in the Prometheus text exposition format."""
+        data = self.as_dict()
+        lines = [
+            '# HELP {}_tokens_total Tokens produced by the lexer.'.format(PREFIX),
+            '# TYPE {}_tokens_total counter'.format(PREFIX),
+            '{}_tokens_total {}'.format(PREFIX, data['tokens']),
+            '# HELP {}_nodes_visited_total Nodes visited by the tree interpreter.'.format(PREFIX),
+            '# TYPE {}_nodes_visited_total counter'.format(PREFIX),
+        ]
+        for node_type, count in sorted(data['nodes'].items()):
+            lines.append('{}_nodes_visited_total{{type="{}"}} {}'.format(PREFIX, label(node_type), count))
+        lines.append('# HELP {}_errors_total Errors per phase and kind.'.format(PREFIX))
+        lines.append('# TYPE {}_errors_total counter'.format(PREFIX))
+        for error in data['errors']:
+            lines.append('{}_errors_total{{phase="{}",kind="{}"}} {}'.format(
+                PREFIX, error['phase'], label(error['kind']), error['count']))
+        for phase in PHASES:
+            name = '{}_{}_seconds'.format(PREFIX, phase)
+            seconds = data['seconds'][phase]
+            lines.append('# HELP {} Time spent in the {} phase per expression.'.format(name, phase))
+            lines.append('# TYPE {} histogram'.format(name))
+            for bound, total in seconds['buckets']:
+                lines.append('{}_bucket{{le="{}"}} {}'.format(name, bound, total))
+            lines.append('{}_sum {}'.format(name, repr(seconds['sum'])))
+            lines.append('{}_count {}'.format(name, seconds['count']))
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """Short human readable report, e.g. for the REPL."""
+        with self.lock:
+            lines = ['expressions {}, tokens {}'.format(self.expressions, self.tokens)]
+            for phase in PHASES:
+                histogram = self.histograms[phase]
+                if histogram.count:
+                    lines.append('{:<6} {:>8} calls {:>10.1f} us avg {:>10} us p99'.format(
+                        phase, histogram.count, histogram.sum / histogram.count * 1e6,
+                        format_bound(histogram.quantile(0.99))))
+            if self.nodes:
+                lines.append('nodes  ' + ', '.join(
+                    '{} {}'.format(node_type, count) for node_type, count in sorted(self.nodes.items())))
+            for (phase, kind), count in sorted(self.errors.items()):
+                lines.append('error  {} {}: {}'.format(phase, kind, count))
+        return '\n'.join(lines)
+
+
+def label(value):
+    """Escape a Prometheus label value."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_bound(seconds):
+    if seconds == float('inf'):
+        return '>{:g}'.format(BUCKETS[-1] * 1e6)
+    return '<={:g}'.format(seconds * 1e6)
+
+
+# Metrics collected while instrumentation is enabled
+registry = Metrics()
+
+# (class, attribute, method defined on the class before, or None)
+patched = []
+
+# lexing time of the parse running in the current thread
+local = threading.local()
+
+# engines may be loaded by several threads at once, e.g. in a server
+patching = threading.Lock()
+
+
+def patch(cls, name, wrapper):
+    original = getattr(cls, name)
+    patched.append((cls, name, cls.__dict__.get(name)))
+    setattr(cls, name, wrapper(original))
+
+
+def lexing(original):
+    clock = time.perf_counter
+
+    def get_next_token(self):
+        start = clock()
+        token = original(self)
+        local.lexing = getattr(local, 'lexing', 0.0) + clock() - start
+        registry.token()
+        return token
+    return get_next_token
+
+
+def parsing(original):
+    clock = time.perf_counter
+
+    def parse(self):
+        local.lexing = 0.0
+        start = clock()
+        try:
+            return original(self)
+        except Exception as error:
+            registry.error('parse', error)
+            raise
+        finally:
+            elapsed = clock() - start
+            registry.observe('lex', local.lexing)
+            registry.observe('parse', elapsed - local.lexing)
+    return parse
+
+
+def evaluating(original):
+    clock = time.perf_counter
+
+    def evaluate(self, tree):
+        start = clock()
+        try:
+            return original(self, tree)
+        except Exception as error:
+            registry.error('eval', error)
+            raise
+        finally:
+            registry.observe('eval', clock() - start)
+    return evaluate
+
+
+def visiting(original):
+    # registry.nodes is looked up on every visit: reset() replaces it
+    def visit(self, node):
+        registry.visited(type(node).__name__)
+        return original(self, node)
+    return visit
+
+
+def enabled():
+    return bool(patched)
+
+
+def instrument(engine):
+    """Wrap the evaluate method of an engine class, unless it already is."""
+    owner = next(cls for cls in engine.__mro__ if 'evaluate' in cls.__dict__)
+    with patching:
+        if not any(cls is owner and name == 'evaluate' for cls, name, _ in patched):
+            patch(owner, 'evaluate', evaluating)
+
+
+def enable():
+    """Start collecting metrics into `registry`."""
+    if enabled():
+        return registry
+    patch(Lexer, 'get_next_token', lexing)
+    # the streaming lexer matches with the unwrapped method
+    patch(StreamingLexer, 'get_next_token', lexing)
+    patch(RecursiveDescentParser, 'parse', parsing)
+    patch(Interpreter, 'visit', visiting)
+    for module, cls in engines.ENGINE_CLASSES.values():
+        loaded = sys.modules.get(resolve_name(module, __package__))
+        if loaded is not None:
+            instrument(getattr(loaded, cls))
+    engines.on_load.append(instrument)
+    return registry
+
+
+def disable():
+    """Stop collecting metrics and restore the original methods."""
+    if instrument in engines.on_load:
+        engines.on_load.remove(instrument)
+    while patched:
+        cls, name, original = patched.pop()
+        if original is None:
+            delattr(cls, name)
+        else:
+            setattr(cls, name, original)
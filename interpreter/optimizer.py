@@ -0,0 +1,179 @@
+from .lexer import Token, NUMBER, PLUS, MINUS, MUL, DIV, LEFT_SHIFT, RIGHT_SHIFT, EQ
+from .parser import BinOp, UnOp, Func, Boolean, Num, Variable_Set, Constants, Bool
+from .interpreter import NodeVisitor, Interpreter
+from .inference import TypeInference, INT
+from .session import Session
+from .dag import Shared, COMPOSITE
+
+###############################################################################
+#                                                                             #
+#  OPTIMIZER                                                                  #
+#                                                                             #
+###############################################################################
+#
+# Rewrites a parsed tree into a cheaper tree with the same result, between
+# Parser.parse() and evaluation:
+#
+# * subtrees without variables are evaluated once, with the Interpreter
+#   itself so the int/float rules are exactly the same, and replaced by
+#   a Num; subtrees that raise are left alone so the error happens when
+#   the expression is evaluated
+# * identities that can't change the value or its type are removed:
+#   x * 1, 1 * x, x / 1, x - 0, --x and +x always, x + 0, 0 + x, x << 0
+#   and x >> 0 only when x is known to be an int (for floats, -0.0 + 0 is
+#   0.0 and shifting raises)
+#
+# Comparisons are never folded away since they decide the result of the
+# whole expression, only their operands are optimized.
+
+
+class OptimizerStats(object):
+    def __init__(self):
+        self.nodes_before = 0
+        self.nodes_after = 0
+        self.folded = 0
+        self.simplified = 0
+
+    def __str__(self):
+        return 'nodes {} -> {}, {} constant subtrees folded, {} identities removed'.format(
+            self.nodes_before, self.nodes_after, self.folded, self.simplified)
+
+
+def count_nodes(node):
+    if isinstance(node, (BinOp, Boolean)):
+        return 1 + count_nodes(node.left) + count_nodes(node.right)
+    elif isinstance(node, (UnOp, Func, Variable_Set)):
+        return 1 + count_nodes(node.value)
+    elif isinstance(node, Shared):
+        return count_nodes(node.value)
+    elif node is None:
+        return 0
+    return 1
+
+
+def is_constant(node):
+    return isinstance(node, (Num, Constants, Bool))
+
+
+def is_number(node, value):
+    return isinstance(node, Num) and type(node.value) is int and node.value == value
+
+
+class Optimizer(NodeVisitor):
+    def __init__(self):
+        # constant subtrees are evaluated in a session of their own
+        self.interpreter = Interpreter(None, Session())
+        self.inference = TypeInference()
+        self.stats = OptimizerStats()
+        # Shared node -> its optimized replacement
+        self.shared = {}
+
+    def optimize(self, tree):
+        self.stats = OptimizerStats()
+        self.shared = {}
+        self.stats.nodes_before = count_nodes(tree)
+        tree = self.visit(tree)
+        self.stats.nodes_after = count_nodes(tree)
+        return tree
+
+    def fold(self, node):
+        """Replace a subtree of constants by its value."""
+        try:
+            value = self.interpreter.visit(node)
+        except Exception:
+            return node
+        if type(value) not in (int, float):
+            return node
+        self.stats.folded += 1
+        return Num(Token(NUMBER, value))
+
+    def simplified(self, node):
+        self.stats.simplified += 1
+        return node
+
+    def is_int(self, node):
+        return self.inference.visit(node) is INT
+
+    def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        op = node.op.type
+        if is_constant(left) and is_constant(right):
+            return self.fold(BinOp(left, node.op, right))
+        if op == MUL and is_number(right, 1) or op == DIV and is_number(right, 1):
+            return self.simplified(left)
+        elif op == MUL and is_number(left, 1):
+            return self.simplified(right)
+        elif op == MINUS and is_number(right, 0):
+            return self.simplified(left)
+        elif op == PLUS and is_number(right, 0) and self.is_int(left):
+            return self.simplified(left)
+        elif op == PLUS and is_number(left, 0) and self.is_int(right):
+            return self.simplified(right)
+        elif op in (LEFT_SHIFT, RIGHT_SHIFT) and is_number(right, 0) and self.is_int(left):
+            return self.simplified(left)
+        if left is node.left and right is node.right:
+            return node
+        return BinOp(left, node.op, right)
+
+    def visit_UnOp(self, node):
+        value = self.visit(node.value)
+        if node.op.type == PLUS:
+            return self.simplified(value)
+        elif is_constant(value):
+            return self.fold(UnOp(node.op, value))
+        elif isinstance(value, UnOp) and value.op.type == MINUS:
+            # --x, the inner +x is already gone
+            return self.simplified(value.value)
+        if value is node.value:
+            return node
+        return UnOp(node.op, value)
+
+    def visit_Func(self, node):
+        value = self.visit(node.value)
+        if is_constant(value):
+            return self.fold(Func(node.op, value))
+        if value is node.value:
+            return node
+        return Func(node.op, value)
+
+    def visit_Boolean(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        if left is node.left and right is node.right:
+            return node
+        return Boolean(node.op, left, right)
+
+    def visit_Variable_Set(self, node):
+        value = self.visit(node.value)
+        if value is node.value:
+            return node
+        return Variable_Set(node.op, value, node.assign)
+
+    def visit_Shared(self, node):
+        if node not in self.shared:
+            value = self.visit(node.value)
+            if value is node.value:
+                self.shared[node] = node
+            elif isinstance(value, COMPOSITE):
+                self.shared[node] = Shared(value)
+            else:
+                self.shared[node] = value
+        return self.shared[node]
+
+    def visit_Constants(self, node):
+        return self.fold(node)
+
+    def visit_Num(self, node):
+        return node
+
+    def visit_Variable(self, node):
+        return node
+
+    def visit_Bool(self, node):
+        return node
+
+
+def optimize(tree):
+    return Optimizer().optimize(tree)
+
@@ -0,0 +1,107 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+from .lexer import Lexer, VARIABLE_SET
+from .cache import ExpressionCache, parse
+from .session import Session
+from .engines import Evaluator, DEFAULT_ENGINE
+from .batch import numbered_lines, error_message
+
+###############################################################################
+#                                                                             #
+#  PARALLEL EVALUATOR                                                         #
+#                                                                             #
+###############################################################################
+#
+# Splits a script into chunks of lines and lexes, parses and evaluates the
+# chunks in a pool of worker processes. Results come back in the order of
+# the input.
+#
+# A line only depends on the lines before it through variables, and only
+# assignments (lines starting with a VARIABLE_SET token) change them. The
+# assignments are therefore also evaluated, in order, in the main process,
+# and every chunk is sent with a copy of the variables as they are at its
+# first line. Inside a chunk the worker evaluates the lines in order, so
+# the results are the same as for sequential evaluation.
+
+
+def is_assignment(text):
+    try:
+        return Lexer(text).get_next_token().type == VARIABLE_SET
+    except Exception:
+        # the error is reported when the line is evaluated
+        return False
+
+
+def evaluate_chunk(engine, loader, variables, lines):
+    """Evaluate (line number, text) pairs in a fresh session.
+
+    Returns (line number, ok, result or error message) for every line.
+    """
+    evaluator = Evaluator(Session(variables), engine, ExpressionCache(loader=loader))
+    results = []
+    for number, text in lines:
+        try:
+            results.append((number, True, evaluator.evaluate(text)))
+        except Exception as error:
+            results.append((number, False, error_message(error)))
+    return results
+
+
+class ParallelEvaluator(object):
+    def __init__(self, workers=None, chunk_size=2000, engine=DEFAULT_ENGINE, session=None, loader=parse):
+        self.workers = workers or os.cpu_count() or 1
+        # lines per task; large enough that sending a chunk and its results
+        # costs little compared to evaluating it
+        self.chunk_size = chunk_size
+        self.engine = engine
+        # ExpressionCache loader of the workers, must be picklable
+        self.loader = loader
+        # tracks the variables set by assignments between chunks
+        self.evaluator = Evaluator(session, engine, ExpressionCache(loader=loader))
+
+    def assign(self, text):
+        try:
+            self.evaluator.evaluate(text)
+        except Exception:
+            # the worker evaluating this line reports the error
+            pass
+
+    def submit(self, executor, variables, chunk):
+        return executor.submit(evaluate_chunk, self.engine, self.loader, variables, chunk)
+
+    def evaluate(self, lines):
+        """Yield (line number, ok, result or error message) in input order."""
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            chunk = []
+            variables = dict(self.evaluator.session.variables)
+            for number, text in numbered_lines(lines):
+                chunk.append((number, text))
+                if is_assignment(text):
+                    self.assign(text)
+                if len(chunk) >= self.chunk_size:
+                    pending.append(self.submit(executor, variables, chunk))
+                    chunk = []
+                    variables = dict(self.evaluator.session.variables)
+                    # bound memory: wait for the oldest chunk when enough are queued
+                    while len(pending) > 2 * self.workers or (pending and pending[0].done()):
+                        for result in pending.popleft().result():
+                            yield result
+            if chunk:
+                pending.append(self.submit(executor, variables, chunk))
+            while pending:
+                for result in pending.popleft().result():
+                    yield result
+
+
+def run(evaluator, lines, writer):
+    """Like batch.run, with a ParallelEvaluator."""
+    for number, ok, value in evaluator.evaluate(lines):
+        if ok:
+            writer.result(value)
+        else:
+            writer.error(number, value)
+    writer.close()
+    return writer.error_count
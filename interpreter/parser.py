@@ -1,4 +1,5 @@
 from .lexer import *
+from .functions import registry
 
 ###############################################################################
 #                                                                             #
@@ -6,79 +7,108 @@ from .lexer import *
 #                                                                             #
 ###############################################################################
 variables = {}
-firstToken = True
 
 
 class AST(object):
-    pass
+    # Nodes have no per-instance __dict__, which more than halves the memory
+    # of a parsed tree. __weakref__ lets engines cache per tree in weak dicts.
+    __slots__ = ('__weakref__',)
+
+    @property
+    def token(self):
+        """Token of the node; operator nodes store it only as `op`."""
+        return self.op
 
 
 class UnOp(AST):
+    __slots__ = ('op', 'value')
+
     def __init__(self, op, value):
-        self.token = self.op = op
+        self.op = op
         self.value = value
 
 
 class BinOp(AST):
+    __slots__ = ('left', 'op', 'right')
+
     def __init__(self, left, op, right):
         self.left = left
-        self.token = self.op = op
+        self.op = op
         self.right = right
 
 
 class Bool(AST):
+    __slots__ = ('token', 'value')
+
     def __init__(self, token):
         self.token = token
         self.value = token.value
 
 
 class Num(AST):
+    # numbers are the most common nodes, so only the value is kept
+    __slots__ = ('value',)
+
     def __init__(self, token):
-        self.token = token
         self.value = token.value
 
+    @property
+    def token(self):
+        return Token(NUMBER, self.value)
+
 
 class Boolean(AST):
+    __slots__ = ('op', 'left', 'right')
+
     def __init__(self, op, left, right):
-        self.token = self.op = op
+        self.op = op
         self.left = left
         self.right = right
-        self.valueNumber = left
+
+    @property
+    def valueNumber(self):
+        return self.left
 
 
 class Variable(AST):
+    __slots__ = ('op', 'name')
+
     def __init__(self, op):
-        global variables
-        self.token = self.op = op
+        self.op = op
         self.name = op.value
-        if self.name in variables:
-            self.value = variables[self.name]
-        else:
-            raise Exception('Variable not found')
 
 
 class Variable_Set(AST):
-    def __init__(self, op, value):
-        global variables
-        self.token = self.op = op
-        self.name = self.token.value
+    __slots__ = ('op', 'name', 'value', 'assign')
+
+    def __init__(self, op, value, assign):
+        self.op = op
+        self.name = op.value
         self.value = value
+        # assignment operator token: =, +=, -=, *= or /=
+        self.assign = assign
 
 
 class Func(AST):
+    __slots__ = ('op', 'value')
+
     def __init__(self, op, value):
-        self.token = self.op = op
+        self.op = op
         self.value = value
 
 
 class Constants(AST):
+    __slots__ = ('op',)
+
     def __init__(self, op):
-        self.token = self.op = op
+        self.op = op
 
 
-class Parser(object):
+class RecursiveDescentParser(object):
     def __init__(self, lexer):
         self.lexer = lexer
+        # VARIABLE_SET is only allowed as the first token of an expression
+        self.first_token = True
         # set current token to the first token taken from the input
         self.current_token = self.lexer.get_next_token()
 
@@ -90,11 +120,10 @@ class Parser(object):
         # type and if they match then "eat" the current token
         # and assign the next token to the self.current_token,
         # otherwise raise an exception.
-        global firstToken
-        if not firstToken and token_type == VARIABLE_SET:
+        if not self.first_token and token_type == VARIABLE_SET:
             self.error()
         else:
-            firstToken = False
+            self.first_token = False
         if self.current_token.type == token_type:
             self.current_token = self.lexer.get_next_token()
         else:
@@ -119,44 +148,8 @@ class Parser(object):
             self.eat(MINUS)
             node = UnOp(op=token, value=self.factor())
             return node
-        elif token.type == LOG:
-            self.eat(LOG)
-            self.eat(LPAREN)
-            node = Func(op=token, value=self.expr())
-            self.eat(RPAREN)
-            return node
-        elif token.type == SQRT:
-            self.eat(SQRT)
-            self.eat(LPAREN)
-            node = Func(op=token, value=self.expr())
-            self.eat(RPAREN)
-            return node
-        elif token.type == POW:
-            self.eat(POW)
-            self.eat(LPAREN)
-            node = Func(op=token, value=self.expr())
-            self.eat(RPAREN)
-            return node
-        elif token.type == SIN:
-            self.eat(SIN)
-            self.eat(LPAREN)
-            node = Func(op=token, value=self.expr())
-            self.eat(RPAREN)
-            return node
-        elif token.type == COS:
-            self.eat(COS)
-            self.eat(LPAREN)
-            node = Func(op=token, value=self.expr())
-            self.eat(RPAREN)
-            return node
-        elif token.type == TAN:
-            self.eat(TAN)
-            self.eat(LPAREN)
-            node = Func(op=token, value=self.expr())
-            self.eat(RPAREN)
-            return node
-        elif token.type == CTG:
-            self.eat(CTG)
+        elif token.type in registry:
+            self.eat(token.type)
             self.eat(LPAREN)
             node = Func(op=token, value=self.expr())
             self.eat(RPAREN)
@@ -171,50 +164,20 @@ class Parser(object):
             self.eat(VARIABLE)
             return Variable(op=token)
         elif token.type == VARIABLE_SET:
-            global variables
             self.eat(VARIABLE_SET)
-            if self.current_token.type == EQ:
-                self.eat(EQ)
-                node = self.expr()
-            elif self.current_token.type == PLUS_EQUALS:
-                self.eat(PLUS_EQUALS)
-                node = self.expr()
-                node.value = node.value + variables[token.value]
-            elif self.current_token.type == MINUS_EQUALS:
-                self.eat(MINUS_EQUALS)
-                node = self.expr()
-                node.value = variables[token.value] - node.value
-            elif self.current_token.type == MUL_EQUALS:
-                self.eat(MUL_EQUALS)
-                node = self.expr()
-                node.value = node.value * variables[token.value]
-            elif self.current_token.type == DIV_EQUALS:
-                self.eat(DIV_EQUALS)
-                node = self.expr()
-                if isinstance(variables[token.value], int) and isinstance(node.value, int):
-                    node.value = variables[token.value] // node.value
-                else:
-                    node.value = variables[token.value] / node.value
-
-            return Variable_Set(op=token, value=node)
+            assign = self.current_token
+            if assign.type in (EQ, PLUS_EQUALS, MINUS_EQUALS, MUL_EQUALS, DIV_EQUALS):
+                self.eat(assign.type)
+            else:
+                self.error()
+            node = self.expr()
+            return Variable_Set(op=token, value=node, assign=assign)
         elif token.type == PI:
             self.eat(PI)
             return Constants(op=token)
         elif token.type == E_C:
             self.eat(E_C)
             return Constants(op=token)
-        elif token.type == DEG:
-            self.eat(DEG)
-            self.eat(LPAREN)
-            node = Func(op=token, value=self.expr())
-            self.eat(RPAREN)
-            return node
-        elif token.type == RAD:
-            self.eat(RAD)
-            self.eat(LPAREN)
-            node = Func(op=token, value=self.expr())
-            self.eat(RPAREN)
-            return node
 
     def term(self):
         """term : factor ((MUL | DIV) factor)*"""
@@ -277,9 +240,139 @@ class Parser(object):
         return node
 
     def parse(self):
-        global firstToken
-        firstToken = True
+        self.first_token = True
         node = self.expr()
         if self.current_token.type != EOF:
             self.error()
         return node
+
+
+###############################################################################
+#                                                                             #
+#  PRECEDENCE CLIMBING PARSER                                                 #
+#                                                                             #
+###############################################################################
+#
+# Parses the grammar of RecursiveDescentParser into the same trees, with an
+# explicit stack instead of one Python call per nesting level, so the depth
+# of an expression is only limited by memory.
+#
+# Binary operators are reduced by binding power: * / % bind tighter than
+# + -, which bind tighter than comparisons and shifts. Comparisons and
+# shifts take a whole expression as their right operand, so they are right
+# associative; the others are left associative. Parentheses, function
+# calls, assignments and unary signs are kept on the stack until their
+# operand is complete.
+
+BINDING_POWER = {
+    MUL: 3, DIV: 3, MOD: 3,
+    PLUS: 2, MINUS: 2,
+    HIGHER: 1, LOWER: 1, LOWER_EQ: 1, HIGHER_EQ: 1, EQ_EQ: 1, LEFT_SHIFT: 1, RIGHT_SHIFT: 1,
+}
+
+RIGHT_ASSOCIATIVE = 1
+
+COMPARISON_TYPES = (HIGHER, LOWER, LOWER_EQ, HIGHER_EQ, EQ_EQ)
+
+
+ASSIGNMENT_TYPES = (EQ, PLUS_EQUALS, MINUS_EQUALS, MUL_EQUALS, DIV_EQUALS)
+
+# kinds of stack entries
+BINARY, UNARY, GROUP, CALL, ASSIGNMENT = range(5)
+
+
+class Parser(RecursiveDescentParser):
+    def expr(self):
+        # (binding power, kind, token, assignment token) entries; only
+        # binary operators have a binding power above 0
+        stack = []
+        values = []
+        get_next_token = self.lexer.get_next_token
+        while True:
+            token = self.current_token
+            if token.type == NUMBER:
+                self.first_token = False
+                self.current_token = get_next_token()
+                values.append(Num(token))
+            elif token.type == VARIABLE:
+                self.first_token = False
+                self.current_token = get_next_token()
+                values.append(Variable(op=token))
+            elif not self.operand(token, stack, values):
+                # an opening entry was pushed, its operand comes next
+                continue
+            while True:
+                # unary signs apply to the complete operand
+                while stack and stack[-1][1] == UNARY:
+                    values.append(UnOp(op=stack.pop()[2], value=values.pop()))
+                token = self.current_token
+                power = BINDING_POWER.get(token.type)
+                if power is not None:
+                    # right associative operators don't reduce their own level
+                    self.reduce(stack, values, power + 1 if power == RIGHT_ASSOCIATIVE else power)
+                    self.first_token = False
+                    self.current_token = get_next_token()
+                    stack.append((power, BINARY, token, None))
+                    break
+                # not an operator: the innermost open expression ends here
+                self.reduce(stack, values, 1)
+                if not stack:
+                    return values.pop()
+                _, kind, token, assign = stack.pop()
+                if kind == GROUP:
+                    self.eat(RPAREN)
+                elif kind == CALL:
+                    self.eat(RPAREN)
+                    values.append(Func(op=token, value=values.pop()))
+                elif kind == ASSIGNMENT:
+                    values.append(Variable_Set(op=token, value=values.pop(), assign=assign))
+
+    def operand(self, token, stack, values):
+        """Parse the start of any other factor.
+
+        Returns True after adding a complete factor to `values`, False after
+        pushing an entry whose operand follows. Like
+        RecursiveDescentParser.factor, adds None without eating anything if
+        no factor starts at the current token.
+        """
+        if token.type == LPAREN:
+            self.eat(LPAREN)
+            stack.append((0, GROUP, token, None))
+        elif token.type in (PLUS, MINUS):
+            self.eat(token.type)
+            stack.append((0, UNARY, token, None))
+        elif token.type in registry:
+            self.eat(token.type)
+            self.eat(LPAREN)
+            stack.append((0, CALL, token, None))
+        elif token.type == VARIABLE_SET:
+            self.eat(VARIABLE_SET)
+            assign = self.current_token
+            if assign.type in ASSIGNMENT_TYPES:
+                self.eat(assign.type)
+            else:
+                self.error()
+            stack.append((0, ASSIGNMENT, token, assign))
+        elif token.type in (TRUE, FALSE):
+            self.eat(token.type)
+            values.append(Bool(token))
+            return True
+        elif token.type in (PI, E_C):
+            self.eat(token.type)
+            values.append(Constants(op=token))
+            return True
+        else:
+            values.append(None)
+            return True
+        return False
+
+    def reduce(self, stack, values, power):
+        """Build the pending binary operations with at least the given
+        binding power."""
+        while stack and stack[-1][0] >= power:
+            token = stack.pop()[2]
+            right = values.pop()
+            if token.type in COMPARISON_TYPES:
+                values[-1] = Boolean(op=token, left=values[-1], right=right)
+            else:
+                values[-1] = BinOp(left=values[-1], op=token, right=right)
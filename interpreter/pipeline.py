@@ -0,0 +1,230 @@
+import itertools
+
+from .cache import parse, normalize
+from .engines import get_engine, DEFAULT_ENGINE
+from .lexer import EQ
+from .parser import AST, Boolean, Variable_Set
+from .reactive import variable_names
+from .session import Session
+from .batch import error_message
+
+try:
+    from . import vectorized
+    import numpy
+except ImportError:
+    # NumPy is optional, chunks are then evaluated row by row
+    vectorized = None
+
+###############################################################################
+#                                                                             #
+#  COLUMN PIPELINE                                                            #
+#                                                                             #
+###############################################################################
+#
+# Filters and computes over a table read in chunks of rows, e.g. from a CSV
+# file: the columns of each row are the variables of the expressions.
+#
+#     python . --csv orders.csv --where 'qty > 10' --select 'total = price * qty - fee'
+#
+# A row is kept if every comparison of the filter holds; the projections are
+# evaluated in order on the kept rows and written as new columns, named by
+# their assignment or by their text. Only one chunk of rows is in memory at
+# a time and every chunk is written out before the next one is read.
+#
+# Cells are numbers as if assigned one row at a time: int if they are
+# written as one, otherwise float. With NumPy, a chunk whose columns are
+# each all int or all float is evaluated column-wise (see vectorized.py);
+# other chunks, and chunks where that fails, are evaluated row by row, so
+# that errors are reported per row. Rows that fail are skipped. Int columns
+# are int64 arrays there, so an integer result that could leave the int64
+# range (or a negative shift count) fails the chunk too, and the chunk gets
+# the exact results of Python ints row by row.
+
+
+def number(text, column):
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        raise Exception('Invalid number {!r} in column {}'.format(text, column))
+
+
+def nodes(tree):
+    """Yield every node of a parsed expression."""
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        yield node
+        for attribute in ('left', 'right', 'value'):
+            child = getattr(node, attribute, None)
+            if isinstance(child, AST):
+                stack.append(child)
+
+
+def has_comparison(tree):
+    return any(isinstance(node, Boolean) for node in nodes(tree))
+
+
+def check_assignments(tree, text):
+    for node in nodes(tree):
+        if isinstance(node, Variable_Set) and node.assign.type != EQ:
+            raise Exception('Compound assignment to {} in {}'.format(node.name, text.strip()))
+
+
+class Pipeline(object):
+    """Filter and projections over rows of named columns, one chunk at a time.
+
+    `variables` are constants the expressions may read besides the columns.
+    """
+
+    def __init__(self, select=(), where=None, keep=None, chunk_size=2000, engine=DEFAULT_ENGINE,
+                 vectorize=None, variables=None, loader=parse):
+        if not select and where is None:
+            raise Exception('Nothing to select or filter')
+        # (output column, parsed expression)
+        self.projections = []
+        for text in select:
+            tree = loader(normalize(text))
+            check_assignments(tree, text)
+            name = tree.name if isinstance(tree, Variable_Set) and tree.assign.type == EQ else text.strip()
+            self.projections.append((name, tree))
+        self.predicate = None
+        if where is not None:
+            self.predicate = loader(normalize(where))
+            check_assignments(self.predicate, where)
+            if not has_comparison(self.predicate):
+                raise Exception('The filter {} has no comparison'.format(where.strip()))
+        # names of the input columns written out, '*' for all; None: all
+        # of them if nothing is selected, otherwise none
+        self.keep = keep
+        if chunk_size < 1:
+            raise Exception('Invalid chunk size {}'.format(chunk_size))
+        self.chunk_size = chunk_size
+        self.session = Session(dict(variables or {}))
+        self.engine = get_engine(engine)(None, self.session)
+        if vectorize and vectorized is None:
+            raise Exception('Vectorized evaluation requires NumPy')
+        self.vectorize = vectorized is not None if vectorize is None else vectorize
+        trees = [tree for _, tree in self.projections] + [self.predicate]
+        self.reads = set().union(*(variable_names(tree) for tree in trees if tree is not None))
+        self.assigned = {tree.name for tree in trees if isinstance(tree, Variable_Set)}
+        self.rows_read = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.chunks_vectorized = 0
+        # stream failing rows are reported on, see run()
+        self.errors = None
+
+    def columns(self, header):
+        """(name, index) of the columns the expressions read."""
+        index = {name.strip(): position for position, name in enumerate(header)}
+        missing = sorted(name for name in self.reads
+                         if name not in index and name not in self.session.variables and name not in self.assigned)
+        if missing:
+            raise Exception('Unknown column {}'.format(', '.join(missing)))
+        return [(name, index[name]) for name in sorted(self.reads) if name in index]
+
+    def kept(self, header):
+        """Indices of the input columns written out."""
+        if self.keep is None or self.keep == '*':
+            return [] if self.keep is None and self.projections else list(range(len(header)))
+        index = {name.strip(): position for position, name in enumerate(header)}
+        missing = [name for name in self.keep if name not in index]
+        if missing:
+            raise Exception('Unknown column {}'.format(', '.join(missing)))
+        return [index[name] for name in self.keep]
+
+    def report(self, row, error):
+        self.rows_failed += 1
+        if self.errors is not None:
+            self.errors.write('row {}: {}\n'.format(row, error_message(error)))
+
+    def evaluate_rows(self, chunk, columns, width, first):
+        """(row, projected values) of the rows that pass the filter, one
+        row at a time."""
+        variables = self.session.variables
+        evaluate = self.engine.evaluate
+        results = []
+        for number_in_chunk, row in enumerate(chunk):
+            try:
+                if len(row) != width:
+                    raise Exception('Expected {} columns, found {}'.format(width, len(row)))
+                for name, position in columns:
+                    variables[name] = number(row[position], name)
+                if self.predicate is not None and evaluate(self.predicate) is not True:
+                    continue
+                values = [evaluate(tree) for _, tree in self.projections]
+            except Exception as error:
+                self.report(first + number_in_chunk, error)
+                continue
+            results.append((row, values))
+        return results
+
+    def evaluate_chunk(self, chunk, columns, width):
+        """Like evaluate_rows, column-wise; None if the chunk has to be
+        evaluated row by row."""
+        arrays = {}
+        try:
+            if any(len(row) != width for row in chunk):
+                return None
+            for name, position in columns:
+                values = [number(row[position], name) for row in chunk]
+                types = set(map(type, values))
+                if types == {int}:
+                    arrays[name] = numpy.array(values, dtype=numpy.int64)
+                elif types == {float}:
+                    arrays[name] = numpy.array(values, dtype=numpy.float64)
+                else:
+                    return None
+            size = len(chunk)
+            interpreter = vectorized.VectorInterpreter(arrays, self.session, checked=True)
+            keep = None
+            if self.predicate is not None:
+                keep = numpy.broadcast_to(interpreter.evaluate(self.predicate), (size,))
+                size = int(numpy.count_nonzero(keep))
+                interpreter.arrays = {name: value[keep] if numpy.ndim(value) == 1 else value
+                                      for name, value in interpreter.arrays.items()}
+            results = []
+            for _, tree in self.projections:
+                result = numpy.broadcast_to(interpreter.evaluate(tree, rounded=False), (size,))
+                values = result.tolist()
+                if result.dtype.kind == 'f':
+                    # as final_result() does for one row
+                    values = [round(value, 3) for value in values]
+                results.append(values)
+        except Exception:
+            # OverflowError of checked integers, FloatingPointError, ...:
+            # the rows are evaluated again one at a time
+            return None
+        rows = chunk if keep is None else itertools.compress(chunk, keep.tolist())
+        return list(zip(rows, zip(*results))) if results else [(row, ()) for row in rows]
+
+    def run(self, rows, writer, errors=None):
+        """Read rows (a header, then the data) and write the header and the
+        rows of the result with `writer` (e.g. a csv.writer); return the
+        number of rows that failed, reported on `errors`."""
+        rows = iter(rows)
+        header = next(rows, None)
+        if header is None:
+            raise Exception('No header row')
+        columns = self.columns(header)
+        kept = self.kept(header)
+        writer.writerow([header[position] for position in kept] + [name for name, _ in self.projections])
+        self.errors = errors
+        failed = self.rows_failed
+        while True:
+            chunk = list(itertools.islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            results = self.evaluate_chunk(chunk, columns, len(header)) if self.vectorize else None
+            if results is None:
+                results = self.evaluate_rows(chunk, columns, len(header), self.rows_read + 1)
+            else:
+                self.chunks_vectorized += 1
+            writer.writerows([row[position] for position in kept] + list(values) for row, values in results)
+            self.rows_read += len(chunk)
+            self.rows_written += len(results)
+        return self.rows_failed - failed
@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import ExpressionCache
+from .engines import Evaluator, DEFAULT_ENGINE
+
+###############################################################################
+#                                                                             #
+#  THREAD POOL EVALUATOR                                                      #
+#                                                                             #
+###############################################################################
+#
+# Evaluates many independent sessions at the same time. The lines of one
+# session are evaluated in order, since later lines may use variables set
+# by earlier ones; different sessions share nothing but the expression cache.
+
+
+def evaluate_lines(evaluator, lines):
+    """Evaluate lines in order. A failing line gives its exception as result."""
+    results = []
+    for text in lines:
+        try:
+            results.append(evaluator.evaluate(text))
+        except Exception as error:
+            results.append(error)
+    return results
+
+
+class SessionPool(object):
+    def __init__(self, max_workers=None, engine=DEFAULT_ENGINE, cache=None):
+        self.engine = engine
+        self.cache = ExpressionCache() if cache is None else cache
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(self, session, lines):
+        """Schedule the lines of one session, returns a Future of the results."""
+        evaluator = Evaluator(session, self.engine, self.cache)
+        return self.executor.submit(evaluate_lines, evaluator, list(lines))
+
+    def map(self, jobs):
+        """Evaluate (session, lines) jobs, results are in the order of jobs."""
+        futures = [self.submit(session, lines) for session, lines in jobs]
+        return [future.result() for future in futures]
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
@@ -0,0 +1,254 @@
+import hashlib
+import io
+import mmap
+import os
+import struct
+import zlib
+
+from . import functions
+from .cache import normalize, parse
+from .loader import load
+from .flat import flatten
+from .batch import numbered_lines, error_message
+from .snapshot import pack_array, unpack_array, pack_formulas, unpack_formulas, pad, replace, \
+    collection_paused
+
+###############################################################################
+#                                                                             #
+#  PRECOMPILED SCRIPTS                                                        #
+#                                                                             #
+###############################################################################
+#
+# Like .pyc files for Python modules: the parsed (and optionally optimized)
+# expressions of a script are written to __rafcache__/ next to it, so later
+# runs of the same script skip the lexer and the parser.
+#
+#     python . --compile library.raf        # writes __rafcache__/library.raf.rafc
+#     python . library.raf                  # uses it
+#
+# The cache file records the SHA-256 of the script, the format version and
+# a digest of the function registry (see functions.py); a run that finds a
+# cache file for another source, version or registry compiles the script
+# again and replaces the file. Which names are functions decides how lines
+# lex, and -O folds calls, so the digest covers the name, the truncate flag
+# and the qualified name of the implementation of every function. Another
+# implementation registered under the same qualified name is not noticed:
+# compile the script again with --compile. Scripts that were never compiled
+# are streamed as before, without a cache file.
+#
+# Trees are stored as FlatTrees (see flat.py) in the layout of the formulas
+# of a snapshot (see snapshot.py). Lines that don't parse keep their error
+# message, so they are reported the same way without being parsed.
+
+MAGIC = b'RAFCODE\0'
+FORMAT_VERSION = 2
+CACHE_DIRECTORY = '__rafcache__'
+
+# magic, version, flags, number of trees, number of errors, CRC32 of the
+# rest, SHA-256 of the source, SHA-256 of the function registry
+HEADER = struct.Struct('<8sHHIII32s32s')
+
+# flags
+OPTIMIZED, SHARED = 1, 2
+
+
+class CompiledScript(object):
+    """Parsed expressions of a script by normalized text.
+
+    Can be used as the loader of an ExpressionCache; text that was not
+    compiled is given to `fallback`.
+    """
+
+    def __init__(self, trees, errors, source=None, fallback=parse):
+        # normalized text -> tree
+        self.trees = trees
+        # normalized text -> message of its parse error
+        self.errors = errors
+        # text of the script, when read from a file
+        self.source = source
+        self.fallback = fallback
+
+    def __call__(self, text):
+        if text in self.trees:
+            return self.trees[text]
+        if text in self.errors:
+            raise Exception(self.errors[text])
+        return self.fallback(text)
+
+    def lines(self):
+        return io.StringIO(self.source, newline=None)
+
+    def __len__(self):
+        return len(self.trees) + len(self.errors)
+
+
+def flags_of(optimize_tree, share_tree):
+    return (OPTIMIZED if optimize_tree else 0) | (SHARED if share_tree else 0)
+
+
+def registry_digest(registry=None):
+    """SHA-256 of the functions a script is compiled with."""
+    registry = functions.registry if registry is None else registry
+    digest = hashlib.sha256()
+    for name in sorted(registry):
+        implementation = registry[name].implementation
+        digest.update('{}:{}:{}.{}\n'.format(
+            name, registry[name].truncate, getattr(implementation, '__module__', None),
+            getattr(implementation, '__qualname__', type(implementation).__qualname__)).encode('utf-8'))
+    return digest.digest()
+
+
+def compile_lines(lines, optimize_tree=False, share_tree=False):
+    """CompiledScript of the lines a batch run would evaluate."""
+    trees = {}
+    errors = {}
+    for _, text in numbered_lines(lines):
+        key = normalize(text)
+        if key in trees or key in errors:
+            continue
+        try:
+            trees[key] = load(key, optimize_tree, share_tree)
+        except Exception as error:
+            errors[key] = error_message(error)
+    return CompiledScript(trees, errors)
+
+
+def pack_strings(strings):
+    data = [string.encode('utf-8') for string in strings]
+    blob = b''.join(data)
+    return pack_array('I', [len(value) for value in data]) + blob + b'\0' * pad(len(blob))
+
+
+def unpack_strings(view, offset, count):
+    """Strings starting at `offset` and the offset after them."""
+    lengths, offset = unpack_array('I', view, offset, count)
+    strings = []
+    start = offset
+    for length in lengths:
+        strings.append(bytes(view[offset:offset + length]).decode('utf-8'))
+        offset += length
+    return strings, offset + pad(offset - start)
+
+
+def dumps(script, digest, flags=0, functions_digest=None):
+    texts = []
+    flats = []
+    for text, tree in script.trees.items():
+        try:
+            flats.append(flatten(tree))
+        except Exception:
+            # incomplete trees (e.g. of '1 +') fail when evaluated; they
+            # are parsed again at run time and fail the same way
+            continue
+        texts.append(text)
+    failed = list(script.errors)
+    body = b''.join((
+        pack_strings(texts),
+        pack_formulas(flats),
+        pack_strings(failed),
+        pack_strings([script.errors[text] for text in failed]),
+    ))
+    if functions_digest is None:
+        functions_digest = registry_digest()
+    return HEADER.pack(MAGIC, FORMAT_VERSION, flags, len(texts), len(failed), zlib.crc32(body), digest,
+                       functions_digest) + body
+
+
+def header(data):
+    """(flags, source digest, function registry digest, number of trees,
+    number of errors, CRC32) of a compiled script."""
+    if len(data) < HEADER.size or bytes(data[:len(MAGIC)]) != MAGIC:
+        raise Exception('Not a compiled rafmath script')
+    _, version, flags, count, failures, checksum, digest, functions_digest = HEADER.unpack_from(data)
+    if version != FORMAT_VERSION:
+        raise Exception('Unsupported compiled script version {} (expected {})'.format(
+            version, FORMAT_VERSION))
+    return flags, digest, functions_digest, count, failures, checksum
+
+
+def loads(data):
+    """(flags, source digest, CompiledScript) of a compiled script."""
+    with memoryview(data) as view:
+        flags, digest, _, count, failures, checksum = header(view)
+        if zlib.crc32(view[HEADER.size:]) != checksum:
+            raise Exception('Corrupt compiled script')
+        texts, offset = unpack_strings(view, HEADER.size, count)
+        flats, offset = unpack_formulas(view, offset, count)
+        failed, offset = unpack_strings(view, offset, failures)
+        messages, offset = unpack_strings(view, offset, failures)
+    with collection_paused():
+        trees = {text: flat.to_tree() for text, flat in zip(texts, flats)}
+    return flags, digest, CompiledScript(trees, dict(zip(failed, messages)))
+
+
+def cache_path(path, optimize_tree=False, share_tree=False):
+    """Path of the compiled form of the script at `path`."""
+    directory, name = os.path.split(path)
+    tags = ''.join(tag for tag, enabled in (('.opt', optimize_tree), ('.share', share_tree)) if enabled)
+    return os.path.join(directory, CACHE_DIRECTORY, '{}{}.rafc'.format(name, tags))
+
+
+def read_source(path):
+    with open(path, 'rb') as source:
+        data = source.read()
+    return data, hashlib.sha256(data).digest()
+
+
+def compile_source(data, optimize_tree=False, share_tree=False):
+    source = data.decode('utf-8')
+    script = compile_lines(io.StringIO(source, newline=None), optimize_tree, share_tree)
+    script.source = source
+    return script
+
+
+def write_cache(path, script, digest, optimize_tree=False, share_tree=False):
+    target = cache_path(path, optimize_tree, share_tree)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    replace(target, dumps(script, digest, flags_of(optimize_tree, share_tree)))
+    return target
+
+
+def compile_file(path, optimize_tree=False, share_tree=False):
+    """Compile the script at `path` into its cache file, return the
+    CompiledScript."""
+    data, digest = read_source(path)
+    script = compile_source(data, optimize_tree, share_tree)
+    write_cache(path, script, digest, optimize_tree, share_tree)
+    return script
+
+
+def read_cached(target, flags, digest):
+    """CompiledScript of a cache file, None if it is out of date or can't
+    be used."""
+    try:
+        with open(target, 'rb') as cached:
+            if header(cached.read(HEADER.size))[:3] != (flags, digest, registry_digest()):
+                return None
+            with mmap.mmap(cached.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return loads(data)[2]
+    except Exception:
+        # missing, corrupt or another version
+        return None
+
+
+def cached(path, optimize_tree=False, share_tree=False):
+    """CompiledScript of the script at `path` if it has been compiled,
+    otherwise None.
+
+    A cache file that is out of date is compiled again; if it can't be
+    replaced the script is still compiled for this run.
+    """
+    target = cache_path(path, optimize_tree, share_tree)
+    if not os.path.exists(target):
+        return None
+    data, digest = read_source(path)
+    script = read_cached(target, flags_of(optimize_tree, share_tree), digest)
+    if script is not None:
+        script.source = data.decode('utf-8')
+        return script
+    script = compile_source(data, optimize_tree, share_tree)
+    try:
+        write_cache(path, script, digest, optimize_tree, share_tree)
+    except OSError:
+        pass
+    return script
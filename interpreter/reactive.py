@@ -0,0 +1,168 @@
+from .lexer import EQ
+from .parser import AST, Variable, Variable_Set
+from .engines import Evaluator, DEFAULT_ENGINE
+
+###############################################################################
+#                                                                             #
+#  REACTIVE EVALUATION                                                        #
+#                                                                             #
+###############################################################################
+#
+# Spreadsheet-like sessions: every assignment `name = formula` is remembered
+# together with the variables the formula reads. When a variable changes,
+# every variable whose formula depends on it, directly or through other
+# variables, is recomputed. Each one is recomputed exactly once, after all
+# the variables it depends on (topological order).
+#
+# A formula that would make a variable depend on itself is rejected before
+# it is evaluated. A compound assignment (x += 1) changes the value but not
+# according to a formula, so it turns the variable back into a plain input.
+
+
+def variable_names(tree):
+    """Names of the variables read by a parsed expression."""
+    names = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Variable):
+            names.add(node.name)
+        for attribute in ('left', 'right', 'value'):
+            child = getattr(node, attribute, None)
+            if isinstance(child, AST):
+                stack.append(child)
+    return names
+
+
+class DependencyGraph(object):
+    def __init__(self):
+        # variable name -> parsed assignment recomputing it
+        self.formulas = {}
+        # variable name -> names its formula reads
+        self.dependencies = {}
+        # variable name -> names of the variables whose formula reads it
+        self.dependents = {}
+
+    def cycle(self, name, dependencies, graph=None):
+        """Path from `name` back to itself if it depended on `dependencies`,
+        otherwise None. `graph` (name -> dependencies) replaces the
+        dependencies of the defined formulas."""
+        graph = self.dependencies if graph is None else graph
+        stack = [(dependency, [name, dependency]) for dependency in dependencies]
+        seen = set()
+        while stack:
+            current, path = stack.pop()
+            if current == name:
+                return path
+            if current in seen:
+                continue
+            seen.add(current)
+            for dependency in graph.get(current, ()):
+                stack.append((dependency, path + [dependency]))
+        return None
+
+    def check(self, name, dependencies, graph=None):
+        path = self.cycle(name, dependencies, graph)
+        if path is not None:
+            raise Exception('Circular dependency: {}'.format(' -> '.join(path)))
+
+    def check_all(self, definitions):
+        """Raise like check() if defining every name -> dependencies of
+        `definitions` together would create a cycle; changes nothing."""
+        graph = dict(self.dependencies)
+        graph.update(definitions)
+        for name, dependencies in definitions.items():
+            self.check(name, dependencies, graph)
+
+    def define(self, name, formula, dependencies, check=True):
+        if check:
+            self.check(name, dependencies)
+        self.undefine(name)
+        self.formulas[name] = formula
+        self.dependencies[name] = frozenset(dependencies)
+        for dependency in dependencies:
+            self.dependents.setdefault(dependency, set()).add(name)
+
+    def undefine(self, name):
+        """Forget the formula of `name`; variables depending on it stay."""
+        self.formulas.pop(name, None)
+        for dependency in self.dependencies.pop(name, ()):
+            self.dependents[dependency].discard(name)
+            if not self.dependents[dependency]:
+                del self.dependents[dependency]
+
+    def affected(self, name):
+        """Variables to recompute after `name` changed, in topological order."""
+        stack = list(self.dependents.get(name, ()))
+        affected = set()
+        while stack:
+            current = stack.pop()
+            if current not in affected:
+                affected.add(current)
+                stack.extend(self.dependents.get(current, ()))
+        # Kahn's algorithm on the affected part of the graph
+        waiting = {current: len(self.dependencies[current] & affected) for current in affected}
+        ready = sorted(current for current, count in waiting.items() if count == 0)
+        order = []
+        while ready:
+            current = ready.pop()
+            order.append(current)
+            for dependent in self.dependents.get(current, ()):
+                if dependent in waiting:
+                    waiting[dependent] -= 1
+                    if waiting[dependent] == 0:
+                        ready.append(dependent)
+        if len(order) != len(affected):
+            raise Exception('Circular dependency between {}'.format(
+                ', '.join(sorted(affected.difference(order)))))
+        return order
+
+
+class ReactiveEvaluator(Evaluator):
+    """Evaluator that keeps assigned variables up to date with their formulas."""
+
+    def __init__(self, session=None, engine=DEFAULT_ENGINE, cache=None):
+        super(ReactiveEvaluator, self).__init__(session, engine, cache)
+        self.graph = DependencyGraph()
+        # variables recomputed by the last evaluation, in order
+        self.recomputed = []
+
+    def evaluate(self, text):
+        self.recomputed = []
+        tree = self.parse(text)
+        if not isinstance(tree, Variable_Set):
+            return self.interpreter.evaluate(tree)
+        name = tree.name
+        if tree.assign.type == EQ:
+            dependencies = variable_names(tree.value)
+            self.graph.check(name, dependencies)
+            result = self.interpreter.evaluate(tree)
+            self.graph.define(name, tree, dependencies)
+        else:
+            result = self.interpreter.evaluate(tree)
+            self.graph.undefine(name)
+        self.recompute(name)
+        return result
+
+    def recompute(self, name):
+        """Recompute the variables depending on `name`.
+
+        If a formula fails, the variables depending on it are not
+        recomputed either and the first error is raised afterwards.
+        """
+        failed = set()
+        error = None
+        for current in self.graph.affected(name):
+            if failed & self.graph.dependencies[current]:
+                failed.add(current)
+                continue
+            try:
+                self.interpreter.evaluate(self.graph.formulas[current])
+            except Exception as exception:
+                failed.add(current)
+                if error is None:
+                    error = 'Could not recompute {}: {}'.format(current, exception)
+                continue
+            self.recomputed.append(current)
+        if error is not None:
+            raise Exception(error)
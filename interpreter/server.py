@@ -0,0 +1,132 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import ExpressionCache
+from .session import Session
+from .engines import Evaluator, DEFAULT_ENGINE
+from .batch import error_message
+
+###############################################################################
+#                                                                             #
+#  SERVER                                                                     #
+#                                                                             #
+###############################################################################
+#
+# Serves many clients from one process over TCP or a Unix socket. The
+# protocol is line based: every non-empty request line is one expression
+# and gets exactly one response line, in the order of the requests, so a
+# client may send several requests without waiting for the answers.
+#
+#     ok <result>
+#     error <message>
+#
+# Every connection has its own session, so variables set by one client are
+# not seen by the others; a server started with variables (e.g. from a
+# snapshot, see snapshot.py) copies them into every new session. 'exit' closes the connection. ':stats' answers
+# with the collected metrics as one line of JSON when the server was
+# started with metrics (see metrics.py), ':tiers' with the statistics of
+# the tiered engine (see tiering.py).
+#
+# Without a timeout, expressions are evaluated on the event loop: requests
+# are short, and a thread per request would cost more than most of them,
+# but one slow expression holds up every client until it is done. Serve
+# untrusted clients with a timeout.
+#
+# With a timeout, expressions are evaluated in a thread pool and a request
+# that takes longer is answered with an error. Python can't stop the
+# evaluation, so it goes on in its thread, still using the session of the
+# connection; the connection is closed after the error so that no other
+# request is evaluated in that session at the same time.
+
+
+class EvaluationServer(object):
+    def __init__(self, engine=DEFAULT_ENGINE, timeout=None, cache=None, workers=None, metrics=None,
+                 variables=None):
+        self.engine = engine
+        self.metrics = metrics
+        # initial variables of every session
+        self.variables = {} if variables is None else variables
+        self.timeout = timeout
+        # parsed expressions are shared by all connections
+        self.cache = ExpressionCache(1024) if cache is None else cache
+        self.executor = ThreadPoolExecutor(max_workers=workers) if timeout is not None else None
+        self.connections = 0
+
+    async def evaluate(self, evaluator, text):
+        """Response line to an expression, None if it timed out."""
+        try:
+            if self.timeout is None:
+                result = evaluator.evaluate(text)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await asyncio.wait_for(
+                    loop.run_in_executor(self.executor, evaluator.evaluate, text), self.timeout)
+        except asyncio.TimeoutError:
+            return None
+        except Exception as error:
+            return 'error {}\n'.format(error_message(error))
+        return 'ok {}\n'.format(result)
+
+    def stats(self):
+        if self.metrics is None:
+            return 'error Metrics are disabled\n'
+        return 'ok {}\n'.format(self.metrics.to_json())
+
+    def tiers(self):
+        if self.engine != 'tiered':
+            return 'error Tiering is disabled\n'
+        from . import tiering
+        return 'ok {}\n'.format(json.dumps(tiering.default_manager.as_dict(), sort_keys=True))
+
+    async def handle(self, reader, writer):
+        evaluator = Evaluator(Session(dict(self.variables)), self.engine, self.cache)
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                text = line.decode('utf-8', 'replace').strip()
+                if not text:
+                    continue
+                if text == 'exit':
+                    break
+                if text == ':stats':
+                    response = self.stats()
+                elif text == ':tiers':
+                    response = self.tiers()
+                else:
+                    response = await self.evaluate(evaluator, text)
+                if response is None:
+                    writer.write('error Timed out after {} seconds, closing the connection\n'.format(
+                        self.timeout).encode('utf-8'))
+                    await writer.drain()
+                    break
+                writer.write(response.encode('utf-8'))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def start(self, host=None, port=None, path=None):
+        """Start listening on a Unix socket `path` or on `host`:`port`."""
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def serve_forever(self, host=None, port=None, path=None):
+        server = await self.start(host, port, path)
+        async with server:
+            await server.serve_forever()
+
+
+def serve(host=None, port=None, path=None, engine=DEFAULT_ENGINE, timeout=None, cache=None, metrics=None,
+          variables=None):
+    server = EvaluationServer(engine, timeout, cache, metrics=metrics, variables=variables)
+    try:
+        asyncio.run(server.serve_forever(host, port, path))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,36 @@
+from .parser import variables
+
+###############################################################################
+#                                                                             #
+#  SESSION                                                                    #
+#                                                                             #
+###############################################################################
+#
+# A session owns everything an evaluation reads or writes: the variable
+# store and the flags used to report the result of comparisons. Engines take
+# the session they evaluate in, so independent sessions can be evaluated at
+# the same time, e.g. one per client or per thread.
+
+
+class Session(object):
+    def __init__(self, variables=None):
+        # variable name -> value
+        self.variables = {} if variables is None else variables
+        # per-evaluation flags: whether a comparison was evaluated and
+        # whether every comparison held so far
+        self.check_boolean = False
+        self.changed_boolean = True
+        # values of shared subexpressions (see dag.py) computed during the
+        # current evaluation, created when the first one is needed
+        self.memo = None
+
+    def reset(self):
+        """Prepare the per-evaluation state for a new evaluation."""
+        self.check_boolean = False
+        self.changed_boolean = True
+        self.memo = None
+
+
+# Session used when none is given. It shares the module level variable
+# store in parser.py with code that still uses it directly.
+default_session = Session(variables)
@@ -0,0 +1,383 @@
+from array import array
+from contextlib import contextmanager
+import gc
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+from .flat import FlatTree, flatten, VARIABLE_NODE
+from .functions import Function, lookup
+
+###############################################################################
+#                                                                             #
+#  SNAPSHOTS                                                                  #
+#                                                                             #
+###############################################################################
+#
+# A session's variables, and the formulas of a reactive session, saved to a
+# binary file that is loaded back without evaluating anything:
+#
+#     header     magic, format version, number of sections, CRC32 of the rest
+#     section    kind, number of entries, payload size, then the payload
+#
+# Variables are grouped by the type of their value, so that the values of a
+# section are one array: the names of the section joined by NUL, then the
+# values as little-endian doubles (FLOATS), int64 (INTS) or bytes (BOOLS).
+# Integers out of the int64 range are stored as their length-prefixed bytes
+# (BIG_INTS). Formulas are stored as the arrays of their FlatTree (see
+# flat.py), functions by name.
+#
+# Loading maps the file and copies every array out of the mapping at once;
+# the cost is a read of the file, not a replay of the assignments.
+#
+#     from interpreter import snapshot
+#     snapshot.save('session.snap', evaluator)
+#     snapshot.restore('session.snap', evaluator)
+#
+# A snapshot of another format version is refused, not converted.
+
+MAGIC = b'RAFSNAP\0'
+FORMAT_VERSION = 1
+
+# magic, version, flags (unused), number of sections, CRC32 of the sections
+HEADER = struct.Struct('<8sHHIIxxxx')
+# kind, number of entries, payload size; both keep the payloads aligned
+# to 8 bytes
+SECTION = struct.Struct('<BxxxIQ')
+
+FLOATS, INTS, BOOLS, NONES, BIG_INTS, FORMULAS = range(1, 7)
+
+# section kind -> array typecode of its values
+TYPECODES = {FLOATS: 'd', INTS: 'q', BOOLS: 'B'}
+
+# formula constants, see pack_constant
+FLOAT_CONSTANT, INT_CONSTANT, NAME_CONSTANT, FUNCTION_CONSTANT = b'f', b'i', b'n', b'F'
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+LENGTH = struct.Struct('<I')
+DOUBLE = struct.Struct('<d')
+# FlatTree attribute -> array typecode
+FIELDS = (('kinds', 'B'), ('ops', 'B'), ('left', 'i'), ('right', 'i'), ('operands', 'i'))
+
+BIG_ENDIAN = sys.byteorder == 'big'
+
+
+class Snapshot(object):
+    def __init__(self, variables, formulas=None):
+        # variable name -> value
+        self.variables = variables
+        # variable name -> FlatTree of its assignment
+        self.formulas = {} if formulas is None else formulas
+
+    def __repr__(self):
+        return 'Snapshot({} variables, {} formulas)'.format(len(self.variables), len(self.formulas))
+
+
+@contextmanager
+def collection_paused():
+    """Pause the garbage collector while many trees are built at once: the
+    nodes make no cycles, so the collections they trigger find nothing."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def pad(size, alignment=8):
+    return -size % alignment
+
+
+def pack_names(names):
+    for name in names:
+        if '\0' in name:
+            raise Exception('Invalid variable name {!r}'.format(name))
+    blob = '\0'.join(names).encode('utf-8')
+    return LENGTH.pack(len(blob)) + blob + b'\0' * pad(LENGTH.size + len(blob))
+
+
+def unpack_names(view, offset, count):
+    """Names starting at `offset` and the offset after them."""
+    size, = LENGTH.unpack_from(view, offset)
+    start = offset + LENGTH.size
+    names = bytes(view[start:start + size]).decode('utf-8').split('\0') if count else []
+    if len(names) != count:
+        raise Exception('Corrupt snapshot')
+    return names, start + size + pad(LENGTH.size + size)
+
+
+def pack_array(typecode, values):
+    values = array(typecode, values)
+    if BIG_ENDIAN:
+        values.byteswap()
+    data = values.tobytes()
+    return data + b'\0' * pad(len(data))
+
+
+def unpack_array(typecode, view, offset, count):
+    """Values starting at `offset` and the offset after them."""
+    values = array(typecode)
+    end = offset + count * values.itemsize
+    values.frombytes(view[offset:end])
+    if BIG_ENDIAN:
+        values.byteswap()
+    return values, end + pad(end - offset)
+
+
+def pack_int(value):
+    return value.to_bytes((value + (value < 0)).bit_length() // 8 + 1, 'little', signed=True)
+
+
+def pack_constant(value):
+    if isinstance(value, Function):
+        name = value.name.encode('utf-8')
+        return FUNCTION_CONSTANT + LENGTH.pack(len(name)) + name
+    elif isinstance(value, str):
+        name = value.encode('utf-8')
+        return NAME_CONSTANT + LENGTH.pack(len(name)) + name
+    elif isinstance(value, float):
+        return FLOAT_CONSTANT + DOUBLE.pack(value)
+    data = pack_int(value)
+    return INT_CONSTANT + LENGTH.pack(len(data)) + data
+
+
+def unpack_constant(view, offset):
+    tag = bytes(view[offset:offset + 1])
+    offset += 1
+    if tag == FLOAT_CONSTANT:
+        return DOUBLE.unpack_from(view, offset)[0], offset + DOUBLE.size
+    size, = LENGTH.unpack_from(view, offset)
+    offset += LENGTH.size
+    data = bytes(view[offset:offset + size])
+    if tag == INT_CONSTANT:
+        value = int.from_bytes(data, 'little', signed=True)
+    elif tag == NAME_CONSTANT:
+        value = data.decode('utf-8')
+    elif tag == FUNCTION_CONSTANT:
+        value = lookup(data.decode('utf-8'))
+    else:
+        raise Exception('Corrupt snapshot')
+    return value, offset + size
+
+
+def constant_key(value):
+    # as in flat.flatten: 1 and 1.0, 0.0 and -0.0 are kept apart
+    if isinstance(value, Function):
+        return Function, value.name
+    return type(value), repr(value) if isinstance(value, float) else value
+
+
+def pack_formulas(flats):
+    """The FlatTrees one array per field, after the sizes of each; their
+    constants are indices in a pool of the distinct constants of all."""
+    # constant key -> index in distinct
+    pool = {}
+    distinct = []
+    references = array('I')
+    for flat in flats:
+        for value in flat.constants:
+            key = constant_key(value)
+            if key not in pool:
+                pool[key] = len(distinct)
+                distinct.append(value)
+            references.append(pool[key])
+    parts = [pack_array('I', [len(flat) for flat in flats]),
+             pack_array('I', [len(flat.constants) for flat in flats])]
+    for field, typecode in FIELDS:
+        column = array(typecode)
+        for flat in flats:
+            column.extend(getattr(flat, field))
+        parts.append(pack_array(typecode, column))
+    parts.append(pack_array('I', references))
+    constants = b''.join(pack_constant(value) for value in distinct)
+    parts.append(LENGTH.pack(len(distinct)) + constants + b'\0' * pad(LENGTH.size + len(constants)))
+    return b''.join(parts)
+
+
+def unpack_formulas(view, offset, count):
+    """FlatTrees of `count` formulas starting at `offset` and the offset
+    after them."""
+    nodes, offset = unpack_array('I', view, offset, count)
+    sizes, offset = unpack_array('I', view, offset, count)
+    total = sum(nodes)
+    fields = []
+    for _, typecode in FIELDS:
+        column, offset = unpack_array(typecode, view, offset, total)
+        fields.append(column)
+    references, offset = unpack_array('I', view, offset, sum(sizes))
+    pool = []
+    length, = LENGTH.unpack_from(view, offset)
+    position = offset + LENGTH.size
+    for _ in range(length):
+        value, position = unpack_constant(view, position)
+        pool.append(value)
+    flats = []
+    start = first = 0
+    for length, size in zip(nodes, sizes):
+        end = start + length
+        constants = [pool[index] for index in references[first:first + size]]
+        flats.append(FlatTree(*[column[start:end] for column in fields], constants=constants))
+        start = end
+        first += size
+    return flats, position + pad(position - offset)
+
+
+def sections(variables, formulas):
+    """(kind, count, payload) of every non-empty section."""
+    groups = {FLOATS: [], INTS: [], BOOLS: [], NONES: [], BIG_INTS: []}
+    for name, value in variables.items():
+        if value is None:
+            groups[NONES].append(name)
+        elif isinstance(value, bool):
+            groups[BOOLS].append(name)
+        elif isinstance(value, float):
+            groups[FLOATS].append(name)
+        elif isinstance(value, int):
+            groups[INTS if INT64_MIN <= value <= INT64_MAX else BIG_INTS].append(name)
+        else:
+            raise Exception('Cannot save variable {} of type {}'.format(name, type(value).__name__))
+    for kind, names in sorted(groups.items()):
+        if not names:
+            continue
+        payload = pack_names(names)
+        if kind in TYPECODES:
+            payload += pack_array(TYPECODES[kind], [variables[name] for name in names])
+        elif kind == BIG_INTS:
+            data = [pack_int(variables[name]) for name in names]
+            payload += pack_array('I', [len(value) for value in data])
+            blob = b''.join(data)
+            payload += blob + b'\0' * pad(len(blob))
+        yield kind, len(names), payload
+    if formulas:
+        names = list(formulas)
+        payload = pack_names(names) + pack_formulas([formulas[name] for name in names])
+        yield FORMULAS, len(names), payload
+
+
+def dumps(variables, formulas=None):
+    """Snapshot of a variable store and of FlatTrees by name, as bytes."""
+    parts = [SECTION.pack(kind, count, len(payload)) + payload
+             for kind, count, payload in sections(variables, formulas)]
+    body = b''.join(parts)
+    return HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(parts), zlib.crc32(body)) + body
+
+
+def loads(data):
+    """Snapshot of the bytes (or any buffer, e.g. an mmap) written by dumps()."""
+    with memoryview(data) as view:
+        if len(view) < HEADER.size or bytes(view[:len(MAGIC)]) != MAGIC:
+            raise Exception('Not a rafmath snapshot')
+        _, version, _, count, checksum = HEADER.unpack_from(view)
+        if version != FORMAT_VERSION:
+            raise Exception('Unsupported snapshot version {} (expected {})'.format(version, FORMAT_VERSION))
+        if zlib.crc32(view[HEADER.size:]) != checksum:
+            raise Exception('Corrupt snapshot')
+        variables = {}
+        formulas = {}
+        offset = HEADER.size
+        for _ in range(count):
+            kind, entries, size = SECTION.unpack_from(view, offset)
+            offset += SECTION.size
+            names, position = unpack_names(view, offset, entries)
+            if kind in TYPECODES:
+                values, _ = unpack_array(TYPECODES[kind], view, position, entries)
+                values = values.tolist()
+                if kind == BOOLS:
+                    values = [value != 0 for value in values]
+                variables.update(zip(names, values))
+            elif kind == NONES:
+                variables.update(dict.fromkeys(names))
+            elif kind == BIG_INTS:
+                lengths, position = unpack_array('I', view, position, entries)
+                for name, length in zip(names, lengths):
+                    variables[name] = int.from_bytes(view[position:position + length], 'little', signed=True)
+                    position += length
+            elif kind == FORMULAS:
+                flats, _ = unpack_formulas(view, position, entries)
+                formulas.update(zip(names, flats))
+            else:
+                raise Exception('Unknown snapshot section {}'.format(kind))
+            offset += size
+    return Snapshot(variables, formulas)
+
+
+def replace(path, data):
+    """Write `data` to `path`, replacing the file only once it is complete."""
+    temporary = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(temporary, 'wb') as output:
+            output.write(data)
+            output.flush()
+            os.fsync(output.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def write(path, variables, formulas=None):
+    """Save a snapshot to `path`, return its size."""
+    data = dumps(variables, formulas)
+    replace(path, data)
+    return len(data)
+
+
+def read(path):
+    """Snapshot saved at `path`, read through a memory map."""
+    with open(path, 'rb') as source:
+        if os.fstat(source.fileno()).st_size == 0:
+            raise Exception('Not a rafmath snapshot')
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return loads(data)
+
+
+def save(path, evaluator):
+    """Save the variables of an evaluator, and its formulas if it is a
+    ReactiveEvaluator; return the Snapshot saved."""
+    graph = getattr(evaluator, 'graph', None)
+    formulas = {} if graph is None else {name: flatten(tree) for name, tree in graph.formulas.items()}
+    write(path, evaluator.session.variables, formulas)
+    return Snapshot(evaluator.session.variables, formulas)
+
+
+def variables_read(flat):
+    """Names of the variables read by a flattened assignment, see
+    reactive.variable_names."""
+    constants = flat.constants
+    return {constants[operand] for kind, operand in zip(flat.kinds, flat.operands) if kind == VARIABLE_NODE}
+
+
+def install(snapshot, evaluator):
+    """Put the variables of a Snapshot into an evaluator, and its formulas
+    if the evaluator is a ReactiveEvaluator.
+
+    Saved variables replace the evaluator's variables of the same name.
+    Nothing is changed if the snapshot can't be installed.
+    """
+    graph = getattr(evaluator, 'graph', None)
+    trees = {}
+    if graph is not None:
+        with collection_paused():
+            for name, flat in snapshot.formulas.items():
+                trees[name] = flat.to_tree(), variables_read(flat)
+        # the saved formulas had no cycle, they can only make one with
+        # formulas the evaluator already has: checked for all of them
+        # before the session is changed
+        if graph.formulas:
+            graph.check_all({name: dependencies for name, (_, dependencies) in trees.items()})
+    evaluator.session.variables.update(snapshot.variables)
+    for name, (tree, dependencies) in trees.items():
+        graph.define(name, tree, dependencies, False)
+
+
+def restore(path, evaluator):
+    """Load the snapshot saved at `path` into an evaluator, return it."""
+    snapshot = read(path)
+    install(snapshot, evaluator)
+    return snapshot
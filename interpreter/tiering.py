@@ -0,0 +1,207 @@
+from collections import OrderedDict
+from importlib import import_module
+import threading
+import time
+import weakref
+
+from .interpreter import Interpreter, final_result
+
+###############################################################################
+#                                                                             #
+#  ADAPTIVE TIERING                                                           #
+#                                                                             #
+###############################################################################
+#
+# Compiling a tree (see compiler.py, bytecode.py, codegen.py) makes every
+# later evaluation faster, but costs as much as many evaluations on the
+# tree walking Interpreter, so it only pays off for expressions evaluated
+# often. In a server most requests are a few formulas; the others are seen
+# once or twice.
+#
+# The TieringManager counts the evaluations of every tree. Trees evaluated
+# fewer than `threshold` times run on the Interpreter; the evaluation that
+# reaches the threshold hands the tree to a background thread that
+# compiles it, and once the compiled form is ready it is used instead of
+# the tree from the next evaluation on.
+#
+#     python . --serve 8765 --engine tiered --tier-threshold 50 --tier-size 256
+#
+# Compiled forms are kept in an LRU of `maxsize` trees; an evicted tree
+# runs on the Interpreter again and is compiled again if it gets hot again.
+# Trees are told apart by identity: with an ExpressionCache, as Evaluator
+# and the server use, the same text gives the same tree. Counts are kept as
+# long as the tree is, so trees dropped by the cache are forgotten.
+
+# compiler name -> (module, class), the class has compile(tree) returning
+# an object with evaluate(session)
+COMPILERS = {
+    'closure': ('.compiler', 'Compiler'),
+    'bytecode': ('.bytecode', 'BytecodeCompiler'),
+    'python': ('.codegen', 'CodeGenerator'),
+}
+
+DEFAULT_COMPILER = 'python'
+
+
+class TieringStats(object):
+    def __init__(self):
+        # evaluations on the Interpreter and of compiled forms
+        self.interpreted = 0
+        self.compiled = 0
+        # trees compiled, compiled forms dropped from the LRU, trees that
+        # could not be compiled (they stay on the Interpreter)
+        self.promotions = 0
+        self.evictions = 0
+        self.failures = 0
+        # time spent compiling
+        self.compile_seconds = 0.0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __str__(self):
+        return ('interpreted {}, compiled {}, promotions {}, evictions {}, failures {}, '
+                'compiling {:.1f} ms'.format(self.interpreted, self.compiled, self.promotions, self.evictions,
+                                             self.failures, self.compile_seconds * 1e3))
+
+
+class TieringManager(object):
+    """Counts evaluations per tree and compiles the trees that get hot.
+
+    Safe to share between threads, e.g. by the sessions of a server. With
+    `background=False` trees are compiled by the evaluation that reaches
+    the threshold, which then already uses the compiled form.
+    """
+
+    def __init__(self, threshold=50, maxsize=256, compiler=DEFAULT_COMPILER, background=True):
+        if threshold < 1:
+            raise Exception('Invalid tiering threshold {}'.format(threshold))
+        if maxsize < 1:
+            raise Exception('Invalid tiering cache size {}'.format(maxsize))
+        if compiler not in COMPILERS:
+            raise Exception('Unknown compiler {}'.format(compiler))
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.compiler = compiler
+        self.background = background
+        # tree -> evaluations since it was parsed or evicted
+        self.counts = weakref.WeakKeyDictionary()
+        # tree -> compiled form, least recently used first
+        self.compiled = OrderedDict()
+        # tree -> Future of its compilation
+        self.pending = {}
+        self.executor = None
+        self.stats = TieringStats()
+        self.lock = threading.Lock()
+
+    def promoted(self, tree):
+        """Count an evaluation of the tree and return its compiled form, or
+        None if it is to be evaluated on the Interpreter."""
+        with self.lock:
+            compiled = self.compiled.get(tree)
+            if compiled is not None:
+                self.compiled.move_to_end(tree)
+                self.stats.compiled += 1
+                return compiled
+            count = self.counts.get(tree, 0) + 1
+            self.counts[tree] = count
+            if count != self.threshold or self.background:
+                if count == self.threshold:
+                    self.start(tree)
+                self.stats.interpreted += 1
+                return None
+        # compiled without the lock, so other evaluations go on meanwhile
+        compiled, seconds = self.build(tree)
+        with self.lock:
+            self.install(tree, compiled, seconds)
+            if compiled is None:
+                self.stats.interpreted += 1
+            else:
+                self.stats.compiled += 1
+        return compiled
+
+    def build(self, tree):
+        """(compiled form or None, seconds) of a tree."""
+        module, cls = COMPILERS[self.compiler]
+        start = time.perf_counter()
+        try:
+            compiled = getattr(import_module(module, __package__), cls)().compile(tree)
+        except Exception:
+            # e.g. the incomplete tree of '1 +', which fails when evaluated
+            compiled = None
+        return compiled, time.perf_counter() - start
+
+    def install(self, tree, compiled, seconds):
+        """Put a compiled form into the LRU, called with the lock held."""
+        self.stats.compile_seconds += seconds
+        if compiled is None:
+            self.stats.failures += 1
+            return
+        self.stats.promotions += 1
+        self.compiled[tree] = compiled
+        while len(self.compiled) > self.maxsize:
+            evicted, _ = self.compiled.popitem(last=False)
+            # hot again after another `threshold` evaluations
+            self.counts[evicted] = 0
+            self.stats.evictions += 1
+
+    def start(self, tree):
+        """Compile a tree in the background, called with the lock held."""
+        if self.executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rafmath-tiering')
+        self.pending[tree] = self.executor.submit(self.compile_in_background, tree)
+
+    def compile_in_background(self, tree):
+        compiled, seconds = self.build(tree)
+        with self.lock:
+            del self.pending[tree]
+            self.install(tree, compiled, seconds)
+
+    def wait(self):
+        """Wait until the compilations in progress are done."""
+        with self.lock:
+            futures = list(self.pending.values())
+        for future in futures:
+            future.result()
+
+    def clear(self):
+        """Forget every count and compiled form, e.g. after registering
+        another implementation of a function."""
+        self.wait()
+        with self.lock:
+            self.counts.clear()
+            self.compiled.clear()
+
+    def __len__(self):
+        return len(self.compiled)
+
+    def as_dict(self):
+        """Settings, size and statistics."""
+        with self.lock:
+            return dict(self.stats.as_dict(), size=len(self.compiled), maxsize=self.maxsize,
+                        threshold=self.threshold, compiler=self.compiler)
+
+
+# Manager of the TieredInterpreters created without one, shared by every
+# session of the process. The command line replaces it to change the
+# threshold, the size or the compiler.
+default_manager = TieringManager()
+
+
+class TieredInterpreter(Interpreter):
+    """Drop-in replacement for Interpreter that compiles hot expressions."""
+
+    def __init__(self, parser, session=None, manager=None):
+        Interpreter.__init__(self, parser, session)
+        self.manager = default_manager if manager is None else manager
+
+    def evaluate(self, tree):
+        compiled = self.manager.promoted(tree)
+        if compiled is not None:
+            return compiled.evaluate(self.session)
+        # Interpreter.evaluate, inlined so that metrics count one evaluation
+        session = self.session
+        session.reset()
+        result = self.visit(tree)
+        return final_result(result, session.check_boolean, session.changed_boolean)
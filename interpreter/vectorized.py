@@ -0,0 +1,257 @@
+from .lexer import PLUS, MINUS, MUL, DIV, \
+    LOG, SIN, COS, TAN, CTG, SQRT, POW, LOWER, HIGHER, \
+    HIGHER_EQ, LOWER_EQ, EQ_EQ, TRUE, FALSE, MOD, LEFT_SHIFT, \
+    RIGHT_SHIFT, PI, E_C, DEG, RAD, EQ, PLUS_EQUALS, MINUS_EQUALS, \
+    MUL_EQUALS, DIV_EQUALS
+from .interpreter import NodeVisitor, variable_value
+from .functions import BUILTINS, lookup
+from .session import default_session
+import math
+import operator
+
+# NumPy is only needed for batch evaluation, so this module is not imported
+# by the interpreter package itself.
+import numpy
+
+###############################################################################
+#                                                                             #
+#  VECTORIZED INTERPRETER                                                     #
+#                                                                             #
+###############################################################################
+#
+# Evaluates one parsed expression over whole arrays of variable values with
+# NumPy ufuncs instead of once per value. The interpreter's int and float
+# rules are applied per dtype: integer arrays use floor division and have
+# function results truncated back to integers, float arrays don't.
+#
+# Comparisons produce boolean masks. As with Interpreter.interpret, if the
+# expression contains a comparison the result is the mask of rows for which
+# every comparison held.
+#
+# Integer arrays use fixed-size NumPy integers, so unlike Python ints they
+# can overflow, and errors such as division by zero are reported as
+# FloatingPointError for the whole batch. A VectorInterpreter created with
+# checked=True raises OverflowError instead of computing an integer result
+# that could differ from the one of Python ints: sums, products and shifts
+# that could leave the int64 range, negative shift counts, and function
+# results that don't fit.
+
+# ufuncs of the built-in functions
+FUNCTIONS = {
+    POW: lambda value: numpy.square(value),
+    SQRT: numpy.sqrt,
+    LOG: numpy.log10,
+    SIN: numpy.sin,
+    COS: numpy.cos,
+    TAN: numpy.tan,
+    CTG: lambda value: 1/numpy.tan(value),
+    RAD: numpy.radians,
+    DEG: numpy.degrees,
+}
+
+# integer results of checked evaluations stay below this in magnitude
+INT_LIMIT = 2 ** 63
+
+COMPARISONS = {
+    HIGHER: operator.gt,
+    LOWER: operator.lt,
+    LOWER_EQ: operator.le,
+    HIGHER_EQ: operator.ge,
+    EQ_EQ: operator.eq,
+}
+
+
+# operator of every compound assignment
+COMPOUND = {
+    PLUS_EQUALS: PLUS,
+    MINUS_EQUALS: MINUS,
+    MUL_EQUALS: MUL,
+    DIV_EQUALS: DIV,
+}
+
+
+def is_integer(value):
+    return numpy.asarray(value).dtype.kind in 'iub'
+
+
+def is_float(value):
+    return numpy.asarray(value).dtype.kind == 'f'
+
+
+def bound(value):
+    """Largest magnitude of an integer array or scalar, as a Python int."""
+    array = numpy.asarray(value)
+    if not array.size:
+        return 0
+    return max(abs(int(array.min())), abs(int(array.max())))
+
+
+def check_integers(op, left, right):
+    """Raise OverflowError if the int64 result of `left op right` could
+    differ from the result of Python ints."""
+    if op in (PLUS, MINUS):
+        exact = bound(left) + bound(right) < INT_LIMIT
+    elif op == MUL:
+        exact = bound(left) * bound(right) < INT_LIMIT
+    elif op in (LEFT_SHIFT, RIGHT_SHIFT):
+        counts = numpy.asarray(right)
+        if counts.size and int(counts.min()) < 0:
+            raise OverflowError('Negative shift count')
+        count = int(counts.max()) if counts.size else 0
+        if op == LEFT_SHIFT:
+            exact = count < 63 and bound(left) << count < INT_LIMIT
+        else:
+            exact = count < 64 and bound(left) < INT_LIMIT
+    else:
+        # DIV and MOD: only -2 ** 63 // -1 overflows
+        exact = bound(left) < INT_LIMIT
+    if not exact:
+        raise OverflowError('Integer result out of the int64 range')
+
+
+class VectorInterpreter(NodeVisitor):
+    def __init__(self, arrays, session=None, checked=False):
+        # variable name -> NumPy array (or anything numpy.asarray accepts)
+        self.arrays = {name: numpy.asarray(values) for name, values in arrays.items()}
+        # scalar variables not given in arrays are read from the session
+        self.session = default_session if session is None else session
+        self.check_boolean = False
+        self.mask = True
+        # values of shared subexpressions in the current evaluation
+        self.memo = {}
+        # raise OverflowError rather than let integers wrap around
+        self.checked = checked
+
+    def check(self, op, left, right):
+        if self.checked and is_integer(left) and is_integer(right):
+            check_integers(op, left, right)
+
+    def check_scalar(self, value):
+        if self.checked and isinstance(value, int) and abs(value) >= INT_LIMIT:
+            raise OverflowError('Integer out of the int64 range')
+        return value
+
+    def truncate(self, result):
+        """Function results truncated to integers, like int() does."""
+        result = numpy.trunc(result)
+        if self.checked and numpy.asarray(result).size and not (
+                numpy.all(numpy.isfinite(result)) and numpy.max(numpy.abs(result)) < INT_LIMIT):
+            raise OverflowError('Function result out of the int64 range')
+        return result.astype(numpy.int64)
+
+    def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        self.check(node.op.type, left, right)
+        if node.op.type == PLUS:
+            return left + right
+        elif node.op.type == MINUS:
+            return left - right
+        elif node.op.type == MUL:
+            return left * right
+        elif node.op.type == DIV:
+            if is_integer(left) and is_integer(right):
+                return left // right
+            return numpy.true_divide(left, right)
+        elif node.op.type == MOD:
+            return left % right
+        elif node.op.type == LEFT_SHIFT:
+            return numpy.left_shift(left, right)
+        elif node.op.type == RIGHT_SHIFT:
+            return numpy.right_shift(left, right)
+
+    def visit_Constants(self, node):
+        if node.op.type == PI:
+            return math.pi
+        elif node.op.type == E_C:
+            return math.e
+
+    def visit_UnOp(self, node):
+        if node.op.type == PLUS:
+            return self.visit(node.value)
+        elif node.op.type == MINUS:
+            value = self.visit(node.value)
+            self.check(MUL, value, -1)
+            return value * (-1)
+
+    def visit_Func(self, node):
+        value = self.visit(node.value)
+        function = lookup(node.op.type)
+        if function.implementation is not BUILTINS.get(function.name):
+            # registered at runtime, no ufunc: called once per element
+            result = numpy.frompyfunc(function.call, 1, 1)(value)
+            result = numpy.asarray(result.tolist() if isinstance(result, numpy.ndarray) else result)
+            if function.truncate and not is_float(value):
+                return self.truncate(result)
+            return result
+        if is_float(value):
+            return FUNCTIONS[node.op.type](value)
+        result = FUNCTIONS[node.op.type](numpy.asarray(value, dtype=numpy.float64))
+        return self.truncate(result)
+
+    def visit_Boolean(self, node):
+        self.check_boolean = True
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        self.mask = numpy.logical_and(self.mask, COMPARISONS[node.op.type](left, right))
+        return left
+
+    def visit_Num(self, node):
+        return self.check_scalar(node.value)
+
+    def visit_Variable(self, node):
+        if node.name in self.arrays:
+            return self.arrays[node.name]
+        return self.check_scalar(variable_value(self.session.variables, node.name))
+
+    def visit_Variable_Set(self, node):
+        value = self.visit(node.value)
+        if node.assign.type != EQ:
+            current = self.visit_Variable(node)
+            self.check(COMPOUND[node.assign.type], current, value)
+            if node.assign.type == PLUS_EQUALS:
+                value = value + current
+            elif node.assign.type == MINUS_EQUALS:
+                value = current - value
+            elif node.assign.type == MUL_EQUALS:
+                value = value * current
+            elif node.assign.type == DIV_EQUALS:
+                if is_integer(current) and is_integer(value):
+                    value = current // value
+                else:
+                    value = numpy.true_divide(current, value)
+        self.arrays[node.name] = numpy.asarray(value)
+        return self.arrays[node.name]
+
+    def visit_Shared(self, node):
+        if node not in self.memo:
+            self.memo[node] = self.visit(node.value)
+        return self.memo[node]
+
+    def visit_Bool(self, node):
+        if node.value == TRUE:
+            return True
+        elif node.value == FALSE:
+            return False
+
+    def evaluate(self, tree, rounded=True):
+        """Result over all rows; rounded=False leaves float results as they
+        are (numpy.round can differ from round() in the last digit)."""
+        self.check_boolean = False
+        self.mask = True
+        self.memo = {}
+        with numpy.errstate(divide='raise', invalid='raise'):
+            result = self.visit(tree)
+        if self.check_boolean:
+            return numpy.asarray(self.mask)
+        if rounded and is_float(result):
+            return numpy.round(result, 3)
+        return result
+
+
+def evaluate(tree, arrays, session=None):
+    """Evaluate a parsed expression over arrays of variable values.
+
+    Variables missing from `arrays` are read from the session.
+    """
+    return VectorInterpreter(arrays, session).evaluate(tree)
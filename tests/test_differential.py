@@ -0,0 +1,147 @@
+"""Differential test of the engines: random expressions are evaluated with
+the Interpreter and with every engine of ENGINE_CLASSES, on trees loaded
+as is, optimized (-O), shared (--share) and both, and every result, error
+message and variable store has to be the same.
+
+Run from the repository root (exits with status 1 on a mismatch):
+
+    python -m unittest tests.test_differential
+    python -m tests.test_differential
+"""
+import itertools
+import random
+import unittest
+
+from interpreter import functions
+from interpreter.cache import parse
+from interpreter.engines import ENGINE_CLASSES, get_engine
+from interpreter.interpreter import Interpreter
+from interpreter.codegen import CodeGenerator
+from interpreter.loader import load
+from interpreter.session import Session
+from interpreter.tiering import TieringManager
+
+FUNCTIONS = ('SQRT', 'SIN', 'COS', 'TG', 'CTG', 'LOG', 'POW', 'DEG', 'RAD')
+OPERATORS = ('+', '-', '*', '/', '%', '<<', '>>')
+COMPARISONS = ('<', '>', '<=', '>=', '==')
+ASSIGNMENTS = ('=', '+=', '-=', '*=', '/=')
+# 'missing' is never set
+NAMES = ('a', 'b', 'c', 'missing')
+
+VARIABLES = {'a': 3, 'b': 2.5, 'c': 0}
+
+# random lines compared per run
+COUNT = 5000
+
+# evaluations of every line in one session: the compiling engines reuse
+# what they compiled the first time, the tiered one compiles it
+REPEAT = 2
+
+# (optimize_tree, share_tree) of loader.load
+LOADS = list(itertools.product((False, True), repeat=2))
+
+
+def expression(generator, depth):
+    if depth <= 0 or generator.random() < 0.25:
+        choice = generator.random()
+        if choice < 0.4:
+            return str(generator.randint(0, 20))
+        elif choice < 0.6:
+            return '{}.{}'.format(generator.randint(0, 20), generator.randint(0, 99))
+        elif choice < 0.9:
+            return generator.choice(NAMES) + ' '
+        return generator.choice(('PI ', 'E ', 'True ', 'False '))
+    choice = generator.random()
+    if choice < 0.45:
+        return '{} {} {}'.format(expression(generator, depth - 1), generator.choice(OPERATORS),
+                                 expression(generator, depth - 1))
+    elif choice < 0.6:
+        return '({})'.format(expression(generator, depth - 1))
+    elif choice < 0.75:
+        return '{}({})'.format(generator.choice(FUNCTIONS), expression(generator, depth - 1))
+    elif choice < 0.85:
+        return generator.choice('-+') + expression(generator, depth - 1)
+    return '{} {} {}'.format(expression(generator, depth - 1), generator.choice(COMPARISONS),
+                             expression(generator, depth - 1))
+
+
+def line(generator):
+    text = expression(generator, 4)
+    if generator.random() < 0.15:
+        return '{} {} {}'.format(generator.choice(NAMES), generator.choice(ASSIGNMENTS), text)
+    return text
+
+
+def outcome(evaluate, session):
+    try:
+        return 'ok', evaluate(), dict(session.variables)
+    except Exception as error:
+        return 'error', '{}: {}'.format(type(error).__name__, error), dict(session.variables)
+
+
+def same(expected, actual):
+    if expected == actual:
+        return True
+    # nan != nan
+    return repr(expected) == repr(actual)
+
+
+def engine(name, session):
+    if name == 'tiered':
+        # the second evaluation of a tree runs compiled
+        return get_engine(name)(None, session, TieringManager(threshold=REPEAT, background=False))
+    return get_engine(name)(None, session)
+
+
+def outcomes(interpreter, tree):
+    """Outcomes of REPEAT evaluations of the tree in one session."""
+    return [outcome(lambda: interpreter.evaluate(tree), interpreter.session) for _ in range(REPEAT)]
+
+
+def differential(count=COUNT, seed=0, name='python', optimize_tree=False, share_tree=False):
+    """Compare an engine with the Interpreter on `count` random lines,
+    return the mismatches as (text, interpreter outcomes, engine outcomes)."""
+    generator = random.Random(seed)
+    mismatches = []
+    for _ in range(count):
+        text = line(generator)
+        try:
+            tree = parse(text)
+        except Exception:
+            continue
+        expected = outcomes(Interpreter(None, Session(dict(VARIABLES))), tree)
+        actual = outcomes(engine(name, Session(dict(VARIABLES))), load(text, optimize_tree, share_tree))
+        if not all(map(same, expected, actual)):
+            mismatches.append((text, expected, actual))
+    return mismatches
+
+
+def report(mismatches, limit=10):
+    return '\n'.join('mismatch: {!r}\n  interpreter: {}\n  engine:      {}'.format(text, expected, actual)
+                     for text, expected, actual in mismatches[:limit])
+
+
+class DifferentialTest(unittest.TestCase):
+    def test_random_expressions(self):
+        # a seed per combination, so that together they cover more lines
+        for seed, (name, (optimize_tree, share_tree)) in enumerate(itertools.product(ENGINE_CLASSES, LOADS)):
+            with self.subTest(engine=name, optimize=optimize_tree, share=share_tree):
+                mismatches = differential(COUNT, seed, name, optimize_tree, share_tree)
+                self.assertFalse(mismatches, '{} mismatches with seed {}\n{}'.format(
+                    len(mismatches), seed, report(mismatches)))
+
+    def test_errors_of_functions_are_not_translated(self):
+        def lookup_table(value):
+            return {1: 10}[value]
+        functions.register('TABLE', lookup_table)
+        self.addCleanup(functions.unregister, 'TABLE')
+        tree = parse('TABLE(a ) + 1')
+        with self.assertRaises(KeyError):
+            CodeGenerator().compile(tree).evaluate(Session({'a': 2}))
+        self.assertEqual(CodeGenerator().compile(tree).evaluate(Session({'a': 1})), 11)
+        with self.assertRaisesRegex(Exception, 'Variable not found'):
+            CodeGenerator().compile(tree).evaluate(Session())
+
+
+if __name__ == '__main__':
+    unittest.main()
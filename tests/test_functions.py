@@ -0,0 +1,149 @@
+"""Tests of registered functions.
+
+Run from the repository root:
+
+    python -m unittest tests.test_functions
+"""
+import unittest
+
+from interpreter import functions, lexer
+from interpreter.cache import parse
+from interpreter.engines import ENGINE_CLASSES, get_engine
+from interpreter.functions import FunctionCache
+from interpreter.lexer import Lexer, EOF
+from interpreter.parser import Func
+from interpreter.session import Session
+
+
+def tokens(text):
+    source = Lexer(text)
+    result = []
+    while True:
+        token = source.get_next_token()
+        if token.type == EOF:
+            return result
+        result.append((token.type, token.value))
+
+
+def evaluate(engine, text, variables=None):
+    session = Session(dict(variables or {}))
+    return get_engine(engine)(None, session).evaluate(parse(text))
+
+
+class RegisterTest(unittest.TestCase):
+    def register(self, name, implementation, **options):
+        function = functions.register(name, implementation, **options)
+        self.addCleanup(lambda: name in functions.registry and functions.unregister(name))
+        return function
+
+    def test_call_in_every_engine(self):
+        self.register('CUBE', lambda value: value ** 3)
+        self.assertEqual(tokens('CUBE(x ) + 1'), [('CUBE', 'CUBE'), ('(', '('), ('VARIABLE', 'x'),
+                                                  (')', ')'), ('PLUS', '+'), ('NUMBER', 1)])
+        tree = parse('CUBE(x ) + 1')
+        self.assertIsInstance(tree.left, Func)
+        self.assertEqual(tree.left.op.type, 'CUBE')
+        for engine in ENGINE_CLASSES:
+            with self.subTest(engine=engine):
+                self.assertEqual(evaluate(engine, 'CUBE(x ) + 1', {'x': 3}), 28)
+                self.assertEqual(evaluate(engine, 'y = CUBE(1.5) * 2'), 6.75)
+                self.assertEqual(evaluate(engine, 'CUBE(CUBE(2))'), 512)
+
+    def test_truncate(self):
+        self.register('HALF', lambda value: value / 2)
+        self.register('EXACT_HALF', lambda value: value / 2, truncate=False)
+        for engine in ENGINE_CLASSES:
+            with self.subTest(engine=engine):
+                self.assertEqual(evaluate(engine, 'HALF(x )', {'x': 5}), 2)
+                self.assertEqual(evaluate(engine, 'HALF(5.0)'), 2.5)
+                self.assertEqual(evaluate(engine, 'EXACT_HALF(x )', {'x': 5}), 2.5)
+
+    def test_unregister(self):
+        self.register('CUBE', lambda value: value ** 3)
+        functions.unregister('CUBE')
+        self.assertNotIn('CUBE', functions.registry)
+        self.assertNotIn('CUBE', lexer.FUNCTIONS)
+        # an unknown name followed by '(' is a variable again
+        self.assertEqual(tokens('CUBE(2)'), [('VARIABLE', 'CUBE'), ('(', '('), ('NUMBER', 2), (')', ')')])
+        self.assertEqual(tokens('CUBE = 2'), [('VARIABLE_SET', 'CUBE'), ('=', '='), ('NUMBER', 2)])
+        with self.assertRaisesRegex(Exception, 'Unknown function CUBE'):
+            functions.unregister('CUBE')
+
+    def test_token_pattern_is_rebuilt(self):
+        before = lexer.TOKEN_PATTERN
+        self.register('SINH', lambda value: value)
+        self.assertIsNot(lexer.TOKEN_PATTERN, before)
+        # the longest name matches, SIN is still SIN
+        self.assertEqual(tokens('SINH(1) + SIN(1)')[0], ('SINH', 'SINH'))
+        self.assertEqual(tokens('SINH(1) + SIN(1)')[5], ('SIN', 'SIN'))
+        functions.unregister('SINH')
+        self.assertEqual(tokens('SINH(1)')[0], ('VARIABLE', 'SINH'))
+        self.assertEqual(tokens('SIN(1)')[0], ('SIN', 'SIN'))
+
+    def test_invalid_names(self):
+        for name in ('', '1X', '_X', 'A B', 'A-B', 'PI', 'True', 'NUMBER', 'EOF', None):
+            with self.subTest(name=name):
+                with self.assertRaisesRegex(Exception, 'Invalid function name'):
+                    functions.register(name, abs)
+        with self.assertRaisesRegex(Exception, 'Function SQRT is already registered'):
+            functions.register('SQRT', abs)
+        with self.assertRaisesRegex(Exception, 'Only functions of one argument'):
+            functions.register('TWO', max, arity=2)
+        with self.assertRaisesRegex(Exception, 'Invalid cache size'):
+            functions.register('NEGATIVE', abs, cache_size=-1)
+        self.assertNotIn('TWO', functions.registry)
+        self.assertNotIn('NEGATIVE', functions.registry)
+
+    def test_cached_function(self):
+        calls = []
+
+        def square(value):
+            calls.append(value)
+            return value * value
+        function = self.register('SQUARE', square, cache_size=2)
+        self.assertEqual(functions.cache_stats(), {'SQUARE': function.cache})
+        for engine in ENGINE_CLASSES:
+            with self.subTest(engine=engine):
+                function.cache.clear()
+                del calls[:]
+                self.assertEqual(evaluate(engine, 'SQUARE(x ) + SQUARE(x )', {'x': 3}), 18)
+                self.assertEqual(calls, [3])
+                self.assertEqual((function.cache.hits, function.cache.misses), (1, 1))
+
+
+class FunctionCacheTest(unittest.TestCase):
+    def test_least_recently_used_is_evicted(self):
+        cache = FunctionCache(2)
+        calls = []
+
+        def double(value):
+            calls.append(value)
+            return value * 2
+        self.assertEqual([cache.call(double, value) for value in (1, 2, 1, 3, 2, 1)], [2, 4, 2, 6, 4, 2])
+        # 2 was evicted by 3, then 1 by 2
+        self.assertEqual(calls, [1, 2, 3, 2, 1])
+        self.assertEqual((cache.hits, cache.misses), (1, 5))
+        self.assertEqual(list(cache.entries), [2, 1])
+        self.assertEqual(cache.hit_rate, 1 / 6)
+        self.assertEqual(str(cache), 'hits 1, misses 5, hit rate 16.7%, size 2/2')
+
+    def test_negative_zero_is_not_zero(self):
+        cache = FunctionCache(4)
+        self.assertEqual(repr(cache.call(abs, -0.0)), '0.0')
+        self.assertEqual(cache.misses, 1)
+        cache.call(str, 0.0)
+        self.assertEqual(cache.misses, 2)
+        # 1 == 1.0, but float keys are kept apart
+        self.assertEqual(cache.call(str, 1), '1')
+        self.assertEqual(cache.call(str, 1.0), '1.0')
+
+    def test_clear(self):
+        cache = FunctionCache(2)
+        cache.call(abs, -1)
+        cache.call(abs, -1)
+        cache.clear()
+        self.assertEqual((cache.hits, cache.misses, len(cache.entries), cache.hit_rate), (0, 0, 0, 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
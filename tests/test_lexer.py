@@ -0,0 +1,267 @@
+"""Tests of the lexer against token streams recorded from the hand-written
+character-by-character lexer it replaced, and of the streaming lexer
+against the lexer.
+
+Run from the repository root:
+
+    python -m unittest tests.test_lexer
+"""
+import unittest
+
+from interpreter.lexer import Lexer, StreamingLexer, EOF
+
+# (text, [(token type, value), ...]) as lexed by the previous lexer, with
+# ('error', message) where it raised. Inputs ending in a name without
+# whitespace after it are left out: the previous lexer emitted the last
+# character of the name again (or forever) there, see test_name_at_end.
+BASELINE = [
+    ('4 + 2 * 3 - 6 / 2', [('NUMBER', 4), ('PLUS', '+'), ('NUMBER', 2), ('MUL', '*'), ('NUMBER', 3),
+                           ('MINUS', '-'), ('NUMBER', 6), ('DIV', '/'), ('NUMBER', 2), ('EOF', None)]),
+    ('12.5 % 4', [('NUMBER', 12.5), ('%', '%'), ('NUMBER', 4), ('EOF', None)]),
+    ('3.', [('NUMBER', 3.0), ('EOF', None)]),
+    ('1.2.3', [('error', "could not convert string to float: '1.2.3'")]),
+    ('x = 5', [('VARIABLE_SET', 'x'), ('=', '='), ('NUMBER', 5), ('EOF', None)]),
+    ('x=5', [('VARIABLE_SET', 'x'), ('=', '='), ('NUMBER', 5), ('EOF', None)]),
+    ('x == 5', [('VARIABLE', 'x'), ('==', '=='), ('NUMBER', 5), ('EOF', None)]),
+    ('x==5', [('VARIABLE', 'x'), ('==', '=='), ('NUMBER', 5), ('EOF', None)]),
+    ('x += 1', [('VARIABLE_SET', 'x'), ('+=', '+='), ('NUMBER', 1), ('EOF', None)]),
+    ('x+=1', [('VARIABLE_SET', 'x'), ('+=', '+='), ('NUMBER', 1), ('EOF', None)]),
+    ('x -= 1', [('VARIABLE_SET', 'x'), ('-=', '-='), ('NUMBER', 1), ('EOF', None)]),
+    ('x *= 2', [('VARIABLE_SET', 'x'), ('*=', '*='), ('NUMBER', 2), ('EOF', None)]),
+    ('x /= 2', [('VARIABLE_SET', 'x'), ('/=', '/='), ('NUMBER', 2), ('EOF', None)]),
+    ('x + 1', [('VARIABLE', 'x'), ('PLUS', '+'), ('NUMBER', 1), ('EOF', None)]),
+    ('x - 1', [('VARIABLE', 'x'), ('MINUS', '-'), ('NUMBER', 1), ('EOF', None)]),
+    ('x * 2', [('VARIABLE', 'x'), ('MUL', '*'), ('NUMBER', 2), ('EOF', None)]),
+    ('x / 2', [('VARIABLE', 'x'), ('DIV', '/'), ('NUMBER', 2), ('EOF', None)]),
+    ('1 << 2', [('NUMBER', 1), ('<<', '<<'), ('NUMBER', 2), ('EOF', None)]),
+    ('8 >> 1', [('NUMBER', 8), ('>>', '>>'), ('NUMBER', 1), ('EOF', None)]),
+    ('1<<2>>3', [('NUMBER', 1), ('<<', '<<'), ('NUMBER', 2), ('>>', '>>'), ('NUMBER', 3), ('EOF', None)]),
+    ('SQRT(16)', [('SQRT', 'SQRT'), ('(', '('), ('NUMBER', 16), (')', ')'), ('EOF', None)]),
+    ('SIN(x )', [('SIN', 'SIN'), ('(', '('), ('VARIABLE', 'x'), (')', ')'), ('EOF', None)]),
+    ('TG(1)', [('TG', 'TG'), ('(', '('), ('NUMBER', 1), (')', ')'), ('EOF', None)]),
+    ('CTG(1)', [('CTG', 'CTG'), ('(', '('), ('NUMBER', 1), (')', ')'), ('EOF', None)]),
+    ('POW(3)', [('POW', 'POW'), ('(', '('), ('NUMBER', 3), (')', ')'), ('EOF', None)]),
+    ('COS(0)', [('COS', 'COS'), ('(', '('), ('NUMBER', 0), (')', ')'), ('EOF', None)]),
+    ('LOG(100)', [('LOG', 'LOG'), ('(', '('), ('NUMBER', 100), (')', ')'), ('EOF', None)]),
+    ('RAD(180)', [('RAD', 'RAD'), ('(', '('), ('NUMBER', 180), (')', ')'), ('EOF', None)]),
+    ('SQRT (16)', [('VARIABLE', 'SQRT'), ('(', '('), ('NUMBER', 16), (')', ')'), ('EOF', None)]),
+    ('PI', [('PI', 'PI'), ('EOF', None)]),
+    ('E', [('E', 'E'), ('EOF', None)]),
+    ('PI + E', [('PI', 'PI'), ('PLUS', '+'), ('E', 'E'), ('EOF', None)]),
+    ('(x )', [('(', '('), ('VARIABLE', 'x'), (')', ')'), ('EOF', None)]),
+    ('x % 2', [('VARIABLE', 'x'), ('%', '%'), ('NUMBER', 2), ('EOF', None)]),
+    ('abc123 = 1', [('VARIABLE_SET', 'abc123'), ('=', '='), ('NUMBER', 1), ('EOF', None)]),
+    ('café = 2', [('VARIABLE_SET', 'café'), ('=', '='), ('NUMBER', 2), ('EOF', None)]),
+    ('x\t=\t1', [('VARIABLE_SET', 'x'), ('=', '='), ('NUMBER', 1), ('EOF', None)]),
+    ('  x   ', [('VARIABLE', 'x'), ('EOF', None)]),
+    ('y = x = 3', [('VARIABLE_SET', 'y'), ('=', '='), ('VARIABLE_SET', 'x'), ('=', '='), ('NUMBER', 3),
+                   ('EOF', None)]),
+    ('+-1', [('PLUS', '+'), ('MINUS', '-'), ('NUMBER', 1), ('EOF', None)]),
+    ('x= =1', [('VARIABLE_SET', 'x'), ('=', '='), ('=', '='), ('NUMBER', 1), ('EOF', None)]),
+    ('x =+ 1', [('VARIABLE_SET', 'x'), ('=', '='), ('PLUS', '+'), ('NUMBER', 1), ('EOF', None)]),
+    ('x+ =1', [('VARIABLE', 'x'), ('PLUS', '+'), ('=', '='), ('NUMBER', 1), ('EOF', None)]),
+    ('1 2', [('NUMBER', 1), ('NUMBER', 2), ('EOF', None)]),
+    ('a.b + 1', [('VARIABLE', 'a.b'), ('PLUS', '+'), ('NUMBER', 1), ('EOF', None)]),
+    ('2PI', [('NUMBER', 2), ('PI', 'PI'), ('EOF', None)]),
+    ('$', [('error', 'Invalid character')]),
+    ('1 + $', [('NUMBER', 1), ('PLUS', '+'), ('error', 'Invalid character')]),
+    ('_x', [('error', 'Invalid character')]),
+    ('x_1 = 2', [('VARIABLE_SET', 'x_1'), ('=', '='), ('NUMBER', 2), ('EOF', None)]),
+    ('True+1', [('VARIABLE', 'True'), ('PLUS', '+'), ('NUMBER', 1), ('EOF', None)]),
+    ('SIN(COS(TG(x )))', [('SIN', 'SIN'), ('(', '('), ('COS', 'COS'), ('(', '('), ('TG', 'TG'), ('(', '('),
+                          ('VARIABLE', 'x'), (')', ')'), (')', ')'), (')', ')'), ('EOF', None)]),
+    ('((1))', [('(', '('), ('(', '('), ('NUMBER', 1), (')', ')'), (')', ')'), ('EOF', None)]),
+    ('LOG(x)*2', [('LOG', 'LOG'), ('(', '('), ('VARIABLE', 'x)'), ('MUL', '*'), ('NUMBER', 2), ('EOF', None)]),
+    ('y+=x*2', [('VARIABLE_SET', 'y'), ('+=', '+='), ('VARIABLE', 'x'), ('MUL', '*'), ('NUMBER', 2),
+                ('EOF', None)]),
+    ('E*PI', [('E', 'E'), ('MUL', '*'), ('PI', 'PI'), ('EOF', None)]),
+    ('0.5', [('NUMBER', 0.5), ('EOF', None)]),
+    ('007', [('NUMBER', 7), ('EOF', None)]),
+    ('12..', [('error', "could not convert string to float: '12..'")]),
+    ('.5', [('error', 'Invalid character')]),
+    ('4 + 2 * 3 - 6 / 2 ', [('NUMBER', 4), ('PLUS', '+'), ('NUMBER', 2), ('MUL', '*'), ('NUMBER', 3),
+                            ('MINUS', '-'), ('NUMBER', 6), ('DIV', '/'), ('NUMBER', 2), ('EOF', None)]),
+    ('12.5 % 4 ', [('NUMBER', 12.5), ('%', '%'), ('NUMBER', 4), ('EOF', None)]),
+    ('3. ', [('NUMBER', 3.0), ('EOF', None)]),
+    ('1.2.3 ', [('error', "could not convert string to float: '1.2.3'")]),
+    ('x = 5 ', [('VARIABLE_SET', 'x'), ('=', '='), ('NUMBER', 5), ('EOF', None)]),
+    ('x=5 ', [('VARIABLE_SET', 'x'), ('=', '='), ('NUMBER', 5), ('EOF', None)]),
+    ('x == 5 ', [('VARIABLE', 'x'), ('==', '=='), ('NUMBER', 5), ('EOF', None)]),
+    ('x==5 ', [('VARIABLE', 'x'), ('==', '=='), ('NUMBER', 5), ('EOF', None)]),
+    ('x += 1 ', [('VARIABLE_SET', 'x'), ('+=', '+='), ('NUMBER', 1), ('EOF', None)]),
+    ('x+=1 ', [('VARIABLE_SET', 'x'), ('+=', '+='), ('NUMBER', 1), ('EOF', None)]),
+    ('x -= 1 ', [('VARIABLE_SET', 'x'), ('-=', '-='), ('NUMBER', 1), ('EOF', None)]),
+    ('x *= 2 ', [('VARIABLE_SET', 'x'), ('*=', '*='), ('NUMBER', 2), ('EOF', None)]),
+    ('x /= 2 ', [('VARIABLE_SET', 'x'), ('/=', '/='), ('NUMBER', 2), ('EOF', None)]),
+    ('x + 1 ', [('VARIABLE', 'x'), ('PLUS', '+'), ('NUMBER', 1), ('EOF', None)]),
+    ('x - 1 ', [('VARIABLE', 'x'), ('MINUS', '-'), ('NUMBER', 1), ('EOF', None)]),
+    ('x * 2 ', [('VARIABLE', 'x'), ('MUL', '*'), ('NUMBER', 2), ('EOF', None)]),
+    ('x / 2 ', [('VARIABLE', 'x'), ('DIV', '/'), ('NUMBER', 2), ('EOF', None)]),
+    ('x<y ', [('VARIABLE', 'x'), ('<', '<'), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x <= y ', [('VARIABLE', 'x'), ('<=', '<='), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x>=y ', [('VARIABLE', 'x'), ('>=', '>='), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x > y ', [('VARIABLE', 'x'), ('>', '>'), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x < y ', [('VARIABLE', 'x'), ('<', '<'), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('1 << 2 ', [('NUMBER', 1), ('<<', '<<'), ('NUMBER', 2), ('EOF', None)]),
+    ('8 >> 1 ', [('NUMBER', 8), ('>>', '>>'), ('NUMBER', 1), ('EOF', None)]),
+    ('1<<2>>3 ', [('NUMBER', 1), ('<<', '<<'), ('NUMBER', 2), ('>>', '>>'), ('NUMBER', 3), ('EOF', None)]),
+    ('a<<=b ', [('VARIABLE', 'a'), ('<<', '<<'), ('=', '='), ('VARIABLE', 'b'), ('EOF', None)]),
+    ('SQRT(16) ', [('SQRT', 'SQRT'), ('(', '('), ('NUMBER', 16), (')', ')'), ('EOF', None)]),
+    ('SIN(x ) ', [('SIN', 'SIN'), ('(', '('), ('VARIABLE', 'x'), (')', ')'), ('EOF', None)]),
+    ('TG(1) ', [('TG', 'TG'), ('(', '('), ('NUMBER', 1), (')', ')'), ('EOF', None)]),
+    ('CTG(1) ', [('CTG', 'CTG'), ('(', '('), ('NUMBER', 1), (')', ')'), ('EOF', None)]),
+    ('POW(3) ', [('POW', 'POW'), ('(', '('), ('NUMBER', 3), (')', ')'), ('EOF', None)]),
+    ('COS(0) ', [('COS', 'COS'), ('(', '('), ('NUMBER', 0), (')', ')'), ('EOF', None)]),
+    ('LOG(100) ', [('LOG', 'LOG'), ('(', '('), ('NUMBER', 100), (')', ')'), ('EOF', None)]),
+    ('DEG(PI) ', [('DEG', 'DEG'), ('(', '('), ('VARIABLE', 'PI)'), ('EOF', None)]),
+    ('RAD(180) ', [('RAD', 'RAD'), ('(', '('), ('NUMBER', 180), (')', ')'), ('EOF', None)]),
+    ('SQRT (16) ', [('VARIABLE', 'SQRT'), ('(', '('), ('NUMBER', 16), (')', ')'), ('EOF', None)]),
+    ('SQRTx ', [('VARIABLE', 'SQRTx'), ('EOF', None)]),
+    ('PI ', [('PI', 'PI'), ('EOF', None)]),
+    ('E ', [('E', 'E'), ('EOF', None)]),
+    ('PI + E ', [('PI', 'PI'), ('PLUS', '+'), ('E', 'E'), ('EOF', None)]),
+    ('PIE ', [('VARIABLE', 'PIE'), ('EOF', None)]),
+    ('True ', [('VARIABLE', 'True'), ('EOF', None)]),
+    ('False ', [('VARIABLE', 'False'), ('EOF', None)]),
+    ('True == False ', [('VARIABLE', 'True'), ('==', '=='), ('VARIABLE', 'False'), ('EOF', None)]),
+    ('Trueish ', [('VARIABLE', 'Trueish'), ('EOF', None)]),
+    ('x) ', [('VARIABLE', 'x)'), ('EOF', None)]),
+    ('(x) ', [('(', '('), ('VARIABLE', 'x)'), ('EOF', None)]),
+    ('(x ) ', [('(', '('), ('VARIABLE', 'x'), (')', ')'), ('EOF', None)]),
+    ('f(x) ', [('VARIABLE', 'f'), ('(', '('), ('VARIABLE', 'x)'), ('EOF', None)]),
+    ('SQRT(x) ', [('SQRT', 'SQRT'), ('(', '('), ('VARIABLE', 'x)'), ('EOF', None)]),
+    ('x%2 ', [('VARIABLE', 'x%2'), ('EOF', None)]),
+    ('x % 2 ', [('VARIABLE', 'x'), ('%', '%'), ('NUMBER', 2), ('EOF', None)]),
+    ('abc123 = 1 ', [('VARIABLE_SET', 'abc123'), ('=', '='), ('NUMBER', 1), ('EOF', None)]),
+    ('café = 2 ', [('VARIABLE_SET', 'café'), ('=', '='), ('NUMBER', 2), ('EOF', None)]),
+    ('x\t=\t1 ', [('VARIABLE_SET', 'x'), ('=', '='), ('NUMBER', 1), ('EOF', None)]),
+    ('  x    ', [('VARIABLE', 'x'), ('EOF', None)]),
+    ('y = x = 3 ', [('VARIABLE_SET', 'y'), ('=', '='), ('VARIABLE_SET', 'x'), ('=', '='), ('NUMBER', 3),
+                    ('EOF', None)]),
+    ('-x ', [('MINUS', '-'), ('VARIABLE', 'x'), ('EOF', None)]),
+    ('+-1 ', [('PLUS', '+'), ('MINUS', '-'), ('NUMBER', 1), ('EOF', None)]),
+    ('x ==y ', [('VARIABLE', 'x'), ('==', '=='), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x= =1 ', [('VARIABLE_SET', 'x'), ('=', '='), ('=', '='), ('NUMBER', 1), ('EOF', None)]),
+    ('x =+ 1 ', [('VARIABLE_SET', 'x'), ('=', '='), ('PLUS', '+'), ('NUMBER', 1), ('EOF', None)]),
+    ('x+ =1 ', [('VARIABLE', 'x'), ('PLUS', '+'), ('=', '='), ('NUMBER', 1), ('EOF', None)]),
+    ('1 2 ', [('NUMBER', 1), ('NUMBER', 2), ('EOF', None)]),
+    ('TG(x)+CTG(y) ', [('TG', 'TG'), ('(', '('), ('VARIABLE', 'x)'), ('PLUS', '+'), ('CTG', 'CTG'),
+                       ('(', '('), ('VARIABLE', 'y)'), ('EOF', None)]),
+    ('a.b + 1 ', [('VARIABLE', 'a.b'), ('PLUS', '+'), ('NUMBER', 1), ('EOF', None)]),
+    ('x,y ', [('VARIABLE', 'x,y'), ('EOF', None)]),
+    ('x;y ', [('VARIABLE', 'x;y'), ('EOF', None)]),
+    ('2PI ', [('NUMBER', 2), ('PI', 'PI'), ('EOF', None)]),
+    ('x2y ', [('VARIABLE', 'x2y'), ('EOF', None)]),
+    ('1e5 ', [('NUMBER', 1), ('VARIABLE', 'e5'), ('EOF', None)]),
+    ('$ ', [('error', 'Invalid character')]),
+    ('1 + $ ', [('NUMBER', 1), ('PLUS', '+'), ('error', 'Invalid character')]),
+    ('_x ', [('error', 'Invalid character')]),
+    ('x_1 = 2 ', [('VARIABLE_SET', 'x_1'), ('=', '='), ('NUMBER', 2), ('EOF', None)]),
+    ('x+y ', [('VARIABLE', 'x'), ('PLUS', '+'), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x-y ', [('VARIABLE', 'x'), ('MINUS', '-'), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x*y ', [('VARIABLE', 'x'), ('MUL', '*'), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x/y ', [('VARIABLE', 'x'), ('DIV', '/'), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x -y ', [('VARIABLE', 'x'), ('MINUS', '-'), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x*=y ', [('VARIABLE_SET', 'x'), ('*=', '*='), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x/=y ', [('VARIABLE_SET', 'x'), ('/=', '/='), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x-=y ', [('VARIABLE_SET', 'x'), ('-=', '-='), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x -= y ', [('VARIABLE_SET', 'x'), ('-=', '-='), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x >= y ', [('VARIABLE', 'x'), ('>=', '>='), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('x<=y ', [('VARIABLE', 'x'), ('<=', '<='), ('VARIABLE', 'y'), ('EOF', None)]),
+    ('True+1 ', [('VARIABLE', 'True'), ('PLUS', '+'), ('NUMBER', 1), ('EOF', None)]),
+    ('True < False ', [('VARIABLE', 'True'), ('<', '<'), ('VARIABLE', 'False'), ('EOF', None)]),
+    ('x=True ', [('VARIABLE_SET', 'x'), ('=', '='), ('VARIABLE', 'True'), ('EOF', None)]),
+    ('SIN(COS(TG(x ))) ', [('SIN', 'SIN'), ('(', '('), ('COS', 'COS'), ('(', '('), ('TG', 'TG'), ('(', '('),
+                           ('VARIABLE', 'x'), (')', ')'), (')', ')'), (')', ')'), ('EOF', None)]),
+    ('((1)) ', [('(', '('), ('(', '('), ('NUMBER', 1), (')', ')'), (')', ')'), ('EOF', None)]),
+    ('LOG(x)*2 ', [('LOG', 'LOG'), ('(', '('), ('VARIABLE', 'x)'), ('MUL', '*'), ('NUMBER', 2), ('EOF', None)]),
+    ('y+=x*2 ', [('VARIABLE_SET', 'y'), ('+=', '+='), ('VARIABLE', 'x'), ('MUL', '*'), ('NUMBER', 2),
+                 ('EOF', None)]),
+    ('E*PI ', [('E', 'E'), ('MUL', '*'), ('PI', 'PI'), ('EOF', None)]),
+    ('0.5 ', [('NUMBER', 0.5), ('EOF', None)]),
+    ('007 ', [('NUMBER', 7), ('EOF', None)]),
+    ('12.. ', [('error', "could not convert string to float: '12..'")]),
+    ('.5 ', [('error', 'Invalid character')]),
+]
+
+
+# text where tokens are likely to be cut by a chunk boundary: two character
+# operators, compound assignments, numbers, function names and a name with
+# a character of two bytes in UTF-8
+SAMPLES = [
+    'x = 12.75 << 3 >= SQRT(y ) - 4',
+    'total += price * 1.5\ncount -= 1 <= 2 == 2',
+    'a *= 2 >> 1 / 3.25\nb /= COS(0.5) % 7 > 1',
+    'café = LOG(100) + TG(PI ) - CTG(E )',
+    'x==y\nz=1\nw+=2',
+    '1.5.5 + 2',
+]
+
+
+def stream(text, lexer_class=Lexer):
+    lexer = lexer_class(text)
+    tokens = []
+    try:
+        while True:
+            token = lexer.get_next_token()
+            tokens.append((token.type, token.value))
+            if token.type == EOF:
+                return tokens
+    except Exception as error:
+        tokens.append(('error', str(error)))
+        return tokens
+
+
+class LexerBaselineTest(unittest.TestCase):
+    def test_recorded_streams(self):
+        for text, expected in BASELINE:
+            with self.subTest(text=text):
+                self.assertEqual(stream(text), expected)
+
+    def test_booleans_are_variables(self):
+        self.assertEqual(stream('True == False '), [('VARIABLE', 'True'), ('==', '=='), ('VARIABLE', 'False'),
+                                                  ('EOF', None)])
+
+    def test_closing_parenthesis_in_name(self):
+        self.assertEqual(stream('SIN(x) '), [('SIN', 'SIN'), ('(', '('), ('VARIABLE', 'x)'), ('EOF', None)])
+
+    def test_name_at_end(self):
+        # the previous lexer emitted 'x' again and again here
+        self.assertEqual(stream('1 + x'), [('NUMBER', 1), ('PLUS', '+'), ('VARIABLE', 'x'), ('EOF', None)])
+        self.assertEqual(stream('True'), [('VARIABLE', 'True'), ('EOF', None)])
+
+    def test_number_types(self):
+        for text, value in (('7', 7), ('7.', 7.0), ('7.25', 7.25), ('007', 7)):
+            with self.subTest(text=text):
+                token = Lexer(text).get_next_token()
+                self.assertIs(type(token.value), type(value))
+                self.assertEqual(token.value, value)
+
+
+class StreamingLexerTest(unittest.TestCase):
+    def assertSameStream(self, text, source, **options):
+        self.assertEqual(stream(source, lambda source: StreamingLexer(source, **options)), stream(text),
+                         '{!r} from {!r}'.format(text, source))
+
+    def test_every_split_point(self):
+        for text in SAMPLES:
+            for split in range(len(text) + 1):
+                self.assertSameStream(text, [text[:split], text[split:]])
+
+    def test_every_byte_split_point(self):
+        for text in SAMPLES:
+            data = text.encode('utf-8')
+            for split in range(len(data) + 1):
+                self.assertSameStream(text, [data[:split], data[split:]])
+
+    def test_one_character_chunks(self):
+        for text in SAMPLES:
+            self.assertSameStream(text, list(text))
+            self.assertSameStream(text, text.encode('utf-8'), chunk_size=1)
+
+    def test_empty_chunks(self):
+        self.assertSameStream('x += 1', ['', 'x', '', ' +', '', '= 1', ''])
+
+
+if __name__ == '__main__':
+    unittest.main()
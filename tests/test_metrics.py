@@ -0,0 +1,96 @@
+"""Tests of the opt-in metrics.
+
+Run from the repository root:
+
+    python -m unittest tests.test_metrics
+"""
+import subprocess
+import sys
+import unittest
+
+from interpreter import metrics
+from interpreter.cache import parse
+from interpreter.engines import Evaluator, ENGINE_CLASSES
+from interpreter.lexer import Lexer, StreamingLexer, EOF
+from interpreter.parser import Parser
+
+TEXT = 'total += 12.75 << 3 >= SQRT(price ) - 4 '
+
+
+def tokens(lexer):
+    count = 1
+    while lexer.get_next_token().type != EOF:
+        count += 1
+    return count
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        metrics.enable()
+        self.addCleanup(metrics.disable)
+        metrics.registry.reset()
+
+    def test_tokens(self):
+        expected = tokens(Lexer(TEXT))
+        self.assertEqual(metrics.registry.tokens, expected)
+
+    def test_streaming_tokens_counted_once(self):
+        expected = tokens(Lexer(TEXT))
+        metrics.registry.reset()
+        # every token is matched again when the next character arrives
+        self.assertEqual(tokens(StreamingLexer(list(TEXT))), expected)
+        self.assertEqual(metrics.registry.tokens, expected)
+        metrics.registry.reset()
+        Parser(StreamingLexer(TEXT.encode('utf-8'), chunk_size=1)).parse()
+        self.assertEqual(metrics.registry.tokens, expected)
+        self.assertEqual(metrics.registry.histograms['lex'].count, 1)
+
+    def test_every_engine(self):
+        for engine in sorted(ENGINE_CLASSES):
+            with self.subTest(engine=engine):
+                metrics.registry.reset()
+                evaluator = Evaluator(engine=engine)
+                evaluator.evaluate('x = 4')
+                with self.assertRaises(Exception):
+                    evaluator.evaluate('y * 2')
+                self.assertEqual(metrics.registry.expressions, 2)
+                self.assertEqual(metrics.registry.errors, {('eval', 'Variable not found'): 1})
+
+    def test_nodes_after_reset(self):
+        Evaluator().evaluate('1 + 2 * 3')
+        metrics.registry.reset()
+        Evaluator().evaluate('1 + 2')
+        self.assertEqual(metrics.registry.nodes, {'BinOp': 1, 'Num': 2})
+
+    def test_disable(self):
+        metrics.disable()
+        metrics.registry.reset()
+        Evaluator(engine='closure').evaluate('1 + 2')
+        Lexer(TEXT).get_next_token()
+        self.assertEqual((metrics.registry.expressions, metrics.registry.tokens), (0, 0))
+        self.assertFalse(metrics.enabled())
+
+    def test_parse_errors(self):
+        with self.assertRaises(Exception):
+            parse('(1')
+        self.assertEqual(metrics.registry.errors, {('parse', 'Invalid syntax'): 1})
+
+
+class LazyImportTest(unittest.TestCase):
+    def test_engines_imported_when_used(self):
+        # in a new interpreter: this one has imported every engine
+        script = '\n'.join((
+            'import sys',
+            'from interpreter import metrics',
+            'from interpreter.engines import Evaluator',
+            'metrics.enable()',
+            "print(sorted(name for name in sys.modules if name in ('interpreter.codegen', 'interpreter.bytecode')))",
+            "Evaluator(engine='bytecode').evaluate('1 + 2')",
+            'print(metrics.registry.expressions)',
+        ))
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.split('\n'), ['[]', '1', ''])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""Tests of the precedence climbing Parser: it has to build the same trees
+as RecursiveDescentParser, without recursing on nested input.
+
+Run from the repository root:
+
+    python -m unittest tests.test_parser
+"""
+import random
+import unittest
+
+from interpreter.lexer import Lexer, Token
+from interpreter.parser import Parser, RecursiveDescentParser, AST, Num, UnOp, Func, BinOp
+from tests.test_differential import line
+
+# fragments joined at random, mostly into invalid input
+PIECES = ('1', '2.5', 'x ', 'y', '(', ')', '+', '-', '*', '/', '%', '<', '>', '<=', '>=', '==', '<<', '>>',
+          '=', '+=', '-=', '*=', '/=', 'SIN(', 'LOG(', 'POW(', 'True ', 'False ', 'PI ', 'E ', ' ', 'x = ',
+          'z += ', '$', '3.4.5')
+
+# random inputs compared per seed
+COUNT = 20000
+
+DEPTH = 100000
+
+
+def fields(node):
+    return [name for cls in type(node).__mro__ for name in getattr(cls, '__slots__', ())
+            if name != '__weakref__']
+
+
+def dump(tree):
+    """Nested tuples of the node types, tokens and values of a tree."""
+    if isinstance(tree, Token):
+        return 'Token', tree.type, tree.value
+    if not isinstance(tree, AST):
+        return repr(tree)
+    return (type(tree).__name__,) + tuple((name, dump(getattr(tree, name))) for name in fields(tree))
+
+
+def parsed(parser, text):
+    try:
+        return dump(parser(Lexer(text)).parse())
+    except Exception as error:
+        return 'error', '{}: {}'.format(type(error).__name__, error)
+
+
+def text(generator):
+    if generator.random() < 0.5:
+        return line(generator)
+    return ' '.join(generator.choice(PIECES) for _ in range(generator.randint(0, 12)))
+
+
+class ParserDifferentialTest(unittest.TestCase):
+    def test_same_trees(self):
+        for seed in (0, 1):
+            generator = random.Random(seed)
+            for _ in range(COUNT):
+                source = text(generator)
+                self.assertEqual(parsed(Parser, source), parsed(RecursiveDescentParser, source), source)
+
+    def test_precedence_and_associativity(self):
+        for source in ('1 - 2 - 3', '8 / 4 / 2', '1 + 2 * 3 % 4', '1 < 2 < 3', '1 << 2 << 3', '1 << 2 + 3',
+                       '-1 * -2', '-(1 + 2)', 'x = y += 3 > 2', 'SIN(1 + 2) * 3', '(1 + 2) * 3 == 9',
+                       '1 + ', '* 2', 'x = ', ''):
+            with self.subTest(source=source):
+                self.assertEqual(parsed(Parser, source), parsed(RecursiveDescentParser, source))
+        self.assertEqual(parsed(Parser, '1 2'), ('error', 'Exception: Invalid syntax'))
+
+
+class DeepNestingTest(unittest.TestCase):
+    def innermost(self, tree, cls, attribute):
+        """Depth of the chain of `cls` nodes and the node at its end."""
+        depth = 0
+        while isinstance(tree, cls):
+            tree = getattr(tree, attribute)
+            depth += 1
+        return depth, tree
+
+    def test_parentheses(self):
+        source = '(' * DEPTH + '1' + ')' * DEPTH
+        tree = Parser(Lexer(source)).parse()
+        self.assertIsInstance(tree, Num)
+        self.assertEqual(tree.value, 1)
+        with self.assertRaises(RecursionError):
+            RecursiveDescentParser(Lexer(source)).parse()
+
+    def test_unbalanced_parentheses(self):
+        with self.assertRaisesRegex(Exception, 'Invalid syntax'):
+            Parser(Lexer('(' * DEPTH + '1' + ')' * (DEPTH - 1))).parse()
+
+    def test_unary_signs(self):
+        depth, tree = self.innermost(Parser(Lexer('-' * DEPTH + '1')).parse(), UnOp, 'value')
+        self.assertEqual(depth, DEPTH)
+        self.assertEqual(tree.value, 1)
+
+    def test_function_calls(self):
+        depth, tree = self.innermost(Parser(Lexer('SIN(' * DEPTH + 'x ' + ')' * DEPTH)).parse(), Func, 'value')
+        self.assertEqual(depth, DEPTH)
+        self.assertEqual(tree.name, 'x')
+
+    def test_right_nested_operations(self):
+        source = '1 + (' * DEPTH + '2' + ')' * DEPTH
+        depth, tree = self.innermost(Parser(Lexer(source)).parse(), BinOp, 'right')
+        self.assertEqual(depth, DEPTH)
+        self.assertEqual(tree.value, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
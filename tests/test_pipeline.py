@@ -0,0 +1,139 @@
+"""Tests of the column pipeline (--csv, --where, --select).
+
+Run from the repository root:
+
+    python -m unittest tests.test_pipeline
+"""
+import random
+import unittest
+
+from interpreter import pipeline
+from interpreter.pipeline import Pipeline
+
+needs_numpy = unittest.skipIf(pipeline.vectorized is None, 'NumPy is not installed')
+
+
+class Rows(object):
+    """Collects what a csv.writer would write."""
+
+    def __init__(self):
+        self.rows = []
+
+    def writerow(self, row):
+        self.rows.append([str(value) for value in row])
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+
+class Errors(object):
+    def __init__(self):
+        self.lines = []
+
+    def write(self, text):
+        self.lines.append(text)
+
+
+def run(rows, *arguments, **options):
+    """(pipeline, written rows, error lines) of one run."""
+    columns = Pipeline(*arguments, **options)
+    writer = Rows()
+    errors = Errors()
+    failed = columns.run(rows, writer, errors)
+    assert failed == len(errors.lines)
+    return columns, writer.rows, errors.lines
+
+
+def modes():
+    """vectorize options to run every test with."""
+    if pipeline.vectorized is None:
+        return (False,)
+    return (False, True)
+
+
+class PipelineTest(unittest.TestCase):
+    def test_where_filters_rows(self):
+        rows = [['id', 'qty', 'price']] + [[str(i), str(i * 5), '2.5'] for i in range(10)]
+        for vectorize in modes():
+            columns, written, errors = run(rows, ['total = price * qty'], 'qty > 10', ['id'],
+                                           vectorize=vectorize)
+            self.assertEqual(written, [['id', 'total']] + [[str(i), str(i * 12.5)] for i in range(3, 10)])
+            self.assertEqual(errors, [])
+            self.assertEqual((columns.rows_read, columns.rows_written), (10, 7))
+
+    def test_every_comparison_of_the_filter_has_to_hold(self):
+        rows = [['a', 'b']] + [[str(a), str(b)] for a in range(4) for b in range(4)]
+        for vectorize in modes():
+            _, written, _ = run(rows, (), '1 < a < b', '*', vectorize=vectorize)
+            self.assertEqual(written[1:], [['2', '3']])
+
+    def test_filter_without_comparison(self):
+        with self.assertRaisesRegex(Exception, 'has no comparison'):
+            Pipeline((), 'qty + 1')
+
+    def test_unknown_column(self):
+        with self.assertRaisesRegex(Exception, 'Unknown column missing'):
+            run([['qty'], ['1']], ['qty * missing'])
+
+    def test_overflow_falls_back_to_exact_integers(self):
+        rows = [['x']] + [['3037000500']] * 5
+        for vectorize in modes():
+            columns, written, errors = run(rows, ['y = x * x - 1'], vectorize=vectorize)
+            self.assertEqual(written, [['y']] + [['9223372037000249999']] * 5)
+            self.assertEqual(errors, [])
+            self.assertEqual(columns.chunks_vectorized, 0)
+
+    @needs_numpy
+    def test_chunks_in_range_are_vectorized(self):
+        rows = [['x']] + [['3037000499']] * 5
+        columns, written, _ = run(rows, ['y = x * x - 1'], chunk_size=2, vectorize=True)
+        self.assertEqual(written, [['y']] + [['9223372030926249000']] * 5)
+        self.assertEqual(columns.chunks_vectorized, 3)
+
+    def test_bad_row_fails_alone(self):
+        rows = [['id', 'price']] + [[str(i), str(i + 1)] for i in range(8)]
+        # row 4 divides by zero
+        rows[4][1] = '0'
+        for vectorize in modes():
+            columns, written, errors = run(rows, ['share = 100 / price'], keep=['id'], chunk_size=8,
+                                           vectorize=vectorize)
+            self.assertEqual(written, [['id', 'share'], ['0', '100'], ['1', '50'], ['2', '33'],
+                                       ['4', '20'], ['5', '16'], ['6', '14'], ['7', '12']])
+            self.assertEqual(errors, ['row 4: integer division or modulo by zero\n'])
+            self.assertEqual(columns.chunks_vectorized, 0)
+
+    def test_bad_cell_fails_alone(self):
+        rows = [['price'], ['1'], ['abc'], ['2'], ['3', '4']]
+        for vectorize in modes():
+            _, written, errors = run(rows, ['price * 2'], vectorize=vectorize)
+            self.assertEqual(written, [['price * 2'], ['2'], ['4']])
+            self.assertEqual(errors, ["row 2: Invalid number 'abc' in column price\n",
+                                      'row 4: Expected 1 columns, found 2\n'])
+
+    @needs_numpy
+    def test_vectorized_floats_are_rounded_like_rows(self):
+        generator = random.Random(0)
+        # c is halfway between two results rounded to 3 digits, where
+        # numpy.round and round() can differ
+        rows = [['a', 'b', 'c']] + [['{:.6f}'.format(generator.uniform(-1000, 1000)),
+                                     '{:.6f}'.format(generator.uniform(0.001, 10)),
+                                     '{}.{:03d}5'.format(generator.randint(-99, 99), generator.randint(0, 999))]
+                                    for _ in range(2000)]
+        select = ['a / b', 'SQRT(b ) * a', 'a * 1.0005 + b', 'SIN(a ) / 3', '(a - b ) * 0.0015',
+                  'c * 1.0', 'c + b']
+        by_rows, rows_written, _ = run(rows, select, vectorize=False)
+        by_columns, columns_written, _ = run(rows, select, chunk_size=500, vectorize=True)
+        self.assertEqual(by_columns.chunks_vectorized, 4)
+        self.assertEqual(columns_written, rows_written)
+
+    def test_compound_assignments_are_refused(self):
+        for text in ('acc += price', 'acc -= 1', 'acc *= price * 2'):
+            with self.assertRaisesRegex(Exception, 'Compound assignment to acc'):
+                Pipeline([text])
+        with self.assertRaisesRegex(Exception, 'Compound assignment to acc'):
+            Pipeline((), 'acc /= 2 > 1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+"""Tests of the compiled script cache files in __rafcache__/.
+
+Run from the repository root:
+
+    python -m unittest tests.test_precompiled
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from interpreter import functions, precompiled
+from interpreter.cache import ExpressionCache, parse
+from interpreter.batch import error_message
+from interpreter.engines import Evaluator
+
+SOURCE = 'x = 4\ny = x * 2 + 1\nx > 3\n(1 + 2\nSQRT(y ) - x\n'
+
+
+def double(value):
+    return value * 2
+
+
+def triple(value):
+    return value * 3
+
+
+def results(script, lines):
+    """Result or error message of every line, evaluated with the compiled
+    script as the loader."""
+    evaluator = Evaluator(cache=ExpressionCache(loader=script))
+    outcomes = []
+    for text in lines:
+        try:
+            outcomes.append(evaluator.evaluate(text))
+        except Exception as error:
+            outcomes.append(error_message(error))
+    return outcomes
+
+
+class PrecompiledTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'script.raf')
+        self.write(SOURCE)
+
+    def write(self, source):
+        with open(self.path, 'w') as script:
+            script.write(source)
+
+    def target(self, optimize_tree=False):
+        return precompiled.cache_path(self.path, optimize_tree)
+
+    def from_file(self, optimize_tree=False):
+        """CompiledScript read from the cache file, None if it can't be used."""
+        digest = precompiled.read_source(self.path)[1]
+        return precompiled.read_cached(self.target(optimize_tree), precompiled.flags_of(optimize_tree, False),
+                                       digest)
+
+    def patch(self, offset, data):
+        with open(self.target(), 'r+b') as cached:
+            cached.seek(offset)
+            cached.write(data)
+
+    def test_not_compiled(self):
+        self.assertIsNone(precompiled.cached(self.path))
+        self.assertFalse(os.path.exists(self.target()))
+
+    def test_compile_and_reload(self):
+        compiled = precompiled.compile_file(self.path)
+        self.assertEqual(self.target(), os.path.join(self.directory, '__rafcache__', 'script.raf.rafc'))
+        loaded = self.from_file()
+        self.assertIsNotNone(loaded)
+        self.assertEqual(sorted(loaded.trees), sorted(compiled.trees))
+        script = precompiled.cached(self.path)
+        self.assertEqual(script.source, SOURCE)
+        lines = SOURCE.splitlines()
+        self.assertEqual(results(script, lines), [4, 9, True, 'Invalid syntax', -1])
+        self.assertEqual(results(script, lines), results(parse, lines))
+
+    def test_cached_error_lines(self):
+        precompiled.compile_file(self.path)
+        script = self.from_file()
+        self.assertEqual(list(script.errors), ['(1 + 2'])
+        with self.assertRaises(Exception) as raised:
+            parse('(1 + 2')
+        with self.assertRaises(Exception) as cached:
+            script('(1 + 2')
+        self.assertEqual(str(cached.exception), str(raised.exception))
+
+    def test_changed_source(self):
+        precompiled.compile_file(self.path)
+        self.write('x = 5\nx * 3\n')
+        self.assertIsNone(self.from_file())
+        script = precompiled.cached(self.path)
+        self.assertEqual(results(script, ['x = 5', 'x * 3']), [5, 15])
+        # the cache file was replaced
+        self.assertEqual(sorted(self.from_file().trees), ['x * 3', 'x = 5'])
+
+    def test_version_mismatch(self):
+        precompiled.compile_file(self.path)
+        self.patch(len(precompiled.MAGIC), b'\xff\x00')
+        with open(self.target(), 'rb') as cached:
+            data = cached.read()
+        with self.assertRaisesRegex(Exception, 'Unsupported compiled script version 255'):
+            precompiled.loads(data)
+        self.assertIsNone(self.from_file())
+        self.assertEqual(len(precompiled.cached(self.path)), 5)
+        self.assertIsNotNone(self.from_file())
+
+    def test_crc_mismatch(self):
+        precompiled.compile_file(self.path)
+        with open(self.target(), 'rb') as cached:
+            data = bytearray(cached.read())
+        data[-1] ^= 0xff
+        with self.assertRaisesRegex(Exception, 'Corrupt compiled script'):
+            precompiled.loads(data)
+        self.patch(len(data) - 1, data[-1:])
+        self.assertIsNone(self.from_file())
+        self.assertEqual(len(precompiled.cached(self.path)), 5)
+        self.assertIsNotNone(self.from_file())
+
+    def test_bad_magic(self):
+        precompiled.compile_file(self.path)
+        self.patch(0, b'NOTRAFC\0')
+        self.assertIsNone(self.from_file())
+
+    def test_registered_function(self):
+        # compiled before DOUBLE was a function: the call is an error
+        self.write('DOUBLE(4)\n')
+        precompiled.compile_file(self.path)
+        self.assertEqual(list(self.from_file().errors), ['DOUBLE(4)'])
+        functions.register('DOUBLE', double)
+        self.addCleanup(functions.unregister, 'DOUBLE')
+        self.assertIsNone(self.from_file())
+        self.assertEqual(results(precompiled.cached(self.path), ['DOUBLE(4)']), [8])
+
+    def test_reregistered_function_with_optimize(self):
+        self.write('F(4) + 1\n')
+        functions.register('F', double)
+        try:
+            precompiled.compile_file(self.path, optimize_tree=True)
+            self.assertEqual(results(precompiled.cached(self.path, True), ['F(4) + 1']), [9])
+        finally:
+            functions.unregister('F')
+        functions.register('F', triple)
+        self.addCleanup(functions.unregister, 'F')
+        # the call folded with double() must not be reused
+        self.assertIsNone(self.from_file(optimize_tree=True))
+        self.assertEqual(results(precompiled.cached(self.path, True), ['F(4) + 1']), [13])
+
+
+if __name__ == '__main__':
+    unittest.main()
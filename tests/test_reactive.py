@@ -0,0 +1,112 @@
+"""Tests of reactive sessions.
+
+Run from the repository root:
+
+    python -m unittest tests.test_reactive
+"""
+import copy
+import unittest
+
+from interpreter.engines import ENGINE_CLASSES
+from interpreter.reactive import ReactiveEvaluator, variable_names
+from interpreter.cache import parse
+from interpreter.session import Session
+
+CHAIN = ['a = 1', 'b = a + 1', 'c = b * 2', 'd = c + b', 'e = 10']
+
+
+def reactive(lines, engine='tree'):
+    evaluator = ReactiveEvaluator(Session(), engine)
+    for text in lines:
+        evaluator.evaluate(text)
+    return evaluator
+
+
+def graph_state(graph):
+    # formulas are compared by identity
+    return dict(graph.formulas), copy.deepcopy(graph.dependencies), copy.deepcopy(graph.dependents)
+
+
+class ReactiveTest(unittest.TestCase):
+    def test_variable_names(self):
+        self.assertEqual(variable_names(parse('a + SQRT(b ) * -c > PI')), {'a', 'b', 'c'})
+        self.assertEqual(variable_names(parse('x = 1 + 2')), set())
+
+    def test_chain_is_recomputed_in_topological_order(self):
+        for engine in ENGINE_CLASSES:
+            with self.subTest(engine=engine):
+                evaluator = reactive(CHAIN, engine)
+                self.assertEqual(evaluator.evaluate('a = 5'), 5)
+                # d reads both b and c, so it comes last
+                self.assertEqual(evaluator.recomputed, ['b', 'c', 'd'])
+                variables = evaluator.session.variables
+                self.assertEqual([variables[name] for name in 'abcde'], [5, 6, 12, 18, 10])
+
+    def test_every_dependant_is_recomputed_once_after_its_dependencies(self):
+        lines = ['x = 1', 'left = x * 2', 'right = x * 3', 'middle = left + right', 'top = middle + left + x']
+        evaluator = reactive(lines)
+        evaluator.evaluate('x = 2')
+        order = evaluator.recomputed
+        self.assertEqual(sorted(order), ['left', 'middle', 'right', 'top'])
+        for before, after in (('left', 'middle'), ('right', 'middle'), ('middle', 'top'), ('left', 'top')):
+            self.assertLess(order.index(before), order.index(after))
+        self.assertEqual(evaluator.session.variables['top'], 2 + 4 + 6 + 4)
+
+    def test_leaf_change_updates_only_its_dependants(self):
+        evaluator = reactive(CHAIN + ['f = e * 2'])
+        evaluator.evaluate('e = 3')
+        self.assertEqual(evaluator.recomputed, ['f'])
+        self.assertEqual(evaluator.session.variables['f'], 6)
+        evaluator.evaluate('d = 0')
+        # d has no dependants, and its formula is now a constant
+        self.assertEqual(evaluator.recomputed, [])
+        self.assertEqual(evaluator.graph.dependencies['d'], frozenset())
+        evaluator.evaluate('a = 2')
+        self.assertEqual(evaluator.recomputed, ['b', 'c'])
+        self.assertEqual(evaluator.session.variables['d'], 0)
+
+    def test_cycle_is_rejected_and_nothing_changes(self):
+        evaluator = reactive(CHAIN)
+        graph = graph_state(evaluator.graph)
+        variables = dict(evaluator.session.variables)
+        for text, path in (('a = d + 1', 'a -> d -> '), ('b = b + 1', 'b -> b'), ('e = e', 'e -> e')):
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(Exception, 'Circular dependency: ' + path):
+                    evaluator.evaluate(text)
+                self.assertEqual(graph_state(evaluator.graph), graph)
+                self.assertEqual(evaluator.session.variables, variables)
+                self.assertEqual(evaluator.recomputed, [])
+        # the formulas still work
+        evaluator.evaluate('a = 3')
+        self.assertEqual(evaluator.session.variables['d'], 12)
+
+    def test_compound_assignment_drops_the_formula(self):
+        evaluator = reactive(CHAIN)
+        evaluator.evaluate('b += 10')
+        self.assertNotIn('b', evaluator.graph.formulas)
+        self.assertEqual(evaluator.recomputed, ['c', 'd'])
+        self.assertEqual(evaluator.session.variables['d'], 12 * 2 + 12)
+        # b no longer follows a
+        evaluator.evaluate('a = 100')
+        self.assertEqual(evaluator.recomputed, [])
+        self.assertEqual(evaluator.session.variables['b'], 12)
+        # which also allows a formula of a that reads b
+        evaluator.evaluate('a = b + 1')
+        self.assertEqual(evaluator.session.variables['a'], 13)
+
+    def test_failing_formula_stops_its_dependants(self):
+        evaluator = reactive(['x = 1', 'y = 6 / x', 'z = y + 1', 'w = x + 1'])
+        with self.assertRaisesRegex(Exception, 'Could not recompute y: integer division or modulo by zero'):
+            evaluator.evaluate('x = 0')
+        self.assertEqual(evaluator.recomputed, ['w'])
+        variables = evaluator.session.variables
+        self.assertEqual((variables['x'], variables['y'], variables['z'], variables['w']), (0, 6, 7, 1))
+
+    def test_expressions_change_nothing(self):
+        evaluator = reactive(CHAIN)
+        self.assertEqual(evaluator.evaluate('d * 2'), 12)
+        self.assertEqual(evaluator.recomputed, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
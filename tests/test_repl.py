@@ -0,0 +1,68 @@
+"""Tests of the REPL commands of the command line entry point.
+
+Run from the repository root:
+
+    python -m unittest tests.test_repl
+"""
+import contextlib
+import importlib.util
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from interpreter.engines import Evaluator
+
+spec = importlib.util.spec_from_file_location(
+    'rafmath_main', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '__main__.py'))
+rafmath = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(rafmath)
+
+
+def session(lines, evaluator=None):
+    """Output of the REPL for the input lines, and whether it exited."""
+    output = io.StringIO()
+    with mock.patch('builtins.input', side_effect=list(lines) + [EOFError]), contextlib.redirect_stdout(output):
+        try:
+            rafmath.repl(Evaluator() if evaluator is None else evaluator)
+        except SystemExit:
+            return output.getvalue().splitlines(), True
+    return output.getvalue().splitlines(), False
+
+
+class ReplTest(unittest.TestCase):
+    def test_expressions(self):
+        self.assertEqual(session(['x = 2', '  ', 'x * 3', 'y']), (['2', '6', 'error: Variable not found'], False))
+
+    def test_exit(self):
+        self.assertEqual(session([' exit ', '1']), ([], True))
+
+    def test_tiers(self):
+        for line in (':tiers', ':tiers ', '  :tiers'):
+            with self.subTest(line=line):
+                self.assertEqual(session([line]),
+                                 (['error: Tiering is disabled, start with --engine tiered'], False))
+        output, _ = session([':tiers '], Evaluator(engine='tiered'))
+        self.assertRegex(output[0], r'^\d+ of \d+ compiled forms cached; interpreted')
+        self.assertEqual(session([':tiers now']), (['error: Usage: :tiers'], False))
+
+    def test_stats(self):
+        for line in (':stats', ' :stats json '):
+            with self.subTest(line=line):
+                self.assertEqual(session([line]), (['error: Metrics are disabled, start with --metrics'], False))
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'session.snap')
+        output, _ = session(['x = 2', ' :save  {} '.format(path)])
+        self.assertEqual(output, ['2', 'saved 1 variables, 0 formulas to {}'.format(path)])
+        output, _ = session([':load {}'.format(path), 'x + 1', ':load', ':save '])
+        self.assertEqual(output, ['loaded 1 variables, 0 formulas from {}'.format(path), '3',
+                                  'error: Usage: :load PATH', 'error: Usage: :save PATH'])
+
+
+if __name__ == '__main__':
+    unittest.main()
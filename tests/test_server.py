@@ -0,0 +1,63 @@
+"""Tests of the evaluation server over a local TCP connection.
+
+Run from the repository root:
+
+    python -m unittest tests.test_server
+"""
+import asyncio
+import time
+import unittest
+
+from interpreter import functions
+from interpreter.server import EvaluationServer
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+async def exchange(server, requests):
+    """Send the request lines at once, return the response lines until the
+    server closes the connection."""
+    listening = await server.start('127.0.0.1', 0)
+    port = listening.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(''.join(request + '\n' for request in requests).encode('utf-8'))
+    await writer.drain()
+    responses = []
+    while True:
+        line = await asyncio.wait_for(reader.readline(), 5)
+        if not line:
+            break
+        responses.append(line.decode('utf-8').rstrip('\n'))
+    writer.close()
+    listening.close()
+    await listening.wait_closed()
+    return responses
+
+
+class ServerTest(unittest.TestCase):
+    def setUp(self):
+        functions.register('SLEEP', sleep, truncate=False)
+        self.addCleanup(functions.unregister, 'SLEEP')
+
+    def test_responses_in_order(self):
+        responses = asyncio.run(exchange(EvaluationServer(), ['x = 2', 'x * 3', 'x > 1', 'y', 'exit', '1']))
+        self.assertEqual(responses, ['ok 2', 'ok 6', 'ok True', 'error Variable not found'])
+
+    def test_timeout_closes_the_connection(self):
+        server = EvaluationServer(timeout=0.05)
+        responses = asyncio.run(exchange(server, ['x = 1', 'x = SLEEP(0.5)', 'x < 2']))
+        self.assertEqual(responses, ['ok 1', 'error Timed out after 0.05 seconds, closing the connection'])
+        server.executor.shutdown()
+
+    def test_fast_requests_within_the_timeout(self):
+        server = EvaluationServer(timeout=5)
+        responses = asyncio.run(exchange(server, ['x = SLEEP(0.01)', 'x * 2', 'exit']))
+        self.assertEqual(responses, ['ok 0.01', 'ok 0.02'])
+        server.executor.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
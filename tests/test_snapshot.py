@@ -0,0 +1,144 @@
+"""Tests of binary session snapshots.
+
+Run from the repository root:
+
+    python -m unittest tests.test_snapshot
+"""
+import math
+import os
+import shutil
+import tempfile
+import unittest
+
+from interpreter import snapshot
+from interpreter.engines import Evaluator
+from interpreter.reactive import ReactiveEvaluator
+from interpreter.session import Session
+
+VARIABLES = {
+    'f': 2.5, 'negative_zero': -0.0, 'infinity': float('inf'), 'nan': float('nan'),
+    'i': 42, 'smallest': -2 ** 63, 'largest': 2 ** 63 - 1, 'big': 2 ** 100, 'big_negative': -2 ** 70 - 1,
+    'yes': True, 'no': False, 'none': None, 'café': 1,
+}
+
+FORMULAS = ['a = 2', 'b = a * 3 + SQRT(a )', 'c = b > 1', 'd = (a << 2) + PI', 'e = -b / 2.0']
+
+
+def reactive(lines, variables=None):
+    evaluator = ReactiveEvaluator(Session(dict(variables or {})))
+    for text in lines:
+        evaluator.evaluate(text)
+    return evaluator
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'session.snap')
+
+    def assertSameVariables(self, expected, actual):
+        self.assertEqual(sorted(expected), sorted(actual))
+        for name, value in expected.items():
+            self.assertIs(type(actual[name]), type(value), name)
+            # nan != nan, -0.0 == 0.0
+            self.assertEqual(repr(actual[name]), repr(value), name)
+
+    def test_variables_round_trip(self):
+        loaded = snapshot.loads(snapshot.dumps(VARIABLES))
+        self.assertSameVariables(VARIABLES, loaded.variables)
+        self.assertEqual(loaded.formulas, {})
+
+    def test_empty(self):
+        loaded = snapshot.loads(snapshot.dumps({}))
+        self.assertEqual((loaded.variables, loaded.formulas), ({}, {}))
+
+    def test_unsupported_value(self):
+        with self.assertRaisesRegex(Exception, 'Cannot save variable s of type str'):
+            snapshot.dumps({'s': 'text'})
+
+    def test_file_round_trip(self):
+        size = snapshot.write(self.path, VARIABLES)
+        self.assertEqual(size, os.path.getsize(self.path))
+        self.assertSameVariables(VARIABLES, snapshot.read(self.path).variables)
+
+    def test_formulas_round_trip(self):
+        evaluator = reactive(FORMULAS)
+        saved = snapshot.save(self.path, evaluator)
+        loaded = snapshot.read(self.path)
+        self.assertSameVariables(evaluator.session.variables, loaded.variables)
+        self.assertEqual(sorted(loaded.formulas), sorted(saved.formulas))
+        for name, flat in loaded.formulas.items():
+            session = Session(dict(evaluator.session.variables, **{name: None}))
+            flat.evaluate(session)
+            self.assertEqual(session.variables[name], evaluator.session.variables[name], name)
+
+    def test_restore_into_reactive_session(self):
+        snapshot.save(self.path, reactive(FORMULAS))
+        evaluator = ReactiveEvaluator()
+        snapshot.restore(self.path, evaluator)
+        self.assertEqual(evaluator.evaluate('b'), 7)
+        # the restored formulas are recomputed
+        evaluator.evaluate('a = 9')
+        recomputed = evaluator.recomputed
+        self.assertEqual(sorted(recomputed), ['b', 'c', 'd', 'e'])
+        self.assertLess(recomputed.index('b'), recomputed.index('c'))
+        self.assertLess(recomputed.index('b'), recomputed.index('e'))
+        expected = reactive(FORMULAS + ['a = 9']).session.variables
+        self.assertSameVariables(expected, evaluator.session.variables)
+
+    def test_restore_into_plain_session(self):
+        snapshot.save(self.path, reactive(FORMULAS))
+        evaluator = Evaluator(Session({'a': 0, 'other': 1}))
+        loaded = snapshot.restore(self.path, evaluator)
+        self.assertEqual(evaluator.session.variables, dict(loaded.variables, other=1))
+        # only the values: nothing is recomputed
+        evaluator.evaluate('a = 9')
+        self.assertEqual(evaluator.evaluate('b'), 7)
+
+    def test_restore_that_would_create_a_cycle(self):
+        # x = y + 1 with y a plain input
+        snapshot.save(self.path, reactive(['y = 1', 'x = y + 1', 'y += 0']))
+        evaluator = reactive(['z = 7', 'y = x * 2'], {'x': 1})
+        variables = dict(evaluator.session.variables)
+        dependencies = dict(evaluator.graph.dependencies)
+        with self.assertRaisesRegex(Exception, 'Circular dependency'):
+            snapshot.restore(self.path, evaluator)
+        self.assertEqual(evaluator.session.variables, variables)
+        self.assertEqual(evaluator.graph.dependencies, dependencies)
+        self.assertEqual(sorted(evaluator.graph.formulas), ['y', 'z'])
+
+    def corrupted(self, offset, data):
+        saved = bytearray(snapshot.dumps(VARIABLES))
+        saved[offset:offset + len(data)] = data
+        return bytes(saved)
+
+    def test_bad_magic(self):
+        with self.assertRaisesRegex(Exception, 'Not a rafmath snapshot'):
+            snapshot.loads(self.corrupted(0, b'RAFCODE\0'))
+        with self.assertRaisesRegex(Exception, 'Not a rafmath snapshot'):
+            snapshot.loads(b'RAF')
+
+    def test_empty_file(self):
+        open(self.path, 'wb').close()
+        with self.assertRaisesRegex(Exception, 'Not a rafmath snapshot'):
+            snapshot.read(self.path)
+
+    def test_bad_version(self):
+        with self.assertRaisesRegex(Exception, r'Unsupported snapshot version 2 \(expected 1\)'):
+            snapshot.loads(self.corrupted(len(snapshot.MAGIC), b'\x02\x00'))
+
+    def test_bad_checksum(self):
+        data = snapshot.dumps(VARIABLES)
+        for offset in (snapshot.HEADER.size, len(data) // 2, len(data) - 1):
+            with self.assertRaisesRegex(Exception, 'Corrupt snapshot'):
+                snapshot.loads(self.corrupted(offset, bytes([data[offset] ^ 1])))
+
+    def test_truncated(self):
+        data = snapshot.dumps(VARIABLES)
+        with self.assertRaisesRegex(Exception, 'Corrupt snapshot'):
+            snapshot.loads(data[:-8])
+
+
+if __name__ == '__main__':
+    unittest.main()